@@ -0,0 +1,97 @@
+"""
+WebSocket fan-out benchmark.
+
+Subscribes N in-memory sockets to one incident (a fraction of them stalled) and
+measures how long broadcast() blocks the caller and how long it takes until every
+healthy subscriber has received the message.
+
+Usage: python benchmarks/bench_broadcast.py --subscribers 10000 --stalled 0.01
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+# Add backend to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.connection_manager import ConnectionManager
+
+class BenchWebSocket:
+    def __init__(self, stalled: bool, expected: int, done: asyncio.Event, counter: dict):
+        self.stalled = stalled
+        self.expected = expected
+        self.done = done
+        self.counter = counter
+        self.received = 0
+
+    async def accept(self):
+        pass
+
+    async def send_json(self, message):
+        # Same encoding Starlette's WebSocket.send_json does for every call
+        await self.send_text(json.dumps(message, separators=(",", ":"), ensure_ascii=False))
+
+    async def send_text(self, data: str):
+        if self.stalled:
+            await asyncio.sleep(3600)
+        self.received += 1
+        if self.received == self.expected:
+            self.counter["complete"] += 1
+            if self.counter["complete"] == self.counter["healthy"]:
+                self.done.set()
+
+    async def close(self, code: int = 1000):
+        pass
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+async def run(subscribers: int, stalled_ratio: float, messages: int, queue_size: int):
+    manager = ConnectionManager(max_queue=queue_size)
+    stalled_count = int(subscribers * stalled_ratio)
+    done = asyncio.Event()
+    counter = {"complete": 0, "healthy": subscribers - stalled_count}
+
+    for i in range(subscribers):
+        ws = BenchWebSocket(i < stalled_count, messages, done, counter)
+        await manager.connect(ws, "bench")
+
+    payload = {"type": "post_voted", "payload": {"id": "post_001", "content": "x" * 280, "credibleVotes": 1, "totalVotes": 2}}
+    enqueue_times = []
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    for _ in range(messages):
+        t0 = time.perf_counter()
+        await manager.broadcast(payload, "bench")
+        enqueue_times.append(time.perf_counter() - t0)
+        await asyncio.sleep(0)
+    await asyncio.wait_for(done.wait(), timeout=120)
+    total = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+
+    remaining = len(manager.active_connections.get("bench", {}))
+    for conns in list(manager.active_connections.values()):
+        for conn in list(conns.values()):
+            conn.task.cancel()
+
+    print(f"subscribers={subscribers} stalled={stalled_count} messages={messages} queue={queue_size}")
+    print(f"broadcast() blocking  mean={statistics.mean(enqueue_times) * 1000:.2f}ms  "
+          f"p99={percentile(enqueue_times, 0.99) * 1000:.2f}ms")
+    print(f"fan-out complete to all healthy subscribers in {total * 1000:.1f}ms "
+          f"({total / messages * 1000:.2f}ms per message)")
+    print(f"CPU per broadcast (enqueue + every writer): {cpu / messages * 1000:.2f}ms")
+    print(f"connections still subscribed: {remaining} (stalled ones evicted once their queue overflowed)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--subscribers", type=int, default=10000)
+    parser.add_argument("--stalled", type=float, default=0.01, help="fraction of subscribers that never read")
+    parser.add_argument("--messages", type=int, default=50)
+    parser.add_argument("--queue-size", type=int, default=32)
+    args = parser.parse_args()
+    asyncio.run(run(args.subscribers, args.stalled, args.messages, args.queue_size))
@@ -0,0 +1,138 @@
+"""
+REST response encoding benchmark.
+
+Builds a post list like GET /api/incidents/{id}/posts returns and compares
+FastAPI's default path (jsonable_encoder over the Prisma models, then
+JSONResponse) with FastJSONResponse over post_payload dicts. Also reports the
+bytes on the wire with gzip and brotli, and the same for the columnar snapshot
+(GET /api/incidents/{id}/snapshot) the tree view loads instead.
+
+Usage: python benchmarks/bench_responses.py --posts 2000 --content-size 600
+"""
+import argparse
+import gzip
+import os
+import random
+import string
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, List, Optional
+
+# Add backend to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from services.responses import FastJSONResponse
+from services.serialization import post_payload
+from services.snapshot import IncidentSnapshot
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+class BenchPost(BaseModel):
+    # Same fields as the generated prisma.models.Post, relations included
+    id: str
+    content: str
+    author: str
+    timestamp: datetime
+    incidentId: str
+    incident: Optional[Any] = None
+    parentId: Optional[str] = None
+    parent: Optional[Any] = None
+    children: Optional[List[Any]] = None
+    mutationScore: Optional[float] = None
+    mutationType: Optional[str] = None
+    credibleVotes: int = 0
+    totalVotes: int = 0
+    version: int = 1
+    comments: Optional[List[Any]] = None
+    createdAt: datetime
+    updatedAt: datetime
+
+def make_posts(count: int, content_size: int) -> List[BenchPost]:
+    rng = random.Random(42)
+    words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9))) for _ in range(400)]
+    now = datetime.now(timezone.utc)
+    posts = []
+    for i in range(count):
+        content = ""
+        while len(content) < content_size:
+            content += rng.choice(words) + " "
+        posts.append(BenchPost(
+            id=f"post-{i:06d}",
+            content=content,
+            author=f"user{rng.randint(1, 500)}",
+            timestamp=now,
+            incidentId="incident-1",
+            parentId=f"post-{rng.randint(0, i - 1):06d}" if i else None,
+            mutationScore=rng.random() * 100,
+            mutationType=rng.choice(["EMOTIONAL", "FACTUAL", "FABRICATION"]),
+            credibleVotes=rng.randint(0, 50),
+            totalVotes=rng.randint(50, 100),
+            createdAt=now,
+            updatedAt=now,
+        ))
+    return posts
+
+def snapshot_rows(posts: List[BenchPost]) -> List[dict]:
+    return [{
+        "id": p.id, "parentId": p.parentId, "author": p.author, "mutationScore": p.mutationScore,
+        "mutationType": p.mutationType, "parentInferred": False, "credibleVotes": p.credibleVotes,
+        "totalVotes": p.totalVotes, "version": p.version,
+        "timestamp": p.timestamp.timestamp() * 1000, "updated": p.updatedAt.timestamp() * 1000,
+    } for p in posts]
+
+def build_snapshot(rows: List[dict]) -> bytes:
+    snapshot = IncidentSnapshot("incident-1")
+    for row in rows:
+        snapshot.upsert(row)
+    return snapshot.encode()
+
+def report_sizes(label: str, body: bytes, repeat: int):
+    print(f"  {label} identity  {len(body):>10,} bytes")
+    gzipped = gzip.compress(body, compresslevel=6)
+    gzip_time = timed(lambda: gzip.compress(body, compresslevel=6), repeat)
+    print(f"  {label} gzip -6   {len(gzipped):>10,} bytes  {gzip_time * 1000:6.2f}ms")
+    if brotli is not None:
+        compressed = brotli.compress(body, quality=4)
+        brotli_time = timed(lambda: brotli.compress(body, quality=4), repeat)
+        print(f"  {label} br q4     {len(compressed):>10,} bytes  {brotli_time * 1000:6.2f}ms")
+
+def timed(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--posts", type=int, default=2000)
+    parser.add_argument("--content-size", type=int, default=600)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    posts = make_posts(args.posts, args.content_size)
+
+    default = timed(lambda: JSONResponse(jsonable_encoder(posts)), args.repeat)
+    fast = timed(lambda: FastJSONResponse([post_payload(p) for p in posts]), args.repeat)
+    body = FastJSONResponse([post_payload(p) for p in posts]).body
+
+    print(f"{args.posts} posts, ~{args.content_size} chars each (best of {args.repeat})")
+    print(f"  default (jsonable_encoder + JSONResponse)  {default * 1000:8.2f}ms")
+    print(f"  FastJSONResponse(post_payload)             {fast * 1000:8.2f}ms  ({default / fast:.1f}x)")
+    report_sizes("posts   ", body, args.repeat)
+
+    rows = snapshot_rows(posts)
+    snapshot_time = timed(lambda: build_snapshot(rows), args.repeat)
+    print(f"  snapshot build + encode                    {snapshot_time * 1000:8.2f}ms")
+    report_sizes("snapshot", build_snapshot(rows), args.repeat)
+
+if __name__ == "__main__":
+    main()
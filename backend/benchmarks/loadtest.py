@@ -0,0 +1,366 @@
+"""
+End-to-end load test.
+
+Starts the API (benchmarks/loadtest_server.py: stubbed Gemini model) against a
+local PostgreSQL database, seeds a few incidents, then runs these workloads
+concurrently for --duration seconds:
+
+  analyze     POST /api/analyze with fresh and near-duplicate content
+  posts       POST /api/posts, replies to random earlier posts
+  votes       POST /api/posts/{id}/vote on a handful of hot posts (vote storm)
+  reads       GET /api/incidents/ and GET /api/incidents/{id}/posts
+  websocket   subscribers on /api/ws/incidents/{id}, measuring delivery latency
+  agent       the autonomous agent loop, measured through /api/metrics
+
+Writes throughput and p50/p95/p99 latency per endpoint as JSON (--output).
+--compare prints the p95 change against an earlier result file.
+
+The database is wiped when --reset-db is given: never point it at real data.
+Needs httpx and websockets (pip install httpx websockets).
+
+Usage:
+  python benchmarks/loadtest.py --database-url postgresql://localhost/factsaura_load \\
+      --reset-db --duration 60 --output loadtest-results.json
+  python benchmarks/loadtest.py --base-url http://localhost:8000 --duration 30
+"""
+import argparse
+import asyncio
+import glob
+import json
+import math
+import os
+import random
+import re
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORDS = (
+    "flood water rising bridge closed army deployed dam cracked evacuate now city "
+    "hospital power outage rumor official update confirmed fake shared warning road "
+    "rescue boats stranded families relief camp helpline verified false video old"
+).split()
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """
+    Nearest-rank percentile of `values` (pct in 0-100), or None when empty.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+class Recorder:
+    """
+    Collects latencies (seconds) and error counts per endpoint name.
+    """
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+
+    def record(self, name: str, seconds: float, ok: bool = True):
+        self.latencies.setdefault(name, [])
+        if ok:
+            self.latencies[name].append(seconds)
+        else:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+    def summary(self, duration: float) -> Dict[str, Dict[str, Any]]:
+        result = {}
+        for name in sorted(set(self.latencies) | set(self.errors)):
+            values = self.latencies.get(name, [])
+            result[name] = {
+                "count": len(values),
+                "errors": self.errors.get(name, 0),
+                "throughput_per_s": round(len(values) / duration, 2) if duration else 0.0,
+                **{
+                    f"p{pct}_ms": round(percentile(values, pct) * 1000, 2) if values else None
+                    for pct in (50, 95, 99)
+                },
+            }
+        return result
+
+def random_text(rng: random.Random, words: int = 25) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+async def timed_request(client, recorder: Recorder, name: str, method: str, url: str, **kwargs):
+    start = time.perf_counter()
+    try:
+        response = await client.request(method, url, **kwargs)
+        ok = response.status_code < 400 or response.status_code == 304
+    except Exception:
+        response, ok = None, False
+    recorder.record(name, time.perf_counter() - start, ok)
+    return response if ok else None
+
+class LoadTest:
+    def __init__(self, args):
+        self.args = args
+        self.base_url = args.base_url.rstrip("/")
+        self.recorder = Recorder()
+        self.rng = random.Random(args.seed)
+        self.incident_ids: List[str] = []
+        self.post_ids: List[str] = []
+        # post id -> incident id, so replies stay in their parent's incident
+        self.post_incident: Dict[str, str] = {}
+        self.contents: List[str] = []
+        self.hot_post_ids: List[str] = []
+        self.deadline = 0.0
+
+    async def seed(self, client):
+        for i in range(self.args.incidents):
+            response = await client.post("/api/incidents/", json={
+                "title": f"Load test incident {i}",
+                "severity": "CRITICAL" if i % 2 == 0 else "WARNING",
+                "location": "Load Test City",
+                "status": "ACTIVE",
+            })
+            response.raise_for_status()
+            self.incident_ids.append(response.json()["id"])
+        for incident_id in self.incident_ids:
+            for _ in range(self.args.seed_posts):
+                content = random_text(self.rng)
+                response = await client.post("/api/posts", json={
+                    "content": content,
+                    "author": f"seed{self.rng.randint(1, 100)}",
+                    "incidentId": incident_id,
+                })
+                response.raise_for_status()
+                self.post_ids.append(response.json()["id"])
+                self.post_incident[self.post_ids[-1]] = incident_id
+                self.contents.append(content)
+        self.hot_post_ids = self.post_ids[: self.args.hot_posts]
+
+    async def analyze_user(self, client):
+        while time.monotonic() < self.deadline:
+            if self.rng.random() < 0.5:
+                # Near-duplicate of a known post: exercises the similarity match path
+                words = self.rng.choice(self.contents).split()
+                words[self.rng.randrange(len(words))] = self.rng.choice(WORDS)
+                content = " ".join(words)
+            else:
+                content = random_text(self.rng, 40)
+            await timed_request(client, self.recorder, "POST /api/analyze", "POST", "/api/analyze", json={"content": content})
+
+    async def post_user(self, client):
+        while time.monotonic() < self.deadline:
+            incident_id = self.rng.choice(self.incident_ids)
+            body = {"content": random_text(self.rng), "author": f"user{self.rng.randint(1, 1000)}", "incidentId": incident_id}
+            if self.rng.random() < 0.7:
+                parent_id = self.rng.choice(self.post_ids)
+                body["parentId"] = parent_id
+                body["incidentId"] = self.post_incident[parent_id]
+            response = await timed_request(client, self.recorder, "POST /api/posts", "POST", "/api/posts", json=body)
+            if response is not None:
+                self.post_ids.append(response.json()["id"])
+                self.post_incident[self.post_ids[-1]] = body["incidentId"]
+
+    async def voter(self, client):
+        while time.monotonic() < self.deadline:
+            post_id = self.rng.choice(self.hot_post_ids)
+            await timed_request(
+                client, self.recorder, "POST /api/posts/{post_id}/vote", "POST",
+                f"/api/posts/{post_id}/vote", json={"isCredible": self.rng.random() < 0.6},
+            )
+
+    async def reader(self, client):
+        etags: Dict[str, str] = {}
+        while time.monotonic() < self.deadline:
+            if self.rng.random() < 0.2:
+                name, url = "GET /api/incidents/", "/api/incidents/"
+            else:
+                name, url = "GET /api/incidents/{incident_id}/posts", f"/api/incidents/{self.rng.choice(self.incident_ids)}/posts"
+            # Revalidate like a browser would
+            headers = {"Accept-Encoding": "gzip, br"}
+            if url in etags:
+                headers["If-None-Match"] = etags[url]
+            response = await timed_request(client, self.recorder, name, "GET", url, headers=headers)
+            if response is not None and "etag" in response.headers:
+                etags[url] = response.headers["etag"]
+
+    async def subscriber(self, incident_id: str, stats: Dict[str, int]):
+        import websockets
+
+        ws_url = self.base_url.replace("http", "ws", 1) + f"/api/ws/incidents/{incident_id}"
+        try:
+            async with websockets.connect(ws_url, max_size=None) as ws:
+                stats["connected"] += 1
+                while time.monotonic() < self.deadline:
+                    try:
+                        raw = await asyncio.wait_for(ws.recv(), timeout=max(self.deadline - time.monotonic(), 0.01))
+                    except asyncio.TimeoutError:
+                        break
+                    received = datetime.now(timezone.utc)
+                    stats["frames"] += 1
+                    message = json.loads(raw)
+                    events = message["payload"]["events"] if message.get("type") == "batch" else [message]
+                    for event in events:
+                        if event.get("type") == "new_post" and event["payload"].get("createdAt"):
+                            created = datetime.fromisoformat(event["payload"]["createdAt"].replace("Z", "+00:00"))
+                            self.recorder.record("WS new_post delivery", (received - created).total_seconds())
+        except Exception as e:
+            stats["failed"] += 1
+            print(f"[loadtest] WebSocket subscriber failed: {e!r}")
+
+    async def agent_posts_total(self, client) -> float:
+        response = await client.get("/api/metrics")
+        match = re.search(r"^factsaura_agent_posts_total(?:\{[^}]*\})? (\S+)$", response.text, re.M)
+        return float(match.group(1)) if match else 0.0
+
+    async def run(self) -> Dict[str, Any]:
+        import httpx
+
+        limits = httpx.Limits(max_connections=self.args.max_connections)
+        async with httpx.AsyncClient(base_url=self.base_url, timeout=30, limits=limits) as client:
+            await self.seed(client)
+            agent_before = await self.agent_posts_total(client)
+
+            ws_stats = {"connected": 0, "frames": 0, "failed": 0}
+            start = time.monotonic()
+            self.deadline = start + self.args.duration
+            tasks = (
+                [self.analyze_user(client) for _ in range(self.args.analyze_users)]
+                + [self.post_user(client) for _ in range(self.args.post_users)]
+                + [self.voter(client) for _ in range(self.args.voters)]
+                + [self.reader(client) for _ in range(self.args.readers)]
+                + [self.subscriber(self.incident_ids[i % len(self.incident_ids)], ws_stats) for i in range(self.args.subscribers)]
+            )
+            await asyncio.gather(*tasks)
+            elapsed = time.monotonic() - start
+
+            agent_after = await self.agent_posts_total(client)
+
+        return {
+            "elapsed_s": round(elapsed, 2),
+            "endpoints": self.recorder.summary(elapsed),
+            "websocket": ws_stats,
+            "agent": {
+                "posts_ingested": agent_after - agent_before,
+                "posts_per_s": round((agent_after - agent_before) / elapsed, 2) if elapsed else 0.0,
+            },
+        }
+
+async def reset_database(database_url: str):
+    """
+    Drops the public schema and applies every Prisma migration, in order.
+    """
+    import asyncpg
+
+    sys.path.append(BACKEND_DIR)
+    from services.event_bus import asyncpg_dsn
+
+    conn = await asyncpg.connect(asyncpg_dsn(database_url))
+    try:
+        await conn.execute("DROP SCHEMA IF EXISTS public CASCADE; CREATE SCHEMA public;")
+        for path in sorted(glob.glob(os.path.join(BACKEND_DIR, "prisma", "migrations", "*", "migration.sql"))):
+            with open(path) as f:
+                await conn.execute(f.read())
+    finally:
+        await conn.close()
+
+def start_server(args) -> subprocess.Popen:
+    env = dict(os.environ, DATABASE_URL=args.database_url, LOADTEST_GEMINI_LATENCY_MS=str(args.gemini_latency_ms))
+    return subprocess.Popen(
+        [sys.executable, os.path.join(BACKEND_DIR, "benchmarks", "loadtest_server.py"),
+         "--port", str(args.port), "--workers", str(args.workers)],
+        cwd=BACKEND_DIR,
+        env=env,
+    )
+
+async def wait_until_ready(base_url: str, timeout: float = 60):
+    import httpx
+
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url, timeout=2) as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get("/")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.5)
+    raise RuntimeError(f"API at {base_url} did not come up within {timeout}s")
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_report(result: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None):
+    print(f"\n{'endpoint':<42}{'count':>8}{'err':>6}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for name, row in result["endpoints"].items():
+        line = (
+            f"{name:<42}{row['count']:>8}{row['errors']:>6}{row['throughput_per_s']:>9}"
+            + "".join(f"{row[key] if row[key] is not None else '-':>9}" for key in ("p50_ms", "p95_ms", "p99_ms"))
+        )
+        old = (baseline or {}).get("endpoints", {}).get(name)
+        if old and old.get("p95_ms") and row["p95_ms"]:
+            line += f"   p95 {row['p95_ms'] / old['p95_ms'] - 1:+.0%} vs baseline"
+        print(line)
+    print(f"\nwebsocket: {result['websocket']}")
+    print(f"agent:     {result['agent']}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("LOADTEST_DATABASE_URL"))
+    parser.add_argument("--reset-db", action="store_true", help="wipe the database and apply migrations first")
+    parser.add_argument("--base-url", help="test an already running API instead of starting one")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--incidents", type=int, default=3)
+    parser.add_argument("--seed-posts", type=int, default=20)
+    parser.add_argument("--hot-posts", type=int, default=5)
+    parser.add_argument("--analyze-users", type=int, default=4)
+    parser.add_argument("--post-users", type=int, default=4)
+    parser.add_argument("--voters", type=int, default=16)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--subscribers", type=int, default=100)
+    parser.add_argument("--max-connections", type=int, default=100)
+    parser.add_argument("--gemini-latency-ms", type=float, default=300)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="loadtest-results.json")
+    parser.add_argument("--compare", help="earlier result file to compare p95 latencies against")
+    args = parser.parse_args()
+
+    server = None
+    if not args.base_url:
+        if not args.database_url:
+            parser.error("--database-url (or LOADTEST_DATABASE_URL) is required unless --base-url is given")
+        if args.reset_db:
+            asyncio.run(reset_database(args.database_url))
+        args.base_url = f"http://127.0.0.1:{args.port}"
+        server = start_server(args)
+
+    try:
+        asyncio.run(wait_until_ready(args.base_url))
+        result = asyncio.run(LoadTest(args).run())
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    result["meta"] = {
+        "git_revision": git_revision(),
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "params": {k: v for k, v in vars(args).items() if k not in ("database_url", "output", "compare")},
+    }
+    with open(args.output, "w") as f:
+        json.dump(result, f, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+    print(f"\nResults written to {args.output}")
+
+if __name__ == "__main__":
+    main()
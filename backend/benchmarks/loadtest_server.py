@@ -0,0 +1,59 @@
+"""
+Runs the API for load tests with a canned Gemini model, so /api/analyze costs a
+fixed, configurable delay instead of a network call (and no API key is needed).
+Started by benchmarks/loadtest.py; DATABASE_URL must point at a disposable database.
+
+Usage: python benchmarks/loadtest_server.py --port 8765 [--workers 1]
+"""
+import argparse
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+# Add backend to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import google.generativeai as genai
+
+STUB_RESPONSE = '{"risk_level": "MEDIUM", "confidence": 0.5, "analysis": "Load test stub response."}'
+
+class StubModel:
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self.latency = float(os.getenv("LOADTEST_GEMINI_LATENCY_MS", "300")) / 1000
+
+    async def generate_content_async(self, prompt: str):
+        await asyncio.sleep(self.latency)
+        return SimpleNamespace(text=STUB_RESPONSE)
+
+def install_stub():
+    genai.configure = lambda **kwargs: None
+    genai.GenerativeModel = StubModel
+    os.environ.setdefault("GEMINI_API_KEY", "loadtest-stub")
+
+# Applied on import too, so every uvicorn worker process gets the stub
+install_stub()
+
+from main import app  # noqa: E402  (imported after the stub is in place)
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        # Workers are separate processes: they need an import string, and the
+        # Postgres event bus to see each other's broadcasts
+        os.environ.setdefault("EVENT_BUS", "postgres")
+        uvicorn.run("loadtest_server:app", host=args.host, port=args.port, workers=args.workers,
+                    app_dir=os.path.dirname(os.path.abspath(__file__)), log_level="warning")
+    else:
+        uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""
+Microbenchmarks for the core algorithms, with regression checks.
+
+Each benchmark runs on a fixed synthetic corpus (seeded RNG), so runs are
+comparable. Timings are compared as-is by default, which assumes the baseline
+was recorded on the same kind of machine. With --normalize each timing is
+divided by a pure-Python calibration loop measured right after it instead; that
+carries over between machines better but adds the loop's own noise.
+
+  python benchmarks/microbench.py                   compare with benchmarks/baseline.json
+  python benchmarks/microbench.py --save-baseline   record a new baseline
+  python benchmarks/microbench.py --tolerance 0.5 --only find_similar
+
+Exits with status 1 when a benchmark is slower than its baseline by more than
+--tolerance (default MICROBENCH_TOLERANCE or 0.25, i.e. 25%).
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import random
+import string
+import sys
+import time
+from types import SimpleNamespace
+from typing import Callable, Dict, List
+
+# Add backend to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.analysis_service import rank_similar_posts
+from services.connection_manager import ConnectionManager
+from services.diff_engine import diff_texts, token_cache
+from services.parent_inference import IncidentIndex
+from services.post_service import PostService
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+post_service = PostService()
+
+def make_texts(count: int, length: int, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9))) for _ in range(300)]
+    texts = []
+    for _ in range(count):
+        text = ""
+        while len(text) < length:
+            text += rng.choice(words) + " "
+        texts.append(text[:length])
+    return texts
+
+def mutate(text: str, rng: random.Random, edits: int) -> str:
+    chars = list(text)
+    for _ in range(edits):
+        chars[rng.randrange(len(chars))] = rng.choice(string.ascii_lowercase + " ")
+    return "".join(chars)
+
+def calibration():
+    total = 0
+    for i in range(200_000):
+        total += i * i % 7
+    return total
+
+def bench_mutation_score() -> Callable[[], None]:
+    rng = random.Random(1)
+    pairs = [(text, mutate(text, rng, 20)) for text in make_texts(200, 280, seed=1)]
+
+    def run():
+        for parent, child in pairs:
+            post_service.calculate_mutation_score(parent, child)
+    return run
+
+def bench_find_similar(corpus_size: int) -> Callable[[], None]:
+    rng = random.Random(2)
+    posts = [SimpleNamespace(id=str(i), content=text) for i, text in enumerate(make_texts(corpus_size, 280, seed=2))]
+    query = mutate(posts[corpus_size // 2].content, rng, 10)
+
+    def run():
+        rank_similar_posts(query, posts, threshold=0.8)
+    return run
+
+def bench_diff_opcodes() -> Callable[[], None]:
+    rng = random.Random(3)
+    pairs = [(text, mutate(text, rng, 40)) for text in make_texts(50, 1000, seed=3)]
+
+    def run():
+        for parent, child in pairs:
+            post_service.diff_opcodes(parent, child)
+    return run
+
+def bench_word_diff(cached: bool) -> Callable[[], None]:
+    rng = random.Random(3)
+    pairs = [(text, mutate(text, rng, 40)) for text in make_texts(50, 1000, seed=3)]
+
+    def run():
+        if not cached:
+            token_cache.clear()
+        for index, (parent, child) in enumerate(pairs):
+            diff_texts(parent, child, "word", parent_key=("parent", index), child_key=("child", index))
+    return run
+
+def bench_parent_inference(corpus_size: int) -> Callable[[], None]:
+    rng = random.Random(5)
+    index = IncidentIndex()
+    texts = make_texts(corpus_size, 280, seed=5)
+    for i, text in enumerate(texts):
+        index.add(str(i), text)
+    queries = [mutate(texts[rng.randrange(corpus_size)], rng, 10) for _ in range(20)]
+
+    def run():
+        for query in queries:
+            index.best_match(query, threshold=0.6)
+    return run
+
+class NullWebSocket:
+    async def accept(self):
+        pass
+
+    async def send_text(self, data: str):
+        pass
+
+def bench_broadcast(subscribers: int) -> Callable[[], None]:
+    manager = ConnectionManager(max_queue=1_000_000)
+    message = {"type": "post_voted", "payload": {"id": "p1", "content": make_texts(1, 500, seed=4)[0], "totalVotes": 10}}
+    loop = asyncio.new_event_loop()
+
+    async def setup():
+        for _ in range(subscribers):
+            connection = manager.register(NullWebSocket(), "bench")
+            # No writer tasks: measure encoding plus fan-out into the queues only
+            connection.task.cancel()
+    loop.run_until_complete(setup())
+
+    async def broadcast_and_drain():
+        for _ in range(10):
+            await manager.broadcast(message, "bench")
+        for connection in manager.active_connections["bench"].values():
+            while not connection.queue.empty():
+                connection.queue.get_nowait()
+
+    def run():
+        loop.run_until_complete(broadcast_and_drain())
+    return run
+
+BENCHMARKS: Dict[str, Callable[[], Callable[[], None]]] = {
+    "mutation_score[200x280]": bench_mutation_score,
+    "find_similar[100]": lambda: bench_find_similar(100),
+    "find_similar[1000]": lambda: bench_find_similar(1000),
+    "find_similar[10000]": lambda: bench_find_similar(10000),
+    "parent_inference[20 in 10000]": lambda: bench_parent_inference(10000),
+    "diff_opcodes[50x1000]": bench_diff_opcodes,
+    "word_diff[50x1000]": lambda: bench_word_diff(cached=False),
+    "word_diff[50x1000 cached tokens]": lambda: bench_word_diff(cached=True),
+    "broadcast[1000 subscribers x10]": lambda: bench_broadcast(1000),
+}
+
+def measure(fn: Callable[[], None], repeat: int, min_time: float = 0.2) -> float:
+    """
+    Best per-call time over `repeat` rounds; each round loops until it has run
+    for at least `min_time` seconds so short functions are measured reliably.
+    """
+    fn()  # warm up
+    best = float("inf")
+    # Like timeit: a collection landing in one round would swamp the measurement
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            calls, start = 0, time.perf_counter()
+            while True:
+                fn()
+                calls += 1
+                elapsed = time.perf_counter() - start
+                if elapsed >= min_time:
+                    break
+            best = min(best, elapsed / calls)
+    finally:
+        gc.enable()
+    return best
+
+def run_benchmark(fn: Callable[[], None], repeat: int) -> Dict[str, float]:
+    seconds = measure(fn, repeat)
+    # Calibrated right next to the benchmark, so both see the same CPU state
+    calibration_time = measure(calibration, repeat)
+    return {"seconds": seconds, "relative": seconds / calibration_time}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=float(os.getenv("MICROBENCH_TOLERANCE", "0.25")))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", help="run only benchmarks whose name contains this text")
+    parser.add_argument("--normalize", action="store_true", help="compare calibration-relative timings")
+    parser.add_argument("--confirm", type=int, default=2, help="re-runs of a regressed benchmark before failing")
+    args = parser.parse_args()
+
+    results = {}
+    functions = {}
+    for name, factory in BENCHMARKS.items():
+        if args.only and args.only not in name:
+            continue
+        functions[name] = factory()
+        results[name] = run_benchmark(functions[name], args.repeat)
+        if args.save_baseline:
+            # The baseline is what later runs are held to: record the best of several
+            for _ in range(args.confirm):
+                retry = run_benchmark(functions[name], args.repeat)
+                if retry["seconds"] < results[name]["seconds"]:
+                    results[name] = retry
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({"benchmarks": results}, f, indent=2, sort_keys=True)
+            f.write("\n")
+        for name, result in results.items():
+            print(f"{name:<36}{result['seconds'] * 1000:>10.3f}ms")
+        print(f"Baseline written to {args.baseline}")
+        return
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)["benchmarks"]
+
+    failed = []
+    print(f"{'benchmark':<36}{'time':>12}{'baseline':>12}{'change':>10}")
+    for name, result in results.items():
+        line = f"{name:<36}{result['seconds'] * 1000:>10.3f}ms"
+        old = baseline.get(name)
+        if old is None:
+            print(line + f"{'-':>12}{'new':>10}")
+            continue
+        key = "relative" if args.normalize else "seconds"
+        change = result[key] / old[key] - 1
+        # A regression has to show up again before it counts: one slow round is usually noise
+        for _ in range(args.confirm):
+            if change <= args.tolerance:
+                break
+            retry = run_benchmark(functions[name], args.repeat)
+            if retry[key] < result[key]:
+                result = retry
+                change = result[key] / old[key] - 1
+        status = ""
+        if change > args.tolerance:
+            failed.append(name)
+            status = "  REGRESSION"
+        print(line + f"{old['seconds'] * 1000:>10.3f}ms{change:>+10.0%}{status}")
+
+    if failed:
+        print(f"\n{len(failed)} benchmark(s) regressed more than {args.tolerance:.0%}: {', '.join(failed)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
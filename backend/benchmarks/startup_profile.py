@@ -0,0 +1,143 @@
+"""
+Startup profile for the API process.
+
+  imports        runs `python -X importtime -c "import main"` and lists the
+                 modules with the largest cumulative import time
+  first request  starts uvicorn and measures the time from spawn until GET /
+                 first answers 200, then the latency of the first request that
+                 needs the database (GET /api/incidents/, unless --db-path is empty)
+
+Usage:
+  python benchmarks/startup_profile.py [--top 25] [--port 8766] [--skip-server]
+      [--output startup-profile.json]
+
+The server run needs uvicorn and httpx, and DATABASE_URL for the database request.
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# "import time:       412 |       1280 |   google.generativeai"
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s+)(\S.*)$")
+
+def parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    """
+    Parses -X importtime output into {"module", "self_ms", "cumulative_ms", "depth"}
+    rows, in the order Python printed them.
+    """
+    rows = []
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, module = match.groups()
+        rows.append({
+            "module": module.strip(),
+            "self_ms": int(self_us) / 1000,
+            "cumulative_ms": int(cumulative_us) / 1000,
+            # Nested imports are indented two spaces per level under the first
+            "depth": (len(indent) - 1) // 2,
+        })
+    return rows
+
+def profile_imports(module: str = "main") -> Dict[str, Any]:
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - start
+    if completed.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{completed.stderr[-2000:]}")
+    rows = parse_importtime(completed.stderr)
+    total = next((row["cumulative_ms"] for row in rows if row["module"] == module), None)
+    return {"module": module, "wall_ms": round(wall * 1000, 1), "import_ms": total, "modules": rows}
+
+def wait_for_status(client, url: str, deadline: float) -> Optional[float]:
+    """
+    Polls `url` until it answers 200; returns the monotonic time it did, or None.
+    """
+    import httpx
+
+    while time.monotonic() < deadline:
+        try:
+            if client.get(url).status_code == 200:
+                return time.monotonic()
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.02)
+    return None
+
+def profile_first_request(port: int, db_path: str, timeout: float) -> Dict[str, Any]:
+    import httpx
+
+    base_url = f"http://127.0.0.1:{port}"
+    spawned = time.monotonic()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+    )
+    try:
+        with httpx.Client(base_url=base_url, timeout=10) as client:
+            ready = wait_for_status(client, "/", spawned + timeout)
+            if ready is None:
+                raise RuntimeError(f"API did not answer within {timeout}s")
+            result = {"time_to_first_request_ms": round((ready - spawned) * 1000, 1)}
+            if db_path:
+                # Issued straight away, so it races the background warmup like a real first caller
+                start = time.perf_counter()
+                response = client.get(db_path)
+                result["first_db_request"] = {
+                    "path": db_path,
+                    "status": response.status_code,
+                    "latency_ms": round((time.perf_counter() - start) * 1000, 1),
+                }
+            return result
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+def print_report(imports: Dict[str, Any], server: Optional[Dict[str, Any]], top: int):
+    print(f"import {imports['module']}: {imports['import_ms']:.1f}ms "
+          f"(interpreter start to exit: {imports['wall_ms']}ms)\n")
+    print(f"{'module':<50}{'cumulative':>12}{'self':>10}")
+    ranked = sorted(imports["modules"], key=lambda row: row["cumulative_ms"], reverse=True)
+    for row in ranked[:top]:
+        print(f"{row['module']:<50}{row['cumulative_ms']:>10.1f}ms{row['self_ms']:>8.1f}ms")
+    if server:
+        print(f"\ntime to first request: {server['time_to_first_request_ms']}ms")
+        first_db = server.get("first_db_request")
+        if first_db:
+            print(f"first {first_db['path']}: {first_db['status']} in {first_db['latency_ms']}ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--db-path", default="/api/incidents/", help="first database-backed request; empty to skip")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--skip-server", action="store_true", help="only profile imports")
+    parser.add_argument("--output", help="write the full profile as JSON")
+    args = parser.parse_args()
+
+    imports = profile_imports()
+    server = None if args.skip_server else profile_first_request(args.port, args.db_path, args.timeout)
+    print_report(imports, server, args.top)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"imports": imports, "server": server}, f, indent=2)
+        print(f"\nProfile written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,14 @@
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from routes import incident_routes, agent_routes, post_routes, websocket_routes, analysis
+from routes import incident_routes, agent_routes, post_routes, websocket_routes, analysis, metrics_routes, admin_routes, archive_routes, search_routes
 from services.agent_manager import agent_manager
+from services.connection_manager import manager
+from middleware.metrics import RequestMetricsMiddleware
+from middleware.compression import CompressionMiddleware
+from middleware.profiling import ProfilingMiddleware
+from services.analysis_service import load_model
+from services.db import connect_db, disconnect_db
 
 app = FastAPI(title="FactsAura API")
 
@@ -13,6 +20,11 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(RequestMetricsMiddleware)
+# A pass-through unless PROFILING_ENABLED is set or it is switched on via /api/admin/profiling
+app.add_middleware(ProfilingMiddleware)
+# Added last so it wraps the others; responses under COMPRESSION_MIN_SIZE bytes are sent as they are
+app.add_middleware(CompressionMiddleware)
 
 # Include Routers
 # Include Routers
@@ -21,15 +33,42 @@ app.include_router(agent_routes.router)
 app.include_router(post_routes.router)
 app.include_router(websocket_routes.router)
 app.include_router(analysis.router)
+app.include_router(metrics_routes.router)
+app.include_router(admin_routes.router)
+app.include_router(archive_routes.router)
+app.include_router(search_routes.router)
+
+warmup_task = None
+
+async def warm_up():
+    """
+    Connects the database and loads the Gemini SDK in the background, so the
+    worker starts accepting requests first and the first callers rarely pay for
+    either. Anything that needs them before this finishes initializes them itself.
+    """
+    try:
+        await connect_db()
+        await asyncio.to_thread(load_model)
+    except Exception as e:
+        print(f"Warmup failed, initializing on first use instead: {e}")
 
 @app.on_event("startup")
 async def startup_event():
+    global warmup_task
+    # Join the cross-worker event bus before anything can broadcast
+    await manager.start()
     # Start the autonomous agent loop
     await agent_manager.start()
+    warmup_task = asyncio.create_task(warm_up())
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    if warmup_task:
+        warmup_task.cancel()
     await agent_manager.stop()
+    await manager.stop()
+    # Last: the agents release their shard leases through the shared client
+    await disconnect_db()
 
 @app.get("/")
 async def root():
@@ -0,0 +1,166 @@
+import os
+import zlib
+from services.metrics import registry
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional, gzip is always available
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "application/vnd.factsaura.snapshot", "text/")
+
+compressed_responses = registry.counter(
+    "factsaura_http_compressed_responses_total",
+    "HTTP responses sent compressed, by content encoding.",
+    labels=("encoding",),
+)
+compression_saved_bytes = registry.counter(
+    "factsaura_http_compression_saved_bytes_total",
+    "Body bytes saved by response compression.",
+    labels=("encoding",),
+)
+
+def choose_encoding(accept_encoding: str) -> str:
+    """
+    Picks "br" or "gzip" from an Accept-Encoding header, or "" for identity.
+    Quality values of 0 opt out; otherwise brotli is preferred when installed.
+    """
+    offered = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        offered[name.strip().lower()] = quality
+    if brotli is not None and offered.get("br", 0) > 0:
+        return "br"
+    if offered.get("gzip", 0) > 0:
+        return "gzip"
+    return ""
+
+def vary_accept_encoding(headers: list) -> list:
+    """
+    Response `headers` with Accept-Encoding added to Vary, so that caches keep
+    the compressed and identity forms of a response apart.
+    """
+    vary = b", ".join(v for k, v in headers if k.lower() == b"vary")
+    if b"accept-encoding" in vary.lower():
+        return headers
+    headers = [(k, v) for k, v in headers if k.lower() != b"vary"]
+    headers.append((b"vary", vary + b", Accept-Encoding" if vary else b"Accept-Encoding"))
+    return headers
+
+def _content_type(headers: list) -> str:
+    for k, v in headers:
+        if k.lower() == b"content-type":
+            return v.decode("latin-1")
+    return ""
+
+class _Compressor:
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        if encoding == "br":
+            self._impl = brotli.Compressor(quality=brotli_quality)
+            self._finish = self._impl.finish
+            self._compress = self._impl.process
+        else:
+            # wbits=31 writes a gzip header and trailer
+            self._impl = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+            self._finish = self._impl.flush
+            self._compress = self._impl.compress
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compress(data)
+
+    def finish(self) -> bytes:
+        return self._finish()
+
+class CompressionMiddleware:
+    """
+    Compresses HTTP responses with brotli or gzip, whichever the client accepts.
+    Bodies smaller than COMPRESSION_MIN_SIZE bytes are sent as they are: for
+    them the CPU cost outweighs the bytes saved. Streaming responses are
+    compressed chunk by chunk.
+
+    Every response of a compressible type carries Vary: Accept-Encoding, sent
+    compressed or not: its encoding depends on the request either way.
+    """
+
+    def __init__(self, app, minimum_size: int = None, gzip_level: int = None, brotli_quality: int = None):
+        self.app = app
+        self.minimum_size = minimum_size if minimum_size is not None else int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+        self.gzip_level = gzip_level if gzip_level is not None else int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+        # Quality 4 is close to gzip -6 in speed and noticeably smaller
+        self.brotli_quality = brotli_quality if brotli_quality is not None else int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        encoding = choose_encoding(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if not encoding:
+            async def send_identity(message):
+                if message["type"] == "http.response.start":
+                    start_headers = list(message.get("headers", []))
+                    if _content_type(start_headers).startswith(COMPRESSIBLE_TYPES):
+                        message = {**message, "headers": vary_accept_encoding(start_headers)}
+                await send(message)
+
+            await self.app(scope, receive, send_identity)
+            return
+
+        state = {"start": None, "compressor": None, "passthrough": False, "raw": 0, "sent": 0}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                # Held back until the first body chunk shows whether to compress
+                state["start"] = message
+                return
+            if message["type"] != "http.response.body" or state["passthrough"]:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if state["compressor"] is None:
+                start = state["start"]
+                start_headers = list(start.get("headers", []))
+                compressible = _content_type(start_headers).startswith(COMPRESSIBLE_TYPES)
+                if compressible:
+                    start_headers = vary_accept_encoding(start_headers)
+                if (
+                    not compressible
+                    or any(k.lower() == b"content-encoding" for k, _ in start_headers)
+                    or (not more_body and len(body) < self.minimum_size)
+                ):
+                    state["passthrough"] = True
+                    await send({**start, "headers": start_headers})
+                    await send(message)
+                    return
+                state["compressor"] = _Compressor(encoding, self.gzip_level, self.brotli_quality)
+                start_headers = [(k, v) for k, v in start_headers if k.lower() != b"content-length"]
+                start_headers.append((b"content-encoding", encoding.encode("latin-1")))
+                compressed = state["compressor"].compress(body)
+                if not more_body:
+                    compressed += state["compressor"].finish()
+                    start_headers.append((b"content-length", str(len(compressed)).encode("latin-1")))
+                await send({**start, "headers": start_headers})
+            else:
+                compressed = state["compressor"].compress(body)
+                if not more_body:
+                    compressed += state["compressor"].finish()
+
+            state["raw"] += len(body)
+            state["sent"] += len(compressed)
+            await send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+            if not more_body:
+                compressed_responses.inc(encoding=encoding)
+                compression_saved_bytes.inc(max(state["raw"] - state["sent"], 0), encoding=encoding)
+
+        await self.app(scope, receive, send_wrapper)
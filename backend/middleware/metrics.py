@@ -0,0 +1,44 @@
+import time
+from services.metrics import registry
+
+http_requests = registry.counter(
+    "factsaura_http_requests_total",
+    "HTTP requests handled, by route template and status code.",
+    labels=("method", "route", "status"),
+)
+http_latency = registry.histogram(
+    "factsaura_http_request_duration_seconds",
+    "Time from receiving an HTTP request to sending the last body chunk.",
+    labels=("method", "route"),
+)
+
+class RequestMetricsMiddleware:
+    """
+    Records latency and status per FastAPI route. Routes are labelled by their
+    path template (/api/posts/{post_id}), not the raw path, to keep cardinality bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            template = getattr(route, "path", None) or "unmatched"
+            method = scope.get("method", "GET")
+            http_latency.observe(time.perf_counter() - start, method=method, route=template)
+            http_requests.inc(method=method, route=template, status=str(status["code"]))
@@ -0,0 +1,58 @@
+import asyncio
+import sys
+from services.profiling import RequestProfile, current_profile, profiler, http_db_queries, http_db_time, http_over_budget
+
+class ProfilingMiddleware:
+    """
+    Per-request wall time, database query count and database time, reported in
+    a Server-Timing header and as per-route histograms. Requests over
+    PROFILING_BUDGET_MS are logged, counted, and (when stack sampling is switched
+    on through /api/admin/profiling) written out as a stack profile.
+
+    Does nothing unless PROFILING_ENABLED is set or profiling is enabled at runtime.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not profiler.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile()
+        token = current_profile.set(profile)
+        # This coroutine's frame is on the stack whenever the request's task runs
+        frame = sys._getframe()
+        sampled = profiler.begin(profile, frame)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                timing = profile.server_timing(profiler.budget).encode("latin-1")
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", timing)]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = profile.elapsed()
+            if sampled:
+                profiler.end(frame)
+            current_profile.reset(token)
+            await self.record(scope, profile, elapsed, sampled)
+
+    async def record(self, scope, profile: RequestProfile, elapsed: float, sampled: bool):
+        route = getattr(scope.get("route"), "path", None) or "unmatched"
+        method = scope.get("method", "GET")
+        http_db_queries.observe(profile.db_queries, method=method, route=route)
+        http_db_time.observe(profile.db_time, method=method, route=route)
+        if elapsed <= profiler.budget:
+            return
+        http_over_budget.inc(method=method, route=route)
+        message = (f"Slow request: {method} {route} took {elapsed * 1000:.0f}ms "
+                   f"({profile.db_queries} DB queries, {profile.db_time * 1000:.0f}ms in DB)")
+        if sampled:
+            path = await asyncio.to_thread(profiler.write_profile, method, route, profile, elapsed)
+            if path:
+                message += f", stack profile: {path}"
+        print(message)
@@ -0,0 +1,10 @@
+-- CreateTable
+CREATE TABLE "AgentLease" (
+    "shard" INTEGER NOT NULL,
+    "owner" TEXT,
+    "cursor" INTEGER NOT NULL DEFAULT 0,
+    "expiresAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    "heartbeatAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+    CONSTRAINT "AgentLease_pkey" PRIMARY KEY ("shard")
+);
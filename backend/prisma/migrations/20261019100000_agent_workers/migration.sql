@@ -0,0 +1,7 @@
+-- CreateTable
+CREATE TABLE "AgentWorker" (
+    "id" TEXT NOT NULL,
+    "expiresAt" TIMESTAMP(3) NOT NULL,
+
+    CONSTRAINT "AgentWorker_pkey" PRIMARY KEY ("id")
+);
@@ -0,0 +1,7 @@
+-- CreateTable
+CREATE TABLE "IncidentEventSeq" (
+    "incidentId" TEXT NOT NULL,
+    "seq" INTEGER NOT NULL DEFAULT 0,
+
+    CONSTRAINT "IncidentEventSeq_pkey" PRIMARY KEY ("incidentId")
+);
@@ -0,0 +1,2 @@
+-- AlterTable
+ALTER TABLE "Post" ADD COLUMN "version" INTEGER NOT NULL DEFAULT 1;
@@ -0,0 +1,5 @@
+-- CreateIndex
+CREATE INDEX "Post_incidentId_idx" ON "Post"("incidentId");
+
+-- CreateIndex
+CREATE INDEX "Comment_postId_idx" ON "Comment"("postId");
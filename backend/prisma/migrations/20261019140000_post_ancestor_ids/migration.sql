@@ -0,0 +1,17 @@
+-- AlterTable
+ALTER TABLE "Post" ADD COLUMN "ancestorIds" TEXT[] DEFAULT ARRAY[]::TEXT[];
+
+-- Backfill: walk down from the roots, each post inheriting its parent's path
+WITH RECURSIVE "chain" AS (
+    SELECT "id", ARRAY[]::TEXT[] AS "ancestors"
+    FROM "Post"
+    WHERE "parentId" IS NULL
+    UNION ALL
+    SELECT "Post"."id", "chain"."ancestors" || "Post"."parentId"
+    FROM "Post"
+    JOIN "chain" ON "Post"."parentId" = "chain"."id"
+)
+UPDATE "Post"
+SET "ancestorIds" = "chain"."ancestors"
+FROM "chain"
+WHERE "Post"."id" = "chain"."id" AND cardinality("chain"."ancestors") > 0;
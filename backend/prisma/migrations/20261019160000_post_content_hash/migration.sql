@@ -0,0 +1,16 @@
+-- AlterTable
+ALTER TABLE "Post" ADD COLUMN "contentHash" TEXT;
+
+-- Backfill with the normalization of services/fingerprint.py: ASCII letters
+-- lowercased, whitespace runs collapsed to one space, trimmed
+UPDATE "Post"
+SET "contentHash" = encode(sha256(convert_to(
+    btrim(regexp_replace(
+        translate("content", 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'),
+        '[ \t\n\r\f\v]+', ' ', 'g'
+    ), ' '),
+    'UTF8'
+)), 'hex');
+
+-- CreateIndex
+CREATE INDEX "Post_contentHash_idx" ON "Post"("contentHash");
@@ -0,0 +1,9 @@
+-- AlterTable: generated columns, so every insert path keeps them current
+ALTER TABLE "Post" ADD COLUMN "searchVector" tsvector
+    GENERATED ALWAYS AS (to_tsvector('english', "content")) STORED;
+ALTER TABLE "Comment" ADD COLUMN "searchVector" tsvector
+    GENERATED ALWAYS AS (to_tsvector('english', "content")) STORED;
+
+-- CreateIndex
+CREATE INDEX "Post_searchVector_idx" ON "Post" USING GIN ("searchVector");
+CREATE INDEX "Comment_searchVector_idx" ON "Comment" USING GIN ("searchVector");
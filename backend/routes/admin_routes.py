@@ -0,0 +1,42 @@
+import os
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException
+from pydantic import BaseModel
+from services.profiling import profiler
+from services.responses import FastJSONResponse
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """
+    Checks X-Admin-Token against ADMIN_TOKEN. Without ADMIN_TOKEN the admin
+    routes are open, like the agent controls.
+    """
+    expected = os.getenv("ADMIN_TOKEN")
+    if expected and x_admin_token != expected:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+router = APIRouter(prefix="/api/admin", tags=["admin"], default_response_class=FastJSONResponse,
+                   dependencies=[Depends(require_admin)])
+
+class ProfilingSettings(BaseModel):
+    enabled: Optional[bool] = None
+    sample_slow: Optional[bool] = None
+    budget_ms: Optional[float] = None
+
+@router.get("/profiling")
+async def get_profiling():
+    return FastJSONResponse(profiler.status())
+
+@router.post("/profiling")
+async def update_profiling(settings: ProfilingSettings):
+    """
+    Switches request profiling and slow-request stack sampling for this worker.
+    """
+    if settings.budget_ms is not None:
+        if settings.budget_ms <= 0:
+            raise HTTPException(status_code=400, detail="budget_ms must be positive")
+        profiler.budget = settings.budget_ms / 1000
+    if settings.enabled is not None:
+        profiler.enabled = settings.enabled
+    if settings.sample_slow is not None:
+        profiler.set_sampling(settings.sample_slow)
+    return FastJSONResponse(profiler.status())
@@ -1,11 +1,12 @@
 from fastapi import APIRouter
 from services.agent_manager import agent_manager
+from services.responses import FastJSONResponse
 
-router = APIRouter(prefix="/api/agent", tags=["agent"])
+router = APIRouter(prefix="/api/agent", tags=["agent"], default_response_class=FastJSONResponse)
 
 @router.get("/logs")
 async def get_agent_logs():
-    return agent_manager.get_logs()
+    return FastJSONResponse(agent_manager.get_logs())
 
 @router.post("/start")
 async def start_agent_loop():
@@ -16,3 +17,10 @@ async def start_agent_loop():
 async def stop_agent_loop():
     await agent_manager.stop()
     return {"status": "stopped"}
+
+@router.get("/shards")
+async def get_shard_status():
+    """
+    Shards (and their cursors) leased by the worker that serves this request.
+    """
+    return FastJSONResponse(agent_manager.get_shard_status())
@@ -1,10 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import List, Optional
-from prisma import Prisma
 from services.analysis_service import AnalysisService
+from services.db import connect_db
+from services.responses import FastJSONResponse
 
-router = APIRouter()
+# The scorecard partly comes from model output, so it still goes through
+# response_model validation; only the final encoding uses the fast path.
+router = APIRouter(default_response_class=FastJSONResponse)
 
 class AnalysisRequest(BaseModel):
     content: str
@@ -20,23 +23,12 @@ class TruthScorecard(BaseModel):
     related_posts: List[RelatedPost]
     analysis: str
 
-async def get_db():
-    db = Prisma()
-    await db.connect()
-    try:
-        yield db
-    finally:
-        await db.disconnect()
-
 @router.post("/api/analyze", response_model=TruthScorecard)
 async def analyze_content(request: AnalysisRequest):
-    db = Prisma()
-    await db.connect()
     try:
-        service = AnalysisService(db)
+        # Shared client: connecting per request cost a full engine handshake each time
+        service = AnalysisService(await connect_db())
         result = await service.generate_truth_scorecard(request.content)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        await db.disconnect()
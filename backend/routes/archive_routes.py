@@ -0,0 +1,60 @@
+import os
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from routes.admin_routes import require_admin
+from services.archive_service import archive_service
+from services.responses import FastJSONResponse
+
+router = APIRouter(prefix="/api/archive", tags=["archive"], default_response_class=FastJSONResponse)
+
+def _archive_path(incident_id: str) -> str:
+    try:
+        path = archive_service.path_for(incident_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Archived incident not found")
+    return path
+
+@router.get("/incidents")
+async def list_archived_incidents():
+    return FastJSONResponse(archive_service.list_archived())
+
+@router.get("/incidents/{incident_id}")
+async def stream_archived_incident(incident_id: str):
+    """
+    The archived incident as NDJSON (incident, posts, comments), streamed
+    from cold storage without restoring it.
+    """
+    _archive_path(incident_id)
+    return StreamingResponse(archive_service.stream(incident_id), media_type="application/x-ndjson")
+
+@router.post("/run", dependencies=[Depends(require_admin)])
+async def run_archival(older_than_days: Optional[float] = None):
+    return FastJSONResponse(await archive_service.run(older_than_days))
+
+@router.post("/incidents/{incident_id}", dependencies=[Depends(require_admin)])
+async def archive_incident(incident_id: str):
+    """
+    Archives one incident now. Only incidents in an ARCHIVE_STATUSES status
+    qualify; 409 when it does not, or when it changed while being archived.
+    """
+    try:
+        archive_service.path_for(incident_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        return FastJSONResponse(await archive_service.archive_incident(incident_id))
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@router.post("/incidents/{incident_id}/rehydrate", dependencies=[Depends(require_admin)])
+async def rehydrate_incident(incident_id: str):
+    _archive_path(incident_id)
+    try:
+        return FastJSONResponse(await archive_service.rehydrate(incident_id))
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
@@ -1,37 +1,38 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request
 from typing import List, Optional
 from services.incident_service import IncidentService
 from models.incident import IncidentCreate, IncidentUpdate, IncidentResponse
+from services.responses import FastJSONResponse, conditional_response, with_validators
+from services.serialization import incident_payload
 
-router = APIRouter(prefix="/api/incidents", tags=["incidents"])
+# Handlers return FastJSONResponse directly: the payload already has exactly the
+# IncidentResponse fields, so FastAPI's validate-and-encode pass is skipped.
+router = APIRouter(prefix="/api/incidents", tags=["incidents"], default_response_class=FastJSONResponse)
 service = IncidentService()
 
-@router.on_event("startup")
-async def startup():
-    await service.connect()
-
-@router.on_event("shutdown")
-async def shutdown():
-    await service.disconnect()
-
 @router.get("/", response_model=List[IncidentResponse])
-async def get_incidents(severity: Optional[str] = Query(None)):
-    return await service.get_all_incidents(severity_filter=severity)
+async def get_incidents(request: Request, severity: Optional[str] = Query(None)):
+    version = await service.get_incidents_version(severity_filter=severity)
+    not_modified = conditional_response(request, version)
+    if not_modified:
+        return not_modified
+    incidents = await service.get_all_incidents(severity_filter=severity)
+    return with_validators(FastJSONResponse([incident_payload(i) for i in incidents]), version)
 
 @router.get("/{incident_id}", response_model=IncidentResponse)
 async def get_incident(incident_id: str):
     incident = await service.get_incident_by_id(incident_id)
     if not incident:
         raise HTTPException(status_code=404, detail="Incident not found")
-    return incident
+    return FastJSONResponse(incident_payload(incident))
 
 @router.post("/", response_model=IncidentResponse)
 async def create_incident(incident: IncidentCreate):
-    return await service.create_incident(incident)
+    return FastJSONResponse(incident_payload(await service.create_incident(incident)))
 
 @router.patch("/{incident_id}", response_model=IncidentResponse)
 async def update_incident(incident_id: str, incident: IncidentUpdate):
     updated = await service.update_incident(incident_id, incident)
     if not updated:
         raise HTTPException(status_code=404, detail="Incident not found")
-    return updated
+    return FastJSONResponse(incident_payload(updated))
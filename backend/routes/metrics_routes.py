@@ -0,0 +1,12 @@
+from fastapi import APIRouter
+from fastapi.responses import Response
+from services.metrics import registry, CONTENT_TYPE
+
+router = APIRouter(prefix="/api", tags=["metrics"])
+
+@router.get("/metrics")
+async def get_metrics():
+    """
+    Pipeline and HTTP metrics for this worker in Prometheus text format.
+    """
+    return Response(content=registry.render(), media_type=CONTENT_TYPE)
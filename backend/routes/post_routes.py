@@ -1,9 +1,14 @@
-from fastapi import APIRouter, HTTPException
-from typing import List, Dict, Any
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import Response
+from datetime import datetime
+from typing import List, Dict, Any, Literal
 from services.post_service import PostService
+from services.responses import FastJSONResponse, conditional_response, with_validators
+from services.serialization import post_payload, comment_payload
+from services.snapshot import MEDIA_TYPE as SNAPSHOT_MEDIA_TYPE
 from pydantic import BaseModel
 
-router = APIRouter(prefix="/api", tags=["posts"])
+router = APIRouter(prefix="/api", tags=["posts"], default_response_class=FastJSONResponse)
 service = PostService()
 
 class PostCreate(BaseModel):
@@ -12,6 +17,15 @@ class PostCreate(BaseModel):
     incidentId: str
     parentId: str | None = None
 
+class BulkPostItem(BaseModel):
+    content: str
+    author: str
+    incidentId: str
+    parentId: str | None = None
+    # Index of an earlier item in the same request to use as the parent
+    parentRef: int | None = None
+    timestamp: datetime | None = None
+
 class VoteRequest(BaseModel):
     isCredible: bool
 
@@ -19,35 +33,110 @@ class CommentCreate(BaseModel):
     author: str
     content: str
 
-@router.on_event("startup")
-async def startup():
-    await service.connect()
+@router.get("/incidents/{incident_id}/posts")
+async def get_incident_posts(incident_id: str, request: Request):
+    # Answer revalidations from an aggregate query, before loading any posts
+    version = await service.get_posts_version(incident_id)
+    not_modified = conditional_response(request, version)
+    if not_modified:
+        return not_modified
+    posts = await service.get_posts_by_incident(incident_id)
+    return with_validators(FastJSONResponse([post_payload(p) for p in posts]), version)
 
-@router.on_event("shutdown")
-async def shutdown():
-    await service.disconnect()
+@router.get("/incidents/{incident_id}/snapshot")
+async def get_incident_snapshot(incident_id: str, request: Request, format: Literal["binary", "json"] = "binary"):
+    """
+    The incident's post tree as parallel columns (see services/snapshot.py),
+    without content. Revalidates like the post list.
+    """
+    version = await service.get_posts_version(incident_id)
+    not_modified = conditional_response(request, version)
+    if not_modified:
+        return not_modified
+    snapshot = await service.get_snapshot(incident_id, version)
+    if format == "json":
+        return with_validators(FastJSONResponse(snapshot.to_dict()), version)
+    return with_validators(Response(snapshot.encode(), media_type=SNAPSHOT_MEDIA_TYPE), version)
 
-@router.get("/incidents/{incident_id}/posts")
-async def get_incident_posts(incident_id: str):
-    return await service.get_posts_by_incident(incident_id)
+@router.get("/incidents/{incident_id}/snapshot/content")
+async def get_incident_snapshot_content(incident_id: str, request: Request,
+                                        offset: int = Query(0, ge=0), limit: int = Query(500, ge=1, le=5000)):
+    """
+    Post content for snapshot rows offset..offset+limit, as {"ids", "content"}
+    parallel arrays (ids included, in case the snapshot changed in between).
+    """
+    version = await service.get_posts_version(incident_id)
+    not_modified = conditional_response(request, version)
+    if not_modified:
+        return not_modified
+    snapshot = await service.get_snapshot(incident_id, version)
+    content = await service.get_snapshot_content(snapshot, offset, limit)
+    return with_validators(FastJSONResponse({
+        "offset": offset,
+        "count": len(snapshot),
+        "ids": snapshot.ids[offset:offset + limit],
+        "content": content,
+    }), version)
 
 @router.post("/posts")
 async def create_post(post: PostCreate):
-    return await service.create_post(post.dict())
+    return FastJSONResponse(post_payload(await service.create_post(post.dict())))
+
+@router.post("/posts/bulk")
+async def create_posts_bulk(items: List[BulkPostItem]):
+    """
+    Create many posts in one transaction (e.g. an imported thread). Items may
+    reply to earlier items through parentRef. Returns the posts in request order.
+    """
+    try:
+        posts = await service.create_posts_bulk([item.dict() for item in items])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return FastJSONResponse([post_payload(post) for post in posts])
 
 @router.get("/posts/{post_id}")
 async def get_post(post_id: str):
     post = await service.get_post_by_id(post_id)
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
-    return post
+    return FastJSONResponse(post_payload(post))
 
 @router.get("/posts/{post_id}/diff")
-async def get_post_diff(post_id: str):
-    diff_data = await service.get_post_diff(post_id)
+async def get_post_diff(post_id: str, granularity: Literal["word", "char"] = "word"):
+    """
+    Parent-to-child edit script. `diff` is in character offsets for either
+    granularity; with granularity=word, `tokens` has the same opcodes in token indices.
+    """
+    diff_data = await service.get_post_diff(post_id, granularity)
     if not diff_data:
         raise HTTPException(status_code=404, detail="Post not found")
-    return diff_data
+    return FastJSONResponse({
+        "post": post_payload(diff_data["post"]),
+        "parent": post_payload(diff_data["parent"]) if diff_data["parent"] else None,
+        "diff": diff_data["diff"],
+        "tokens": diff_data["tokens"],
+        "granularity": diff_data["granularity"],
+    })
+
+@router.get("/posts/{post_id}/lineage")
+async def get_post_lineage(post_id: str):
+    """
+    Root-to-post chain with per-hop and cumulative mutation scores.
+    """
+    lineage = await service.get_lineage(post_id)
+    if not lineage:
+        raise HTTPException(status_code=404, detail="Post not found")
+    return FastJSONResponse(lineage)
+
+@router.get("/posts/{post_id}/root")
+async def get_post_root(post_id: str):
+    """
+    The original source (patient zero) of a post and how many hops away it is.
+    """
+    result = await service.get_root(post_id)
+    if not result:
+        raise HTTPException(status_code=404, detail="Post not found")
+    return FastJSONResponse({**result, "root": post_payload(result["root"])})
 
 @router.post("/posts/{post_id}/vote")
 async def vote_on_post(post_id: str, vote: VoteRequest):
@@ -58,14 +147,19 @@ async def vote_on_post(post_id: str, vote: VoteRequest):
     updated_post = await service.vote_on_post(post_id, vote.isCredible)
     if not updated_post:
         raise HTTPException(status_code=404, detail="Post not found")
-    return updated_post
+    return FastJSONResponse(post_payload(updated_post))
 
 @router.get("/posts/{post_id}/comments")
-async def get_post_comments(post_id: str):
+async def get_post_comments(post_id: str, request: Request):
     """
     Get all comments for a post.
     """
-    return await service.get_comments(post_id)
+    version = await service.get_comments_version(post_id)
+    not_modified = conditional_response(request, version)
+    if not_modified:
+        return not_modified
+    comments = await service.get_comments(post_id)
+    return with_validators(FastJSONResponse([comment_payload(c) for c in comments]), version)
 
 @router.post("/posts/{post_id}/comments")
 async def create_comment(post_id: str, comment: CommentCreate):
@@ -77,5 +171,5 @@ async def create_comment(post_id: str, comment: CommentCreate):
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
     
-    new_comment = await service.create_comment(post_id, comment.dict())
-    return new_comment
+    new_comment = await service.create_comment(post_id, comment.dict(), post=post)
+    return FastJSONResponse(comment_payload(new_comment))
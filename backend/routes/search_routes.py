@@ -0,0 +1,31 @@
+from datetime import datetime
+from typing import Literal, Optional
+from fastapi import APIRouter, HTTPException, Query
+from services.responses import FastJSONResponse
+from services.search_service import MAX_LIMIT, search_service
+
+router = APIRouter(prefix="/api", tags=["search"], default_response_class=FastJSONResponse)
+
+@router.get("/search")
+async def search(
+    q: str = Query(..., min_length=1, max_length=500),
+    kind: Optional[Literal["post", "comment"]] = None,
+    incident_id: Optional[str] = None,
+    severity: Optional[Literal["CRITICAL", "WARNING"]] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=MAX_LIMIT),
+):
+    """
+    Ranked full-text search over posts and comments. `q` takes web search
+    syntax ("quoted phrases", -excluded, or). Pass `nextCursor` from a response
+    as `cursor` for the next page.
+    """
+    try:
+        return FastJSONResponse(await search_service.search(
+            q, kind=kind, incident_id=incident_id, severity=severity,
+            since=since, until=until, cursor=cursor, limit=limit,
+        ))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -1,11 +1,75 @@
+from typing import Optional
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 from services.connection_manager import manager
+from services.serialization import dumps, loads
 
 router = APIRouter(prefix="/api/ws", tags=["websockets"])
 
+@router.websocket("/incidents")
+async def firehose_endpoint(
+    websocket: WebSocket,
+    incidents: Optional[str] = None,
+    severity: Optional[str] = None,
+    location: Optional[str] = None,
+    status: Optional[str] = None,
+    delta: bool = False,
+):
+    """
+    One socket for many incidents. The initial subscription can be given in the
+    query string (?incidents=a,b&severity=CRITICAL); afterwards the client sends
+    {"action": "subscribe" | "unsubscribe", "incidents": [...], "filters": [{...}]}.
+    Filters select incident_created / incident_updated events; explicitly listed
+    incidents also receive their post-level events wrapped as "incident_event",
+    as post_delta frames where possible when ?delta=1 is given.
+    """
+    connection = await manager.connect_firehose(websocket, delta=delta)
+    subscription = connection.subscription
+
+    initial_filter = {k: v for k, v in {"severity": severity, "location": location, "status": status}.items() if v}
+    subscription.subscribe(
+        incident_ids=[i for i in (incidents or "").split(",") if i],
+        filters=[initial_filter] if initial_filter else [],
+    )
+    connection.offer(dumps({"type": "subscribed", "payload": subscription.describe()}))
+
+    try:
+        while True:
+            try:
+                request = loads(await websocket.receive_text())
+                action = request.get("action")
+                if action not in ("subscribe", "unsubscribe"):
+                    raise ValueError(f"Unknown action: {action}")
+                getattr(subscription, action)(
+                    incident_ids=request.get("incidents") or [],
+                    filters=request.get("filters") or [],
+                )
+                reply = {"type": "subscribed", "payload": subscription.describe()}
+            except (ValueError, AttributeError, TypeError) as e:
+                reply = {"type": "error", "payload": {"detail": str(e)}}
+            connection.offer(dumps(reply))
+    except WebSocketDisconnect:
+        manager.disconnect_firehose(websocket)
+    except Exception as e:
+        print(f"WebSocket error: {e}")
+        manager.disconnect_firehose(websocket)
+
 @router.websocket("/incidents/{incident_id}")
-async def websocket_endpoint(websocket: WebSocket, incident_id: str):
-    await manager.connect(websocket, incident_id)
+async def websocket_endpoint(
+    websocket: WebSocket,
+    incident_id: str,
+    last_seq: Optional[int] = None,
+    epoch: Optional[str] = None,
+    delta: bool = False,
+):
+    """
+    Post-level events of one incident. Every frame carries a "seq" and the
+    "epoch" it belongs to; a client that reconnects with ?last_seq=<n>&epoch=<e>
+    is sent the frames it missed, or a resync_required frame when they are older
+    than the replay buffer or the numbering has started over since.
+    With ?delta=1, post updates arrive as post_delta frames holding only the
+    changed fields plus the post id and version.
+    """
+    await manager.connect(websocket, incident_id, last_seq=last_seq, delta=delta, epoch=epoch)
     try:
         while True:
             # Keep connection alive and listen for any client messages (optional)
@@ -1,19 +1,74 @@
 import asyncio
+import os
+import time
+from collections import deque
 from typing import List, Dict, Any
 from datetime import datetime
+from services.metrics import registry
 from services.agents.scanner_agent import ScannerAgent
 from services.agents.verifier_agent import VerifierAgent
 from services.agents.publisher_agent import PublisherAgent
+from services.agents.shard_coordinator import ShardCoordinator
+
+STAGES = ("scan", "ingest", "verify", "publish")
+
+stage_latency = registry.histogram(
+    "factsaura_agent_stage_duration_seconds",
+    "Time spent in each agent pipeline stage per call (verify runs once per batch).",
+    labels=("stage",),
+)
+stage_total = registry.counter(
+    "factsaura_agent_stage_total",
+    "Posts that completed each agent pipeline stage.",
+    labels=("stage",),
+)
+stage_errors = registry.counter(
+    "factsaura_agent_errors_total",
+    "Errors raised by each agent pipeline stage.",
+    labels=("stage",),
+)
+posts_processed = registry.counter(
+    "factsaura_agent_posts_total",
+    "Posts that went through the full scan/ingest/verify/publish pipeline.",
+)
+# Export every stage from the first scrape so rate() has a zero baseline
+for _stage in STAGES:
+    stage_total.inc(0, stage=_stage)
+    stage_errors.inc(0, stage=_stage)
 
 class AgentManager:
+    RATE_WINDOW_SECONDS = 60
+
     def __init__(self):
         self.scanner = ScannerAgent()
         self.verifier = VerifierAgent()
         self.publisher = PublisherAgent()
+        self.coordinator = ShardCoordinator()
+        self.scanner.partition(self.coordinator.shard_count)
         self.is_running = False
         self.logs: List[Dict[str, Any]] = []
         self.MAX_LOGS = 50
         self._task = None
+        self._lease_task = None
+        self.batch_size = int(os.getenv("AGENT_BATCH_SIZE", "16"))
+        self._in_flight_shards = set()
+        self._completed_at = deque()
+        registry.gauge(
+            "factsaura_agent_queue_depth",
+            "Posts waiting in each shard leased by this worker.",
+            labels=("shard",),
+            collect=self._queue_depths,
+        )
+        registry.gauge(
+            "factsaura_agent_posts_per_second",
+            f"Posts fully processed per second over the last {self.RATE_WINDOW_SECONDS}s.",
+            collect=lambda: [((), self.posts_per_second())],
+        )
+        registry.gauge(
+            "factsaura_agent_running",
+            "1 while the autonomous agent loop is running.",
+            collect=lambda: [((), 1.0 if self.is_running else 0.0)],
+        )
 
     def add_log(self, agent: str, action: str, details: str):
         log_entry = {
@@ -33,47 +88,123 @@ class AgentManager:
             return
         self.is_running = True
         self._task = asyncio.create_task(self._run_loop())
-        self.add_log("SYSTEM", "Started", "Autonomous Agent Loop started.")
+        self._lease_task = asyncio.create_task(self._lease_loop())
+        self.add_log("SYSTEM", "Started", f"Autonomous Agent Loop started on worker {self.coordinator.worker_id}.")
 
     async def stop(self):
         self.is_running = False
-        if self._task:
-            self._task.cancel()
-            try:
-                await self._task
-            except asyncio.CancelledError:
-                pass
+        for task in (self._task, self._lease_task):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        try:
+            await self.coordinator.release()
+        except Exception as e:
+            print(f"[SYSTEM] Error releasing shard leases: {e}")
         self.add_log("SYSTEM", "Stopped", "Autonomous Agent Loop stopped.")
 
+    async def _lease_loop(self):
+        # Heartbeat well inside the TTL so a slow tick does not cost us the lease
+        interval = self.coordinator.lease_ttl / 3
+        while self.is_running:
+            try:
+                before = set(self.coordinator.owned)
+                await self.coordinator.rebalance(keep=self._in_flight_shards)
+                after = set(self.coordinator.owned)
+                if before != after:
+                    self.add_log("SYSTEM", "Shards", f"Now holding shards {sorted(after)}")
+            except Exception as e:
+                stage_errors.inc(stage="lease")
+                self.add_log("SYSTEM", "Error", f"Lease heartbeat failed: {e}")
+            await asyncio.sleep(interval)
+
+    def _queue_depths(self):
+        return [
+            ((str(shard),), self.scanner.pending_in_shard(shard, cursor))
+            for shard, cursor in self.coordinator.owned.items()
+        ]
+
+    def _record_completion(self):
+        now = time.monotonic()
+        self._completed_at.append(now)
+        posts_processed.inc()
+        while self._completed_at and self._completed_at[0] < now - self.RATE_WINDOW_SECONDS:
+            self._completed_at.popleft()
+
+    def posts_per_second(self) -> float:
+        cutoff = time.monotonic() - self.RATE_WINDOW_SECONDS
+        return sum(1 for t in self._completed_at if t >= cutoff) / self.RATE_WINDOW_SECONDS
+
     async def _run_loop(self):
         while self.is_running:
+            stage = "scan"
             try:
-                # 1. Scan
-                post = self.scanner.get_next_post()
-                if post:
-                    self.add_log("SCANNER", "Detected", f"New content: {post.get('id')}")
-                    
+                # 1. Scan (only shards this worker holds a lease on)
+                with stage_latency.time(stage="scan"):
+                    batch = self.scanner.get_next_batch_for_shards(self.coordinator.owned, self.batch_size)
+                if batch:
+                    self._in_flight_shards = {shard for shard, _, _ in batch}
+                    posts = [post for _, _, post in batch]
+                    stage_total.inc(len(posts), stage="scan")
+                    for shard, _, post in batch:
+                        self.add_log("SCANNER", "Detected", f"New content: {post.get('id')} (shard {shard})")
+
                     # Ensure incident and post exist in DB (ScannerAgent logic update needed)
-                    await self.scanner.process_post_db(post) 
+                    stage = "ingest"
+                    for post in posts:
+                        with stage_latency.time(stage="ingest"):
+                            await self.scanner.process_post_db(post)
+                        stage_total.inc(stage="ingest")
+
+                    # 2. Verify (mutation scores for the whole batch, parents fetched once)
+                    stage = "verify"
+                    self.add_log("VERIFIER", "Analyzing", f"Verifying {len(posts)} post(s)...")
+                    with stage_latency.time(stage="verify"):
+                        verification_results = await self.verifier.verify_batch(posts)
+                    stage_total.inc(len(posts), stage="verify")
 
-                    # 2. Verify
-                    self.add_log("VERIFIER", "Analyzing", f"Verifying {post.get('id')}...")
-                    verification_result = await self.verifier.verify(post)
-                    
                     # 3. Publish
-                    self.add_log("PUBLISHER", "Publishing", f"Result for {post.get('id')}: {verification_result.get('truth_status')}")
-                    await self.publisher.publish(verification_result)
+                    stage = "publish"
+                    for verification_result in verification_results:
+                        self.add_log("PUBLISHER", "Publishing", f"Result for {verification_result.get('post_id')}: {verification_result.get('truth_status')}")
+                        with stage_latency.time(stage="publish"):
+                            await self.publisher.publish(verification_result)
+                        stage_total.inc(stage="publish")
+                        self._record_completion()
+
+                    # 4. Commit progress. If a lease was lost meanwhile, the new owner
+                    # replays those posts; ingest and publish are both idempotent.
+                    cursors = {}
+                    for shard, position, _ in batch:
+                        cursors[shard] = max(cursors.get(shard, 0), position + 1)
+                    for shard, cursor in cursors.items():
+                        if not await self.coordinator.advance(shard, cursor):
+                            self.add_log("SYSTEM", "Lease lost", f"Shard {shard} was taken over by another worker.")
+                    self._in_flight_shards = set()
                 else:
                     # No new posts, wait a bit
                     await asyncio.sleep(2)
                 
                 await asyncio.sleep(1) # Pace the loop
             except Exception as e:
-                self.add_log("SYSTEM", "Error", str(e))
+                self._in_flight_shards = set()
+                stage_errors.inc(stage=stage)
+                self.add_log("SYSTEM", "Error", f"{stage}: {e}")
                 await asyncio.sleep(5)
 
     def get_logs(self) -> List[Dict[str, Any]]:
         return self.logs
 
+    def get_shard_status(self) -> Dict[str, Any]:
+        status = self.coordinator.get_status()
+        status["pending_posts"] = {
+            shard: self.scanner.pending_in_shard(shard, cursor)
+            for shard, cursor in self.coordinator.owned.items()
+        }
+        return status
+
 # Global instance
 agent_manager = AgentManager()
@@ -1,9 +1,14 @@
 from typing import Dict, Any
-from prisma import Prisma
+from services.db import get_db, connect_db
+from services.connection_manager import manager
+from services.serialization import post_payload, post_delta
+from services import read_cache
 
 class PublisherAgent:
-    def __init__(self):
-        self.db = Prisma()
+    @property
+    def db(self):
+        # Shared, lazily created client (services/db.py)
+        return get_db()
 
     async def publish(self, result: Dict[str, Any]):
         """
@@ -18,19 +23,28 @@ class PublisherAgent:
         
         print(f"[PublisherAgent] Published Truth Scorecard for Post {post_id}: {status}")
         
-        if not self.db.is_connected():
-            await self.db.connect()
+        await connect_db()
 
         # Update the post with verification results
         try:
-            await self.db.post.update(
+            post = await self.db.post.update(
                 where={"id": post_id},
                 data={
                     "mutationScore": mutation_score,
-                    "mutationType": mutation_type
+                    "mutationType": mutation_type,
+                    "version": {"increment": 1}
                     # Note: 'truth_status' is not in schema, so we rely on mutationScore/Type
                     # to indicate verification status to the frontend.
                 }
             )
         except Exception as e:
             print(f"[PublisherAgent] Error updating DB for post {post_id}: {e}")
+            return
+
+        if post:
+            await read_cache.invalidate(posts=[post_id], incident_posts=[post.incidentId])
+            await manager.broadcast(
+                {"type": "post_updated", "payload": post_payload(post)},
+                post.incidentId,
+                delta=post_delta(post, ("mutationScore", "mutationType"), "post_updated")
+            )
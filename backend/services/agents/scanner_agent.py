@@ -1,8 +1,14 @@
 import json
 import os
-from typing import List, Optional, Dict, Any
-from prisma import Prisma
+from typing import List, Optional, Dict, Any, Tuple
+from services.db import get_db, connect_db
 from services.incident_service import IncidentService
+from services.post_service import ancestor_path
+from services.agents.shard_coordinator import shard_for
+from services.connection_manager import manager
+from services import read_cache
+from services.parent_inference import parent_inference
+from services.fingerprint import content_hash
 from models.incident import IncidentCreate
 
 class ScannerAgent:
@@ -12,10 +18,17 @@ class ScannerAgent:
         self.posts: List[Dict[str, Any]] = []
         self.current_post_index = 0
         self.MAX_POSTS_LIMIT = 100
-        self.db = Prisma()
+        # shard -> posts of that shard, in feed order
+        self.shards: Dict[int, List[Dict[str, Any]]] = {}
+        self._last_shard = -1
         self.incident_service = IncidentService()
         self._load_data()
 
+    @property
+    def db(self):
+        # Shared, lazily created client (services/db.py)
+        return get_db()
+
     def _load_data(self):
         # Resolve absolute path relative to backend root if needed
         if not os.path.isabs(self.data_path):
@@ -36,8 +49,7 @@ class ScannerAgent:
         """
         Ensures the incident and post exist in the database.
         """
-        if not self.db.is_connected():
-            await self.db.connect()
+        await connect_db()
 
         # 1. Check/Create Incident
         incident_id = post_data.get("incident_id")
@@ -47,7 +59,7 @@ class ScannerAgent:
                 existing_incident = await self.db.incident.find_unique(where={"id": incident_id})
                 if not existing_incident:
                     # Create incident
-                    await self.db.incident.create(
+                    incident = await self.db.incident.create(
                         data={
                             "id": incident_data["id"],
                             "title": incident_data["title"],
@@ -56,6 +68,7 @@ class ScannerAgent:
                             "status": incident_data["status"]
                         }
                     )
+                    await manager.broadcast_incident_event("incident_created", incident)
 
         # 2. Check/Create Post
         post_id = post_data.get("id")
@@ -65,23 +78,47 @@ class ScannerAgent:
             parent_id = post_data.get("parent_id")
             
             # Ensure parent exists if specified (simple check, assuming order is correct in json)
+            ancestor_ids = []
             if parent_id:
                 parent_exists = await self.db.post.find_unique(where={"id": parent_id})
                 if not parent_exists:
                     print(f"Warning: Parent {parent_id} not found for post {post_id}. Skipping parent link.")
                     parent_id = None
+                else:
+                    ancestor_ids = ancestor_path(parent_exists)
+
+            parent_inferred = False
+            if not parent_id and parent_inference.enabled:
+                # No parent in the feed (or it was never ingested): infer one by similarity
+                parent_id = await parent_inference.infer(self.db, incident_id, post_data["content"])
+                if parent_id:
+                    parent = await self.db.post.find_unique(where={"id": parent_id})
+                    ancestor_ids = ancestor_path(parent) if parent else []
+                    parent_id = parent.id if parent else None
+                    parent_inferred = parent is not None
 
             await self.db.post.create(
                 data={
                     "id": post_id,
                     "content": post_data["content"],
+                    "contentHash": content_hash(post_data["content"]),
                     "author": post_data["author"],
                     "incidentId": incident_id,
                     "parentId": parent_id,
+                    "parentInferred": parent_inferred,
+                    "ancestorIds": ancestor_ids,
                     "timestamp": post_data["timestamp"]
                     # mutationScore/Type will be updated by Publisher/Verifier later
                 }
             )
+            await read_cache.invalidate(incident_posts=[incident_id])
+            parent_inference.record(incident_id, post_id, post_data["content"])
+        else:
+            parent_id = existing_post.parentId
+
+        # The verifier scores against post_data's parent, so it has to be the
+        # one actually stored (it differs when the link was skipped or inferred)
+        post_data["parent_id"] = parent_id
 
     def get_incidents(self) -> List[Dict[str, Any]]:
         return self.incidents
@@ -99,3 +136,64 @@ class ScannerAgent:
 
     def reset(self):
         self.current_post_index = 0
+
+    def partition(self, shard_count: int):
+        """
+        Splits the feed into shards by incident. All posts of an incident land in the
+        same shard and keep their feed order, so parents are still ingested before
+        their reshares.
+        """
+        self.shards = {shard: [] for shard in range(shard_count)}
+        for post in self.posts[:self.MAX_POSTS_LIMIT]:
+            self.shards[shard_for(post.get("incident_id"), shard_count)].append(post)
+        self._last_shard = -1
+
+    def pending_in_shard(self, shard: int, cursor: int) -> int:
+        return max(len(self.shards.get(shard, [])) - cursor, 0)
+
+    def get_next_post_for_shards(self, cursors: Dict[int, int]) -> Optional[Tuple[int, int, Dict[str, Any]]]:
+        """
+        Returns (shard, position, post) for the next unprocessed post in one of the
+        given shards, rotating between shards so a busy incident cannot starve the rest.
+        """
+        owned = sorted(cursors)
+        if not owned:
+            return None
+
+        start = next((i for i, shard in enumerate(owned) if shard > self._last_shard), 0)
+        for shard in owned[start:] + owned[:start]:
+            position = cursors[shard]
+            posts = self.shards.get(shard, [])
+            if position < len(posts):
+                self._last_shard = shard
+                return shard, position, posts[position]
+        return None
+
+    def get_next_batch_for_shards(self, cursors: Dict[int, int], limit: int) -> List[Tuple[int, int, Dict[str, Any]]]:
+        """
+        Returns up to `limit` (shard, position, post) entries from the given shards,
+        taking one post per shard in turn (starting after the last shard served).
+        Each shard's entries have consecutive positions from its cursor, so the
+        cursor can be advanced past the highest one once the batch is done.
+        """
+        owned = sorted(cursors)
+        if not owned or limit <= 0:
+            return []
+
+        start = next((i for i, shard in enumerate(owned) if shard > self._last_shard), 0)
+        rotation = owned[start:] + owned[:start]
+        positions = {shard: cursors[shard] for shard in rotation}
+        batch = []
+        while len(batch) < limit:
+            added = False
+            for shard in rotation:
+                posts = self.shards.get(shard, [])
+                position = positions[shard]
+                if position < len(posts) and len(batch) < limit:
+                    batch.append((shard, position, posts[position]))
+                    positions[shard] = position + 1
+                    self._last_shard = shard
+                    added = True
+            if not added:
+                break
+        return batch
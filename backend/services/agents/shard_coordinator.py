@@ -0,0 +1,217 @@
+import math
+import os
+import socket
+import uuid
+import zlib
+from typing import Dict, Iterable, Optional
+from services.db import get_db, connect_db
+
+def shard_for(incident_id: Optional[str], shard_count: int) -> int:
+    """
+    Maps an incident to a shard. Uses crc32 so every worker process agrees on the
+    mapping (Python's built-in hash() is salted per process).
+    """
+    if not incident_id:
+        return 0
+    return zlib.crc32(incident_id.encode("utf-8")) % shard_count
+
+class ShardCoordinator:
+    """
+    Splits the agent pipeline into shards and lets worker processes claim them
+    through lease rows in the AgentLease table.
+
+    Each lease carries an owner, an expiry and a cursor (the position of the next
+    unprocessed post in that shard). Owners renew their leases with heartbeats;
+    a lease that is not renewed before it expires can be taken over by any other
+    worker, which resumes from the stored cursor.
+    """
+
+    def __init__(self, shard_count: Optional[int] = None, lease_ttl: Optional[float] = None):
+        self.shard_count = shard_count or int(os.getenv("AGENT_SHARD_COUNT", "8"))
+        self.lease_ttl = lease_ttl or float(os.getenv("AGENT_LEASE_TTL_SECONDS", "30"))
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        # shard -> cursor for the leases this worker currently holds
+        self.owned: Dict[int, int] = {}
+        self._initialized = False
+
+    @property
+    def db(self):
+        # Shared, lazily created client (services/db.py)
+        return get_db()
+
+    async def connect(self):
+        await connect_db()
+
+    async def _ensure_shards(self):
+        if self._initialized:
+            return
+        await self.db.execute_raw(
+            """
+            INSERT INTO "AgentLease" ("shard", "cursor", "expiresAt", "heartbeatAt")
+            SELECT s, 0, to_timestamp(0), to_timestamp(0)
+            FROM generate_series(0, $1::int - 1) AS s
+            ON CONFLICT ("shard") DO NOTHING
+            """,
+            self.shard_count,
+        )
+        self._initialized = True
+
+    async def _announce(self):
+        """
+        Registers this worker as alive, so workers already holding every shard
+        count it when computing their fair share and hand some back.
+        """
+        await self.db.execute_raw(
+            """
+            INSERT INTO "AgentWorker" ("id", "expiresAt")
+            VALUES ($1, NOW() + ($2::float8 * INTERVAL '1 second'))
+            ON CONFLICT ("id") DO UPDATE SET "expiresAt" = EXCLUDED."expiresAt"
+            """,
+            self.worker_id,
+            self.lease_ttl,
+        )
+
+    async def _live_workers(self) -> int:
+        rows = await self.db.query_raw(
+            """
+            SELECT COUNT(*)::int AS workers FROM "AgentWorker" WHERE "expiresAt" > NOW()
+            """
+        )
+        return max(rows[0]["workers"] if rows else 0, 1)
+
+    def fair_share(self, live_workers: int) -> int:
+        return math.ceil(self.shard_count / max(live_workers, 1))
+
+    async def acquire(self) -> Dict[int, int]:
+        """
+        Claims unowned or expired shards until this worker holds its fair share.
+        FOR UPDATE SKIP LOCKED keeps concurrent claimers from grabbing the same row.
+        """
+        await self.connect()
+        await self._ensure_shards()
+        await self._announce()
+
+        wanted = self.fair_share(await self._live_workers()) - len(self.owned)
+        if wanted <= 0:
+            return self.owned
+
+        rows = await self.db.query_raw(
+            """
+            UPDATE "AgentLease"
+            SET "owner" = $1,
+                "expiresAt" = NOW() + ($2::float8 * INTERVAL '1 second'),
+                "heartbeatAt" = NOW()
+            WHERE "shard" IN (
+                SELECT "shard" FROM "AgentLease"
+                WHERE "shard" < $4::int AND ("owner" IS NULL OR "expiresAt" < NOW())
+                ORDER BY "shard"
+                LIMIT $3::int
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING "shard", "cursor"
+            """,
+            self.worker_id,
+            self.lease_ttl,
+            wanted,
+            self.shard_count,
+        )
+        for row in rows:
+            self.owned[row["shard"]] = row["cursor"]
+        return self.owned
+
+    async def heartbeat(self) -> Dict[int, int]:
+        """
+        Extends every lease this worker still holds. Leases that already expired
+        are dropped locally, since another worker may have taken them over.
+        """
+        await self.connect()
+        await self._announce()
+        if not self.owned:
+            return self.owned
+
+        rows = await self.db.query_raw(
+            """
+            UPDATE "AgentLease"
+            SET "expiresAt" = NOW() + ($2::float8 * INTERVAL '1 second'),
+                "heartbeatAt" = NOW()
+            WHERE "owner" = $1 AND "expiresAt" > NOW()
+            RETURNING "shard"
+            """,
+            self.worker_id,
+            self.lease_ttl,
+        )
+        renewed = {row["shard"] for row in rows}
+        for shard in list(self.owned):
+            if shard not in renewed:
+                del self.owned[shard]
+        return self.owned
+
+    async def rebalance(self, keep: Iterable[int] = ()) -> Dict[int, int]:
+        """
+        Renews held leases, hands back shards above the fair share so newly started
+        workers can pick them up, then claims any free shards. `keep` are shards with
+        posts in flight; they are never handed back mid-batch.
+        """
+        await self.heartbeat()
+        target = self.fair_share(await self._live_workers())
+        keep = set(keep)
+        surplus = [shard for shard in sorted(self.owned, reverse=True) if shard not in keep]
+        for shard in surplus[: max(len(self.owned) - target, 0)]:
+            await self.release(shard)
+        return await self.acquire()
+
+    async def advance(self, shard: int, cursor: int) -> bool:
+        """
+        Records progress in a shard. The update is fenced on ownership and expiry,
+        so a worker that lost its lease cannot move the cursor of the new owner.
+        """
+        count = await self.db.execute_raw(
+            """
+            UPDATE "AgentLease"
+            SET "cursor" = $3::int
+            WHERE "shard" = $1::int AND "owner" = $2 AND "expiresAt" > NOW() AND "cursor" < $3::int
+            """,
+            shard,
+            self.worker_id,
+            cursor,
+        )
+        if count:
+            self.owned[shard] = cursor
+            return True
+        self.owned.pop(shard, None)
+        return False
+
+    async def release(self, shard: Optional[int] = None):
+        """
+        Gives up one shard, or every shard held by this worker when none is given.
+        """
+        shards = [shard] if shard is not None else list(self.owned)
+        for s in shards:
+            self.owned.pop(s, None)
+        if not self.db.is_connected():
+            return
+        if shard is None:
+            await self.db.execute_raw(
+                """
+                DELETE FROM "AgentWorker" WHERE "id" = $1 OR "expiresAt" < NOW()
+                """,
+                self.worker_id,
+            )
+        for s in shards:
+            await self.db.execute_raw(
+                """
+                UPDATE "AgentLease"
+                SET "owner" = NULL, "expiresAt" = NOW()
+                WHERE "shard" = $1::int AND "owner" = $2
+                """,
+                s,
+                self.worker_id,
+            )
+
+    def get_status(self) -> Dict[str, object]:
+        return {
+            "worker_id": self.worker_id,
+            "shard_count": self.shard_count,
+            "lease_ttl": self.lease_ttl,
+            "owned_shards": dict(sorted(self.owned.items())),
+        }
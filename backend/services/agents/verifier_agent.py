@@ -1,17 +1,78 @@
-from typing import Dict, Any, Optional
+import os
+from typing import Dict, Any, List, Optional
+from services.db import get_db, connect_db
+from services.cache import LRUCache
+from services.post_service import PostService
 
 class VerifierAgent:
-    def __init__(self):
-        pass
+    def __init__(self, cache_size: Optional[int] = None):
+        self.post_service = PostService()
+        # post id -> content, so deep reshare chains resolve their parents without a query per hop
+        self.parent_cache = LRUCache(cache_size or int(os.getenv("VERIFIER_PARENT_CACHE_SIZE", "4096")))
+
+    @property
+    def db(self):
+        # Shared, lazily created client (services/db.py)
+        return get_db()
+
+    async def _load_parents(self, posts: List[Dict[str, Any]]):
+        """
+        Fetches the content of every parent that is neither cached nor part of this
+        batch with a single query.
+        """
+        in_batch = {post.get("id") for post in posts}
+        missing = {
+            post["parent_id"] for post in posts
+            if post.get("parent_id")
+            and post["parent_id"] not in in_batch
+            and post["parent_id"] not in self.parent_cache
+        }
+        if not missing:
+            return
+
+        await connect_db()
+        parents = await self.db.post.find_many(where={"id": {"in": list(missing)}})
+        for parent in parents:
+            self.parent_cache.put(parent.id, parent.content)
+
+    def _score(self, post: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Mutation score and type against the parent's content. Posts without a
+        (known) parent are roots and have not mutated.
+        """
+        parent_id = post.get("parent_id")
+        parent_content = self.parent_cache.get(parent_id) if parent_id else None
+        self.parent_cache.put(post.get("id"), post.get("content", ""))
+
+        if parent_content is None:
+            return {"mutation_score": 0.0, "mutation_type": None}
+
+        score = self.post_service.calculate_mutation_score(parent_content, post.get("content", ""))
+        return {
+            "mutation_score": score,
+            "mutation_type": self.post_service.classify_mutation(score),
+        }
 
     async def verify(self, post: Dict[str, Any]) -> Dict[str, Any]:
         """
         Analyzes a post to determine its truthfulness.
         In simulation/demo mode, this relies on the 'truth_status' field in the post data.
         """
+        results = await self.verify_batch([post])
+        return results[0]
+
+    async def verify_batch(self, posts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Verifies several posts at once. Parents are resolved in one query, and posts
+        are scored in order so a reshare can use a parent from earlier in the batch.
+        """
+        await self._load_parents(posts)
+        return [self._build_result(post, self._score(post)) for post in posts]
+
+    def _build_result(self, post: Dict[str, Any], scores: Dict[str, Any]) -> Dict[str, Any]:
         truth_status = post.get("truth_status", "UNKNOWN")
-        mutation_score = post.get("mutation_score", 0.0)
-        mutation_type = post.get("mutation_type")
+        mutation_score = scores["mutation_score"]
+        mutation_type = scores["mutation_type"]
 
         # Simulate analysis result
         result = {
@@ -28,10 +89,10 @@ class VerifierAgent:
             result["explanation"] = "Content matches verified sources. No significant mutations detected."
         elif truth_status == "EXAGGERATED":
             result["confidence_score"] = 0.75
-            result["explanation"] = f"Content shows signs of emotional manipulation ({mutation_type}). Mutation score: {mutation_score}."
+            result["explanation"] = f"Content shows signs of emotional manipulation ({mutation_type}). Mutation score: {mutation_score:.1f}."
         elif truth_status == "FALSE":
             result["confidence_score"] = 0.90
-            result["explanation"] = f"Content contradicts known facts. High mutation score ({mutation_score}) indicates fabrication."
+            result["explanation"] = f"Content contradicts known facts. High mutation score ({mutation_score:.1f}) indicates fabrication."
         else:
             result["confidence_score"] = 0.50
             result["explanation"] = "Insufficient data to verify this claim."
@@ -1,20 +1,68 @@
+import asyncio
 import os
 import Levenshtein
-import google.generativeai as genai
-from typing import List, Optional, Dict, Any
-from prisma import Prisma
-from prisma.models import Post
+from typing import TYPE_CHECKING, Iterable, List, Optional, Dict, Any
+from services.archive_service import ARCHIVE_SEARCH_ENABLED, archive_service
+from services.fingerprint import content_hash
 
-class AnalysisService:
-    def __init__(self, db: Prisma):
-        self.db = db
-        self.api_key = os.getenv("GEMINI_API_KEY")
-        if self.api_key:
-            genai.configure(api_key=self.api_key)
-            self.model = genai.GenerativeModel('gemini-2.0-flash')
+if TYPE_CHECKING:
+    from prisma import Prisma
+
+# google.generativeai pulls in grpc and protobuf and takes a second or more to
+# import, so it is loaded on first use (or by the startup warmup in main.py)
+_model = None
+_model_loaded = False
+
+def load_model():
+    """
+    Returns the process-wide Gemini model, importing and configuring the SDK on
+    the first call. None when GEMINI_API_KEY is not set.
+    """
+    global _model, _model_loaded
+    if not _model_loaded:
+        api_key = os.getenv("GEMINI_API_KEY")
+        if api_key:
+            import google.generativeai as genai
+
+            genai.configure(api_key=api_key)
+            _model = genai.GenerativeModel('gemini-2.0-flash')
         else:
             print("WARNING: GEMINI_API_KEY not found in environment variables.")
-            self.model = None
+        _model_loaded = True
+    return _model
+
+def rank_similar_posts(content: str, posts: Iterable[Any], threshold: float = 0.8) -> List[Dict[str, Any]]:
+    """
+    Scores `posts` against `content` with the Levenshtein ratio and returns those
+    at or above `threshold` as {"post", "similarity"} dicts, most similar first.
+    """
+    matches = []
+    for post in posts:
+        similarity = Levenshtein.ratio(content, post.content)
+        if similarity >= threshold:
+            matches.append({
+                "post": post,
+                "similarity": similarity
+            })
+
+    # Sort by similarity (highest first)
+    matches.sort(key=lambda x: x["similarity"], reverse=True)
+    return matches
+
+class AnalysisService:
+    def __init__(self, db: "Prisma"):
+        self.db = db
+
+    async def find_exact_matches(self, content: str, limit: int = 3) -> List[Any]:
+        """
+        Posts whose content equals `content` up to letter case and whitespace,
+        oldest first, from the indexed contentHash column.
+        """
+        return await self.db.post.find_many(
+            where={"contentHash": content_hash(content)},
+            order={"createdAt": "asc"},
+            take=limit,
+        )
 
     async def find_similar_posts(self, content: str, threshold: float = 0.8) -> List[Dict[str, Any]]:
         """
@@ -24,25 +72,15 @@ class AnalysisService:
         # In a real production app with millions of posts, we would use a vector database (e.g., pgvector, Pinecone).
         # For this hackathon/demo, fetching all posts and computing distance in-memory is acceptable for small datasets.
         all_posts = await self.db.post.find_many()
-        
-        matches = []
-        for post in all_posts:
-            similarity = Levenshtein.ratio(content, post.content)
-            if similarity >= threshold:
-                matches.append({
-                    "post": post,
-                    "similarity": similarity
-                })
-        
-        # Sort by similarity (highest first)
-        matches.sort(key=lambda x: x["similarity"], reverse=True)
-        return matches
+        return rank_similar_posts(content, all_posts, threshold)
 
     async def analyze_new_content(self, content: str) -> Dict[str, Any]:
         """
         Uses Gemini API to analyze content for potential misinformation and risk.
         """
-        if not self.model:
+        # The import blocks, so a cold load runs off the event loop
+        model = _model if _model_loaded else await asyncio.to_thread(load_model)
+        if not model:
             return {
                 "risk_level": "UNKNOWN",
                 "confidence": 0.0,
@@ -63,7 +101,7 @@ class AnalysisService:
         """
 
         try:
-            response = await self.model.generate_content_async(prompt)
+            response = await model.generate_content_async(prompt)
             # Simple cleanup to ensure we get valid JSON if the model wraps it in markdown
             text = response.text.strip()
             if text.startswith("```json"):
@@ -81,32 +119,51 @@ class AnalysisService:
                 "analysis": f"Error during analysis: {str(e)}"
             }
 
+    def _known_content_result(self, matches: List[Dict[str, Any]], analysis: str) -> Dict[str, Any]:
+        top_match = matches[0]
+        return {
+            "match_percentage": int(top_match["similarity"] * 100),
+            "risk_level": "HIGH" if top_match["similarity"] > 0.9 else "MEDIUM", # If it matches known misinformation, it's risky
+            "related_posts": [
+                {
+                    "id": m["post"].id,
+                    "title": f"Post {m['post'].id[:8]}...", # Using ID as title substitute for now if title missing
+                    "similarity": m["similarity"]
+                } for m in matches[:3]
+            ],
+            "analysis": analysis
+        }
+
     async def generate_truth_scorecard(self, content: str) -> Dict[str, Any]:
         """
         Orchestrates the verification process:
-        1. Checks for similar existing posts (Known Misinformation).
-        2. If no matches, analyzes content using AI.
+        1. Checks for exact copies of existing posts (normalized content hash).
+        2. Checks for similar existing posts (Known Misinformation).
+        3. Optionally (ARCHIVE_SEARCH_ENABLED), checks archived incidents the same way.
+        4. If no matches, analyzes content using AI.
         """
-        # Step 1: Check for existing matches
+        # Step 1: Copy-paste duplicates are the common case: one indexed lookup
+        exact = await self.find_exact_matches(content)
+        if exact:
+            return self._known_content_result(
+                [{"post": post, "similarity": 1.0} for post in exact],
+                "Exact copy of existing content in our knowledge base.",
+            )
+
+        # Step 2: Check for similar existing posts
         matches = await self.find_similar_posts(content, threshold=0.8)
         
         if matches:
             # Found known content
-            top_match = matches[0]
-            return {
-                "match_percentage": int(top_match["similarity"] * 100),
-                "risk_level": "HIGH" if top_match["similarity"] > 0.9 else "MEDIUM", # If it matches known misinformation, it's risky
-                "related_posts": [
-                    {
-                        "id": m["post"].id,
-                        "title": f"Post {m['post'].id[:8]}...", # Using ID as title substitute for now if title missing
-                        "similarity": m["similarity"]
-                    } for m in matches[:3]
-                ],
-                "analysis": "Matches existing content in our knowledge base."
-            }
+            return self._known_content_result(matches, "Matches existing content in our knowledge base.")
+
+        # Step 3: Cold storage is read from disk, so it is only searched when asked for
+        if ARCHIVE_SEARCH_ENABLED:
+            archived = await archive_service.find_similar(content, threshold=0.8)
+            if archived:
+                return self._known_content_result(archived, "Matches archived content from a resolved incident.")
         
-        # Step 2: Analyze new content
+        # Step 4: Analyze new content
         ai_result = await self.analyze_new_content(content)
         
         return {
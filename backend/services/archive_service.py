@@ -0,0 +1,304 @@
+"""
+Cold storage for resolved incidents.
+
+An archived incident is one gzip-compressed NDJSON file, ARCHIVE_DIR/<incident id>.ndjson.gz:
+the incident on the first line, then its posts (parents before children), then
+their comments, one {"kind": ..., "row": {...}} object per line. Once the file is
+safely written the rows are deleted from the hot tables; rehydrating streams
+them back in.
+
+Run the archival job once (e.g. from cron) with: python -m services.archive_service
+"""
+import asyncio
+import gzip
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Dict, Iterator, List, NamedTuple, Optional
+from Levenshtein import ratio
+from services.cache import LRUCache
+from services.connection_manager import manager
+from services.db import get_db, connect_db
+from services.fingerprint import content_hash
+from services.metrics import registry
+from services.parent_inference import parent_inference
+from services.serialization import COMMENT_FIELDS, INCIDENT_FIELDS, POST_FIELDS, dumps, loads
+from services import read_cache
+
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archive")
+ARCHIVE_STATUSES = [s.strip() for s in os.getenv("ARCHIVE_STATUSES", "RESOLVED,CLOSED").split(",") if s.strip()]
+ARCHIVE_AFTER_DAYS = float(os.getenv("ARCHIVE_AFTER_DAYS", "7"))
+ARCHIVE_SEARCH_ENABLED = os.getenv("ARCHIVE_SEARCH_ENABLED", "").lower() in ("1", "true", "yes")
+# Rows per create_many when rehydrating
+REHYDRATE_CHUNK = 1000
+TRANSACTION_TIMEOUT = timedelta(seconds=float(os.getenv("ARCHIVE_TX_TIMEOUT_SECONDS", "60")))
+
+# Archives keep the columns the API leaves out, so a rehydrated row is identical
+ARCHIVE_POST_FIELDS = POST_FIELDS + ("ancestorIds", "contentHash")
+DATETIME_FIELDS = ("timestamp", "createdAt", "updatedAt")
+
+archived_incidents = registry.counter(
+    "factsaura_archived_incidents_total",
+    "Incidents moved to cold storage, and rehydrated back, by operation.",
+    labels=("operation",),
+)
+
+class ArchivedPost(NamedTuple):
+    id: str
+    incidentId: str
+    content: str
+    contentHash: Optional[str]
+
+def _row(record: Any, fields) -> Dict[str, Any]:
+    row = {}
+    for field in fields:
+        value = getattr(record, field, None)
+        row[field] = getattr(value, "value", value)  # enums as their names
+    return row
+
+def _parse_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    for field in DATETIME_FIELDS:
+        if isinstance(row.get(field), str):
+            row[field] = datetime.fromisoformat(row[field])
+    return row
+
+def _iter_lines(path: str) -> Iterator[Dict[str, Any]]:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield loads(line)
+
+class ArchiveService:
+    def __init__(self, archive_dir: Optional[str] = None):
+        self.archive_dir = archive_dir or ARCHIVE_DIR
+        # path -> (mtime, [ArchivedPost]) for archive search
+        self._search_cache = LRUCache(int(os.getenv("ARCHIVE_SEARCH_CACHE_FILES", "64")))
+
+    @property
+    def db(self):
+        # Shared, lazily created client (services/db.py)
+        return get_db()
+
+    def path_for(self, incident_id: str) -> str:
+        if not incident_id or os.path.basename(incident_id) != incident_id or incident_id.startswith("."):
+            raise ValueError(f"Invalid incident id: {incident_id!r}")
+        return os.path.join(self.archive_dir, f"{incident_id}.ndjson.gz")
+
+    def list_archived(self) -> List[Dict[str, Any]]:
+        if not os.path.isdir(self.archive_dir):
+            return []
+        archived = []
+        for name in sorted(os.listdir(self.archive_dir)):
+            if not name.endswith(".ndjson.gz"):
+                continue
+            path = os.path.join(self.archive_dir, name)
+            archived.append({
+                "incidentId": name[:-len(".ndjson.gz")],
+                "bytes": os.path.getsize(path),
+                "archivedAt": datetime.fromtimestamp(os.path.getmtime(path), timezone.utc),
+            })
+        return archived
+
+    def _write(self, path: str, incident: Dict[str, Any], posts: List[Dict[str, Any]], comments: List[Dict[str, Any]]):
+        os.makedirs(self.archive_dir, exist_ok=True)
+        temporary = path + ".tmp"
+        with gzip.open(temporary, "wt", encoding="utf-8") as f:
+            f.write(dumps({"kind": "incident", "row": incident}) + "\n")
+            for post in posts:
+                f.write(dumps({"kind": "post", "row": post}) + "\n")
+            for comment in comments:
+                f.write(dumps({"kind": "comment", "row": comment}) + "\n")
+        with open(temporary, "rb") as f:
+            os.fsync(f.fileno())
+        # Only a complete file ever carries the final name
+        os.replace(temporary, path)
+
+    async def archive_incident(self, incident_id: str) -> Dict[str, Any]:
+        """
+        Writes the incident, its posts and their comments to cold storage, then
+        deletes them from the database. Raises LookupError if the incident does
+        not exist, and ValueError if it cannot be archived: it is not in an
+        ARCHIVE_STATUSES status, other incidents reply to it, or it received
+        posts or comments while it was being archived.
+        """
+        await connect_db()
+        path = self.path_for(incident_id)
+        incident = await self.db.incident.find_unique(where={"id": incident_id})
+        if not incident:
+            raise LookupError(f"Incident {incident_id} not found")
+        status = getattr(incident.status, "value", incident.status)
+        if status not in ARCHIVE_STATUSES:
+            raise ValueError(
+                f"Incident {incident_id} is {status}; only {', '.join(ARCHIVE_STATUSES)} incidents are archived"
+            )
+        posts = await self.db.post.find_many(where={"incidentId": incident_id})
+        post_ids = [post.id for post in posts]
+        comments = await self.db.comment.find_many(where={"postId": {"in": post_ids}}) if post_ids else []
+        comment_ids = [comment.id for comment in comments]
+        if post_ids:
+            outside = await self.db.post.count(where={"parentId": {"in": post_ids}, "NOT": {"incidentId": incident_id}})
+            if outside:
+                raise ValueError(f"{outside} post(s) in other incidents reply to posts of incident {incident_id}")
+
+        # Parents first, so rehydrating can insert in file order
+        posts.sort(key=lambda post: (len(post.ancestorIds or []), post.createdAt))
+        await asyncio.to_thread(
+            self._write, path,
+            _row(incident, INCIDENT_FIELDS),
+            [_row(post, ARCHIVE_POST_FIELDS) for post in posts],
+            [_row(comment, COMMENT_FIELDS) for comment in comments],
+        )
+
+        try:
+            async with self.db.tx(timeout=TRANSACTION_TIMEOUT) as transaction:
+                # Only the rows in the file are deleted; anything written since they
+                # were read makes the counts differ and rolls the whole delete back
+                deleted = await transaction.comment.delete_many(where={"id": {"in": comment_ids}}) if comment_ids else 0
+                late = await transaction.comment.count(where={"postId": {"in": post_ids}}) if post_ids else 0
+                if deleted != len(comment_ids) or late:
+                    raise ValueError(f"Comments of incident {incident_id} changed while it was being archived")
+                if post_ids:
+                    # One statement: the parent foreign key is checked once the whole tree is gone
+                    deleted = await transaction.post.delete_many(where={"id": {"in": post_ids}})
+                    if deleted != len(post_ids):
+                        raise ValueError(f"Posts of incident {incident_id} changed while it was being archived")
+                late = await transaction.post.count(where={"incidentId": incident_id})
+                if late:
+                    raise ValueError(f"{late} post(s) were added to incident {incident_id} while it was being archived")
+                await transaction.incident.delete(where={"id": incident_id})
+        except Exception:
+            # The rows are still there: drop the file so the incident is not in both places
+            os.remove(path)
+            raise
+
+        parent_inference.indexes.pop(incident_id)
+        await read_cache.invalidate(incidents=[incident_id], posts=post_ids, incident_posts=[incident_id])
+        await manager.broadcast_incident_event("incident_archived", incident)
+        archived_incidents.inc(operation="archive")
+        print(f"[Archive] Archived incident {incident_id}: {len(posts)} posts, {len(comments)} comments -> {path}")
+        return {"incidentId": incident_id, "posts": len(posts), "comments": len(comments), "path": path}
+
+    async def run(self, older_than_days: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Archives every incident in an ARCHIVE_STATUSES status that has not been
+        updated for `older_than_days` (ARCHIVE_AFTER_DAYS by default).
+        """
+        await connect_db()
+        days = ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+        cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+        incidents = await self.db.incident.find_many(
+            where={"status": {"in": ARCHIVE_STATUSES}, "updatedAt": {"lt": cutoff}}
+        )
+        results = []
+        for incident in incidents:
+            try:
+                results.append(await self.archive_incident(incident.id))
+            except Exception as e:
+                print(f"[Archive] Skipped incident {incident.id}: {e}")
+                results.append({"incidentId": incident.id, "error": str(e)})
+        return results
+
+    async def stream(self, incident_id: str) -> AsyncIterator[bytes]:
+        """
+        The archived NDJSON, decompressed, in chunks (for review without restoring).
+        """
+        path = self.path_for(incident_id)
+        f = await asyncio.to_thread(gzip.open, path, "rb")
+        try:
+            while True:
+                chunk = await asyncio.to_thread(f.read, 64 * 1024)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            f.close()
+
+    async def rehydrate(self, incident_id: str) -> Dict[str, Any]:
+        """
+        Streams an archived incident back into the database in one transaction,
+        then removes the archive file. The incident's updatedAt is set to now so
+        the archival job leaves it alone for another ARCHIVE_AFTER_DAYS.
+        """
+        await connect_db()
+        path = self.path_for(incident_id)
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        if await self.db.incident.find_unique(where={"id": incident_id}):
+            raise ValueError(f"Incident {incident_id} is already in the database")
+
+        lines = _iter_lines(path)
+        counts = {"post": 0, "comment": 0}
+
+        def next_chunk():
+            return [line for _, line in zip(range(REHYDRATE_CHUNK), lines)]
+
+        async with self.db.tx(timeout=TRANSACTION_TIMEOUT) as transaction:
+            incident = None
+            while True:
+                chunk = await asyncio.to_thread(next_chunk)
+                if not chunk:
+                    break
+                batches = {"post": [], "comment": []}
+                for line in chunk:
+                    row = _parse_row(line["row"])
+                    if line["kind"] == "incident":
+                        row["updatedAt"] = datetime.now(timezone.utc)
+                        incident = await transaction.incident.create(data=row)
+                    else:
+                        batches[line["kind"]].append(row)
+                # Posts come before comments in the file, and parents before children
+                if batches["post"]:
+                    await transaction.post.create_many(data=batches["post"])
+                if batches["comment"]:
+                    await transaction.comment.create_many(data=batches["comment"])
+                counts["post"] += len(batches["post"])
+                counts["comment"] += len(batches["comment"])
+
+        os.remove(path)
+        self._search_cache.pop(path)
+        await read_cache.invalidate(incidents=[incident_id], incident_posts=[incident_id])
+        if incident:
+            await manager.broadcast_incident_event("incident_created", incident)
+        archived_incidents.inc(operation="rehydrate")
+        return {"incidentId": incident_id, "posts": counts["post"], "comments": counts["comment"]}
+
+    def _archived_posts(self, path: str) -> List[ArchivedPost]:
+        mtime = os.path.getmtime(path)
+        cached = self._search_cache.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        posts = [
+            ArchivedPost(line["row"]["id"], line["row"]["incidentId"], line["row"]["content"], line["row"].get("contentHash"))
+            for line in _iter_lines(path) if line["kind"] == "post"
+        ]
+        self._search_cache.put(path, (mtime, posts))
+        return posts
+
+    def _search(self, content: str, threshold: float) -> List[Dict[str, Any]]:
+        digest = content_hash(content)
+        matches = []
+        for archived in self.list_archived():
+            for post in self._archived_posts(self.path_for(archived["incidentId"])):
+                similarity = 1.0 if post.contentHash == digest else ratio(content, post.content)
+                if similarity >= threshold:
+                    matches.append({"post": post, "similarity": similarity})
+        matches.sort(key=lambda m: m["similarity"], reverse=True)
+        return matches
+
+    async def find_similar(self, content: str, threshold: float = 0.8) -> List[Dict[str, Any]]:
+        """
+        Archived posts similar to `content` as {"post", "similarity"} dicts (like
+        rank_similar_posts), most similar first. Reads the archive files (parsed
+        posts are cached per file) off the event loop.
+        """
+        return await asyncio.to_thread(self._search, content, threshold)
+
+# Global instance
+archive_service = ArchiveService()
+
+async def main():
+    results = await archive_service.run()
+    print(f"[Archive] {sum('error' not in r for r in results)} incident(s) archived, "
+          f"{sum('error' in r for r in results)} skipped")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,111 @@
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+from services.metrics import registry
+
+_MISSING = object()
+
+class LRUCache:
+    """
+    Size-bounded mapping that evicts the least recently used entry once full.
+    Not thread-safe; every caller lives on the event loop.
+    """
+
+    def __init__(self, max_size: int = 1024):
+        if max_size <= 0:
+            raise ValueError("max_size must be positive")
+        self.max_size = max_size
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        value = self._data.get(key, _MISSING)
+        if value is _MISSING:
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def put(self, key: Hashable, value: Any):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        return self._data.pop(key, default)
+
+    def clear(self):
+        self._data.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+cache_requests = registry.counter(
+    "factsaura_cache_requests_total",
+    "Read-through cache lookups, by cache and result (hit or miss).",
+    labels=("cache", "result"),
+)
+cache_invalidations = registry.counter(
+    "factsaura_cache_invalidations_total",
+    "Read-through cache invalidations, by cache and source (local write or event bus).",
+    labels=("cache", "source"),
+)
+
+class ReadThroughCache:
+    """
+    LRU cache in front of a loader coroutine. Writers call invalidate() after
+    committing; a load that was in flight when its key got invalidated may have
+    read the old row, so its result is returned but not stored. Entries also
+    expire after `ttl` seconds, if given.
+    """
+
+    def __init__(self, name: str, max_size: int, ttl: Optional[float] = None):
+        self.name = name
+        self.ttl = ttl
+        # key -> (expires at, value)
+        self.entries = LRUCache(max_size)
+        self._loading: Dict[Hashable, object] = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self.entries.get(key)
+        if entry is not None and (entry[0] is None or entry[0] > time.monotonic()):
+            self.hits += 1
+            cache_requests.inc(cache=self.name, result="hit")
+            return entry[1]
+
+        self.misses += 1
+        cache_requests.inc(cache=self.name, result="miss")
+        token = object()
+        self._loading[key] = token
+        try:
+            value = await loader()
+        finally:
+            still_valid = self._loading.get(key) is token
+            if still_valid:
+                del self._loading[key]
+        # Misses are not cached: the row may be created at any moment
+        if still_valid and value is not None:
+            expires = time.monotonic() + self.ttl if self.ttl else None
+            self.entries.put(key, (expires, value))
+        return value
+
+    def invalidate(self, key: Hashable, source: str = "local"):
+        self.entries.pop(key)
+        self._loading.pop(key, None)
+        self.invalidations += 1
+        cache_invalidations.inc(cache=self.name, source=source)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
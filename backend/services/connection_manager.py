@@ -1,31 +1,361 @@
+import asyncio
+import os
+import time
+from collections import deque
 from fastapi import WebSocket
-from typing import List, Dict
+from typing import Any, Dict, Iterable, List, Optional, Set
+from services.metrics import registry
+from services.serialization import dumps, incident_payload
+from services.event_bus import EventBus, create_event_bus
+from services.event_coalescer import EventCoalescer
+from services.cache import LRUCache
+
+ws_evictions = registry.counter(
+    "factsaura_ws_evictions_total",
+    "Connections dropped or downgraded because their send queue overflowed, or removed after a failed send.",
+    labels=("reason",),
+)
+ws_resumes = registry.counter(
+    "factsaura_ws_resumes_total",
+    "Reconnects that passed last_seq, by outcome (replayed, up_to_date, resync).",
+    labels=("outcome",),
+)
+ws_fanout_latency = registry.histogram(
+    "factsaura_ws_broadcast_enqueue_seconds",
+    "Time for broadcast() to hand a message to every subscriber's send queue.",
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5),
+)
+
+RESYNC_FRAME = dumps({"type": "resync_required", "payload": {"reason": "slow_consumer"}})
+REPLAY_GAP_FRAME = dumps({"type": "resync_required", "payload": {"reason": "replay_gap"}})
+
+class ClientConnection:
+    """
+    One subscriber socket with its own bounded outbound queue and writer task,
+    so a slow or stalled client only ever delays itself.
+    """
+
+    def __init__(self, websocket: WebSocket, incident_id: Optional[str], max_queue: int, delta: bool = False):
+        self.websocket = websocket
+        self.incident_id = incident_id
+        # Client asked for post_delta frames instead of full post updates
+        self.delta = delta
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.task: Optional[asyncio.Task] = None
+
+    def offer(self, frame: str) -> bool:
+        try:
+            self.queue.put_nowait(frame)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def reset_queue(self, frame: str):
+        """
+        Throws away everything that is still queued and leaves only `frame`.
+        """
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(frame)
+
+class FirehoseSubscription:
+    """
+    What a multiplexed (firehose) socket wants to hear about: explicit incident ids,
+    whose post-level events are forwarded, and filters on incident attributes that
+    select incident-level events (incident_created / incident_updated).
+    An empty filter matches every incident.
+    """
+    FILTER_KEYS = ("severity", "location", "status")
 
-class ConnectionManager:
     def __init__(self):
-        # Map incident_id to list of active WebSockets
-        self.active_connections: Dict[str, List[WebSocket]] = {}
+        self.incident_ids = set()
+        self.filters: List[Dict[str, str]] = []
+
+    def _clean_filters(self, filters: Iterable[Dict[str, Any]]) -> List[Dict[str, str]]:
+        cleaned = []
+        for f in filters:
+            unknown = set(f) - set(self.FILTER_KEYS)
+            if unknown:
+                raise ValueError(f"Unsupported filter keys: {sorted(unknown)}")
+            cleaned.append({k: str(v) for k, v in f.items() if v is not None})
+        return cleaned
+
+    def subscribe(self, incident_ids: Iterable[str] = (), filters: Iterable[Dict[str, Any]] = ()):
+        filters = self._clean_filters(filters)
+        self.incident_ids.update(incident_ids)
+        self.filters.extend(f for f in filters if f not in self.filters)
 
-    async def connect(self, websocket: WebSocket, incident_id: str):
+    def unsubscribe(self, incident_ids: Iterable[str] = (), filters: Iterable[Dict[str, Any]] = ()):
+        filters = self._clean_filters(filters)
+        self.incident_ids.difference_update(incident_ids)
+        self.filters = [f for f in self.filters if f not in filters]
+
+    def _filter_matches(self, f: Dict[str, str], attrs: Dict[str, Any]) -> bool:
+        for key, expected in f.items():
+            value = attrs.get(key)
+            if value is None:
+                return False
+            if key == "location":
+                if expected.lower() not in str(value).lower():
+                    return False
+            elif str(value) != expected:
+                return False
+        return True
+
+    def matches_incident(self, incident_id: str, attrs: Dict[str, Any]) -> bool:
+        return incident_id in self.incident_ids or any(self._filter_matches(f, attrs) for f in self.filters)
+
+    def describe(self) -> Dict[str, Any]:
+        return {"incidents": sorted(self.incident_ids), "filters": self.filters}
+
+class FirehoseConnection(ClientConnection):
+    def __init__(self, websocket: WebSocket, max_queue: int, delta: bool = False):
+        super().__init__(websocket, None, max_queue, delta)
+        self.subscription = FirehoseSubscription()
+
+class ConnectionManager:
+    def __init__(
+        self,
+        max_queue: Optional[int] = None,
+        slow_consumer_policy: Optional[str] = None,
+        bus: Optional[EventBus] = None,
+        coalesce_tick_ms: Optional[float] = None,
+        replay_size: Optional[int] = None,
+    ):
+        # Map incident_id to the active connections of that incident
+        self.active_connections: Dict[str, Dict[WebSocket, ClientConnection]] = {}
+        # Multiplexed sockets subscribed to many incidents and/or incident filters
+        self.firehose_connections: Dict[WebSocket, FirehoseConnection] = {}
+        self.max_queue = max_queue or int(os.getenv("WS_SEND_QUEUE_SIZE", "256"))
+        # "drop": close the socket once its queue overflows.
+        # "resync": discard the backlog and tell the client to refetch instead.
+        self.slow_consumer_policy = slow_consumer_policy or os.getenv("WS_SLOW_CONSUMER_POLICY", "drop")
+        # Closes of evicted sockets still in flight; the loop only keeps weak references to tasks
+        self._closing: Set[asyncio.Task] = set()
+        # Events from every worker (this one included) arrive through the bus
+        self.bus = bus or create_event_bus()
+        self.bus.subscribe(self._fan_out)
+        # WS_COALESCE_TICK_MS > 0 merges each incident's events into one frame per tick
+        tick_ms = coalesce_tick_ms if coalesce_tick_ms is not None else float(os.getenv("WS_COALESCE_TICK_MS", "0"))
+        self.coalescer = EventCoalescer(tick_ms / 1000, self._publish) if tick_ms > 0 else None
+        # Last WS_REPLAY_BUFFER_SIZE (seq, frame, delta frame) entries per incident, for clients resuming with last_seq
+        self.replay_size = replay_size or int(os.getenv("WS_REPLAY_BUFFER_SIZE", "512"))
+        self.replay_buffers = LRUCache(int(os.getenv("WS_REPLAY_INCIDENTS", "1024")))
+        registry.gauge(
+            "factsaura_ws_connections",
+            "Open WebSocket subscriptions per incident on this worker.",
+            labels=("incident_id",),
+            collect=lambda: [((incident_id,), len(conns)) for incident_id, conns in self.active_connections.items()],
+        )
+
+    async def connect(self, websocket: WebSocket, incident_id: str, last_seq: Optional[int] = None,
+                      delta: bool = False, epoch: Optional[str] = None):
         await websocket.accept()
-        if incident_id not in self.active_connections:
-            self.active_connections[incident_id] = []
-        self.active_connections[incident_id].append(websocket)
+        if last_seq is None:
+            self.register(websocket, incident_id, delta)
+            return
+        latest = None
+        if not self.replay_buffers.get(incident_id):
+            # Nothing buffered on this worker: ask the bus how far the stream has got
+            try:
+                latest = await self.bus.current_seq(incident_id)
+            except Exception as e:
+                print(f"Error reading event sequence for {incident_id}: {e}")
+        # No awaits from here on, so no event can slip in between the replay and live frames
+        connection = self.register(websocket, incident_id, delta)
+        self._resume(connection, last_seq, latest, epoch)
+
+    def _resume(self, connection: ClientConnection, last_seq: int, latest: Optional[int], epoch: Optional[str] = None):
+        """
+        Queues the frames the client missed since `last_seq`, or a resync_required
+        frame when they are no longer buffered and it has to refetch instead.
+        A `last_seq` from another epoch, or ahead of the stream, was numbered by
+        a bus that has since started over (e.g. a restarted process) and says
+        nothing about what the client missed.
+        """
+        buffer = self.replay_buffers.get(connection.incident_id)
+        if buffer:
+            latest = buffer[-1][0]
+        if (epoch is not None and epoch != self.bus.epoch) or (latest is not None and last_seq > latest):
+            connection.offer(REPLAY_GAP_FRAME)
+            ws_resumes.inc(outcome="resync")
+        elif latest is not None and last_seq == latest:
+            ws_resumes.inc(outcome="up_to_date")
+        elif buffer and buffer[0][0] <= last_seq + 1:
+            for seq, frame, delta_frame in buffer:
+                if seq > last_seq:
+                    connection.offer(delta_frame if connection.delta and delta_frame else frame)
+            ws_resumes.inc(outcome="replayed")
+        else:
+            connection.offer(REPLAY_GAP_FRAME)
+            ws_resumes.inc(outcome="resync")
+
+    def register(self, websocket: WebSocket, incident_id: str, delta: bool = False) -> ClientConnection:
+        """
+        Starts the writer task for an already accepted socket.
+        """
+        connection = ClientConnection(websocket, incident_id, self.max_queue, delta)
+        connection.task = asyncio.create_task(self._writer(connection))
+        self.active_connections.setdefault(incident_id, {})[websocket] = connection
+        return connection
+
+    async def connect_firehose(self, websocket: WebSocket, delta: bool = False) -> FirehoseConnection:
+        await websocket.accept()
+        connection = FirehoseConnection(websocket, self.max_queue, delta)
+        connection.task = asyncio.create_task(self._writer(connection))
+        self.firehose_connections[websocket] = connection
+        return connection
+
+    def disconnect_firehose(self, websocket: WebSocket):
+        connection = self.firehose_connections.pop(websocket, None)
+        if connection and connection.task and connection.task is not asyncio.current_task():
+            connection.task.cancel()
+
+    def _remove(self, connection: ClientConnection):
+        if isinstance(connection, FirehoseConnection):
+            self.disconnect_firehose(connection.websocket)
+        else:
+            self.disconnect(connection.websocket, connection.incident_id)
 
     def disconnect(self, websocket: WebSocket, incident_id: str):
-        if incident_id in self.active_connections:
-            if websocket in self.active_connections[incident_id]:
-                self.active_connections[incident_id].remove(websocket)
-            if not self.active_connections[incident_id]:
-                del self.active_connections[incident_id]
-
-    async def broadcast(self, message: dict, incident_id: str):
-        if incident_id in self.active_connections:
-            for connection in self.active_connections[incident_id]:
-                try:
-                    await connection.send_json(message)
-                except Exception as e:
-                    print(f"Error broadcasting to {incident_id}: {e}")
-                    # Cleanup might be needed here in a robust system
+        connections = self.active_connections.get(incident_id)
+        if connections is None:
+            return
+        connection = connections.pop(websocket, None)
+        if connection and connection.task and connection.task is not asyncio.current_task():
+            connection.task.cancel()
+        if not connections:
+            del self.active_connections[incident_id]
+
+    async def _writer(self, connection: ClientConnection):
+        try:
+            while True:
+                frame = await connection.queue.get()
+                await connection.websocket.send_text(frame)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Dead socket: stop tracking it so broadcasts skip it from now on
+            print(f"Removing WebSocket for {connection.incident_id or 'firehose'}: {e!r}")
+            ws_evictions.inc(reason="send_failed")
+            self._remove(connection)
+            await self._close(connection.websocket, code=1011)
+
+    async def _close(self, websocket: WebSocket, code: int):
+        try:
+            await websocket.close(code=code)
+        except Exception:
+            pass
+
+    def _handle_overflow(self, connection: ClientConnection):
+        if self.slow_consumer_policy == "resync":
+            ws_evictions.inc(reason="resync")
+            connection.reset_queue(RESYNC_FRAME)
+            return
+        ws_evictions.inc(reason="slow_consumer")
+        self._remove(connection)
+        # 1013 = "try again later"; the client reconnects and refetches
+        task = asyncio.create_task(self._close(connection.websocket, code=1013))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def start(self):
+        await self.bus.start()
+
+    async def stop(self):
+        if self.coalescer:
+            await self.coalescer.stop()
+        await self.bus.stop()
+
+    async def broadcast(self, message: dict, incident_id: str, delta: Optional[dict] = None):
+        """
+        Publishes `message` to the subscribers of an incident on every worker.
+        `delta` is an optional post_delta form of the same event for clients that
+        asked for deltas. With coalescing enabled the message waits for the next
+        tick and may be merged with others into a single "batch" frame.
+        """
+        if self.coalescer:
+            self.coalescer.add(incident_id, message, delta)
+            return
+        await self._publish(incident_id, message, delta)
+
+    async def _publish(self, incident_id: str, message: dict, delta: Optional[dict] = None):
+        """
+        Both forms are encoded once here; the bus stamps them with the incident's
+        next sequence number and each worker fans them out locally.
+        """
+        envelope = {"incident_id": incident_id, "frame": dumps(message)}
+        if delta is not None:
+            envelope["delta_frame"] = dumps(delta)
+        try:
+            await self.bus.publish_sequenced(envelope)
+        except Exception as e:
+            print(f"Error publishing event for {incident_id}: {e}")
+
+    async def broadcast_incident_event(self, event_type: str, incident: Any):
+        """
+        Publishes an incident-level event (incident_created / incident_updated) to
+        firehose sockets whose subscription matches the incident. Not coalesced:
+        these are rare and each one matters.
+        """
+        payload = incident_payload(incident)
+        envelope = {
+            "kind": "incident",
+            "incident_id": incident.id,
+            "attrs": {key: payload[key] for key in FirehoseSubscription.FILTER_KEYS},
+            "frame": dumps({"type": event_type, "payload": payload}),
+        }
+        try:
+            await self.bus.publish(envelope)
+        except Exception as e:
+            print(f"Error publishing incident event for {incident.id}: {e}")
+
+    def _offer(self, connection: ClientConnection, frame: str):
+        if not connection.offer(frame):
+            self._handle_overflow(connection)
+
+    def _fan_out(self, envelope: dict):
+        """
+        Queues a frame for every local subscriber and returns without waiting for
+        any socket; each connection's writer task does the sending, and the same
+        text frame is shared by everyone.
+        """
+        if envelope.get("kind") not in (None, "incident"):
+            # Not a WebSocket event (e.g. a cache invalidation); other subscribers handle it
+            return
+        start = time.perf_counter()
+        incident_id = envelope["incident_id"]
+        frame = envelope["frame"]
+        delta_frame = envelope.get("delta_frame") or frame
+
+        if envelope.get("kind") == "incident":
+            attrs = envelope.get("attrs") or {}
+            for connection in list(self.firehose_connections.values()):
+                if connection.subscription.matches_incident(incident_id, attrs):
+                    self._offer(connection, frame)
+            ws_fanout_latency.observe(time.perf_counter() - start)
+            return
+
+        seq = envelope.get("seq")
+        if seq is not None:
+            buffer = self.replay_buffers.get(incident_id)
+            if buffer is None:
+                buffer = deque(maxlen=self.replay_size)
+                self.replay_buffers.put(incident_id, buffer)
+            buffer.append((seq, frame, envelope.get("delta_frame")))
+
+        for connection in list(self.active_connections.get(incident_id, {}).values()):
+            self._offer(connection, delta_frame if connection.delta else frame)
+
+        # Firehose sockets multiplex many incidents, so post-level frames are wrapped
+        # with their incident id. Built by concatenation: the event is not re-encoded.
+        wrapped = {}
+        for connection in list(self.firehose_connections.values()):
+            if incident_id in connection.subscription.incident_ids:
+                event = delta_frame if connection.delta else frame
+                if event not in wrapped:
+                    wrapped[event] = '{"type":"incident_event","incidentId":' + dumps(incident_id) + ',"event":' + event + '}'
+                self._offer(connection, wrapped[event])
+        ws_fanout_latency.observe(time.perf_counter() - start)
 
 manager = ConnectionManager()
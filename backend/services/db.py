@@ -0,0 +1,44 @@
+import asyncio
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from prisma import Prisma
+
+# One client per process: every Prisma() spawns its own query engine and
+# connection pool, and the services used to build one each at import time.
+_client: Optional["Prisma"] = None
+_connect_lock: Optional[asyncio.Lock] = None
+
+def get_db() -> "Prisma":
+    """
+    Returns the process-wide Prisma client, creating it on first use.
+    The prisma package itself is only imported here.
+    """
+    global _client
+    if _client is None:
+        from prisma import Prisma
+        from services.profiling import instrument_client
+
+        # Counts queries per request for the profiling middleware
+        instrument_client(Prisma)
+        _client = Prisma()
+    return _client
+
+async def connect_db() -> "Prisma":
+    """
+    Connects the shared client once; concurrent callers wait for the same connect.
+    """
+    global _connect_lock
+    client = get_db()
+    if client.is_connected():
+        return client
+    if _connect_lock is None:
+        _connect_lock = asyncio.Lock()
+    async with _connect_lock:
+        if not client.is_connected():
+            await client.connect()
+    return client
+
+async def disconnect_db():
+    if _client is not None and _client.is_connected():
+        await _client.disconnect()
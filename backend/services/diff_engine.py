@@ -0,0 +1,130 @@
+import difflib
+import os
+import re
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+from services.cache import LRUCache
+
+GRANULARITIES = ("word", "char")
+
+# Words and single punctuation marks, each with the whitespace that follows it
+# (plus leading whitespace as a token of its own), so the tokens concatenate
+# back to the original text and every token boundary is a character offset.
+# Whitespace is not a token by itself: a " " token would match everywhere and
+# send SequenceMatcher quadratic on every diff.
+TOKEN_PATTERN = re.compile(r"\w+\s*|[^\w\s]\s*|\s+")
+
+Opcode = Tuple[str, int, int, int, int]
+
+class Tokens:
+    """
+    A text split into tokens, with `offsets[k]` the character offset of token k
+    (and `offsets[-1] == len(text)`).
+    """
+    __slots__ = ("text", "tokens", "offsets")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.tokens: List[str] = []
+        self.offsets: List[int] = []
+        for match in TOKEN_PATTERN.finditer(text):
+            self.tokens.append(match.group())
+            self.offsets.append(match.start())
+        self.offsets.append(len(text))
+
+# Post content never changes once written, so a post's tokens can be kept by id.
+token_cache = LRUCache(int(os.getenv("DIFF_TOKEN_CACHE_SIZE", "4096")))
+
+def tokenize(text: str, key: Optional[Hashable] = None) -> Tokens:
+    """
+    Tokenizes `text`, reusing the cached result for `key` (a post id) when it
+    was computed from the same text.
+    """
+    if key is None:
+        return Tokens(text)
+    cached = token_cache.get(key)
+    if cached is not None and cached.text == text:
+        return cached
+    tokens = Tokens(text)
+    token_cache.put(key, tokens)
+    return tokens
+
+def sequence_opcodes(a: Sequence, b: Sequence, autojunk: bool = True) -> List[Opcode]:
+    """
+    SequenceMatcher opcodes for a -> b, run only on the part between the common
+    prefix and suffix. A typical edit touches a small region of the text, which
+    keeps the quadratic matcher on a few tokens and the rest linear.
+    """
+    limit = min(len(a), len(b))
+    prefix = 0
+    while prefix < limit and a[prefix] == b[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and a[len(a) - 1 - suffix] == b[len(b) - 1 - suffix]:
+        suffix += 1
+
+    opcodes: List[Opcode] = []
+    if prefix:
+        opcodes.append(("equal", 0, prefix, 0, prefix))
+    a_end, b_end = len(a) - suffix, len(b) - suffix
+    if prefix < a_end or prefix < b_end:
+        matcher = difflib.SequenceMatcher(None, a[prefix:a_end], b[prefix:b_end], autojunk=autojunk)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            opcodes.append((tag, i1 + prefix, i2 + prefix, j1 + prefix, j2 + prefix))
+    if suffix:
+        opcodes.append(("equal", a_end, len(a), b_end, len(b)))
+    return opcodes
+
+def change_size(opcode: Opcode, a: Sequence[str], b: Sequence[str]) -> int:
+    _, i1, i2, j1, j2 = opcode
+    return max(sum(map(len, a[i1:i2])), sum(map(len, b[j1:j2])))
+
+def merge_opcodes(opcodes: List[Opcode], a: Sequence[str], b: Sequence[str]) -> List[Opcode]:
+    """
+    Joins changes separated by an unchanged run no longer than the changes on
+    either side of it (the semantic cleanup of diff-match-patch), so
+    "flood at the dam" -> "fire at a dam" is one replace rather than two replaces
+    around "at ". Merged changes are labelled replace/delete/insert by what they span.
+    """
+    merged: List[List[Any]] = []
+    for index, opcode in enumerate(opcodes):
+        tag, i1, i2, j1, j2 = opcode
+        if tag == "equal":
+            between_changes = merged and merged[-1][0] != "equal" and index + 1 < len(opcodes)
+            if not (between_changes and sum(map(len, a[i1:i2])) <= min(
+                    change_size(tuple(merged[-1]), a, b), change_size(opcodes[index + 1], a, b))):
+                merged.append([tag, i1, i2, j1, j2])
+                continue
+        if merged and merged[-1][0] != "equal":
+            merged[-1][2], merged[-1][4] = i2, j2
+        else:
+            merged.append(["change", i1, i2, j1, j2])
+
+    result = []
+    for tag, i1, i2, j1, j2 in merged:
+        if tag != "equal":
+            tag = "replace" if i1 < i2 and j1 < j2 else ("delete" if i1 < i2 else "insert")
+        result.append((tag, i1, i2, j1, j2))
+    return result
+
+def diff_texts(parent: str, child: str, granularity: str = "word",
+               parent_key: Optional[Hashable] = None, child_key: Optional[Hashable] = None) -> Dict[str, Any]:
+    """
+    Edit script from parent to child.
+
+    Returns {"granularity", "opcodes", "tokens"}: `opcodes` are (tag, i1, i2, j1, j2)
+    in character offsets for both granularities, so they can be applied to the
+    content directly; `tokens` holds the same opcodes in token indices for
+    "word" and is None for "char". The keys are post ids for the token cache.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+    if granularity == "char":
+        return {"granularity": "char", "opcodes": sequence_opcodes(parent, child), "tokens": None}
+
+    a, b = tokenize(parent, parent_key), tokenize(child, child_key)
+    token_opcodes = merge_opcodes(sequence_opcodes(a.tokens, b.tokens, autojunk=False), a.tokens, b.tokens)
+    opcodes = [
+        (tag, a.offsets[i1], a.offsets[i2], b.offsets[j1], b.offsets[j2])
+        for tag, i1, i2, j1, j2 in token_opcodes
+    ]
+    return {"granularity": "word", "opcodes": opcodes, "tokens": token_opcodes}
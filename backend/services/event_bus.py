@@ -0,0 +1,306 @@
+import asyncio
+import os
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Set
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from services.metrics import registry
+from services.serialization import dumps, loads
+
+Envelope = Dict[str, Any]
+Handler = Callable[[Envelope], None]
+
+bus_published = registry.counter(
+    "factsaura_event_bus_published_total",
+    "Events published to the event bus by this worker.",
+    labels=("backend",),
+)
+bus_received = registry.counter(
+    "factsaura_event_bus_received_total",
+    "Events delivered by the event bus to this worker for local fan-out.",
+    labels=("backend",),
+)
+
+def stamp_seq(frame: str, seq: int, epoch: str) -> str:
+    """
+    Adds "seq" and "epoch" fields to an encoded JSON object without decoding it again.
+    """
+    stamp = '{"seq":%d,"epoch":"%s"' % (seq, epoch)
+    if frame == "{}":
+        return stamp + "}"
+    return stamp + "," + frame[1:]
+
+def sequenced(envelope: Dict[str, Any], seq: int, epoch: str) -> Dict[str, Any]:
+    """
+    Copy of `envelope` with `seq` and `epoch` set and stamped into every encoded
+    frame it carries.
+    """
+    stamped = {**envelope, "seq": seq, "epoch": epoch, "frame": stamp_seq(envelope["frame"], seq, epoch)}
+    if envelope.get("delta_frame"):
+        stamped["delta_frame"] = stamp_seq(envelope["delta_frame"], seq, epoch)
+    return stamped
+
+class EventBus:
+    """
+    Carries broadcast events between worker processes. Every worker subscribes a
+    handler that fans the event out to its own sockets, so one publish reaches
+    clients on all workers.
+
+    An envelope is a JSON-serializable dict; `frame` holds the already encoded
+    WebSocket message so no worker has to encode it again, and the optional
+    `delta_frame` its post_delta form.
+
+    Sequence numbers are only comparable within one `epoch`: a bus whose
+    numbering starts over (e.g. after a restart) has a new one.
+    """
+    backend = "abstract"
+    epoch = "0"
+
+    def __init__(self):
+        self._handlers: List[Handler] = []
+
+    def subscribe(self, handler: Handler):
+        self._handlers.append(handler)
+
+    def _deliver(self, envelope: Envelope):
+        bus_received.inc(backend=self.backend)
+        for handler in self._handlers:
+            try:
+                handler(envelope)
+            except Exception as e:
+                print(f"[EventBus] Handler error: {e}")
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def publish(self, envelope: Envelope):
+        raise NotImplementedError
+
+    async def publish_sequenced(self, envelope: Envelope):
+        """
+        Publishes an incident event stamped with the next sequence number of its
+        incident. Numbers are assigned so that every worker sees them in order.
+        """
+        raise NotImplementedError
+
+    async def current_seq(self, incident_id: str) -> int:
+        raise NotImplementedError
+
+class InProcessEventBus(EventBus):
+    """
+    Single-process bus: publishing delivers straight to the local handlers.
+    Sequence numbers live in memory, so every instance starts a new epoch.
+    """
+    backend = "memory"
+
+    def __init__(self):
+        super().__init__()
+        self._seq: Dict[str, int] = {}
+        self.epoch = uuid.uuid4().hex[:8]
+
+    async def publish(self, envelope: Envelope):
+        bus_published.inc(backend=self.backend)
+        self._deliver(envelope)
+
+    async def publish_sequenced(self, envelope: Envelope):
+        seq = self._seq.get(envelope["incident_id"], 0) + 1
+        self._seq[envelope["incident_id"]] = seq
+        await self.publish(sequenced(envelope, seq, self.epoch))
+
+    async def current_seq(self, incident_id: str) -> int:
+        return self._seq.get(incident_id, 0)
+
+# NOTIFY payloads must stay below 8000 bytes; larger events are sent in parts.
+NOTIFY_PAYLOAD_LIMIT = 7900
+
+def split_payload(payload: str, limit: int = NOTIFY_PAYLOAD_LIMIT) -> List[str]:
+    """
+    Splits an encoded envelope into NOTIFY-sized parts of the form
+    "<message id> <index> <total> <chunk>".
+    """
+    header_room = 64
+    if len(payload.encode("utf-8")) <= limit - header_room:
+        return [f"- 0 1 {payload}"]
+
+    # Chunk by characters; non-ASCII text can take up to 4 bytes per character
+    ascii_only = payload.isascii()
+    size = (limit - header_room) if ascii_only else (limit - header_room) // 4
+    chunks = [payload[i:i + size] for i in range(0, len(payload), size)]
+    message_id = uuid.uuid4().hex
+    return [f"{message_id} {index} {len(chunks)} {chunk}" for index, chunk in enumerate(chunks)]
+
+class PayloadAssembler:
+    """
+    Reassembles parts produced by split_payload. Parts of one message arrive in
+    order because they are sent from a single connection in a single transaction.
+    """
+
+    def __init__(self, max_pending: int = 256):
+        self.max_pending = max_pending
+        self._pending: Dict[str, List[str]] = {}
+
+    def feed(self, part: str) -> Optional[str]:
+        message_id, index, total, chunk = part.split(" ", 3)
+        total = int(total)
+        if total == 1:
+            return chunk
+        chunks = self._pending.setdefault(message_id, [])
+        if int(index) != len(chunks):
+            # A part went missing (e.g. listener reconnected mid-message); drop it
+            self._pending.pop(message_id, None)
+            return None
+        chunks.append(chunk)
+        if len(chunks) == total:
+            del self._pending[message_id]
+            return "".join(chunks)
+        if len(self._pending) > self.max_pending:
+            self._pending.pop(next(iter(self._pending)))
+        return None
+
+def asyncpg_dsn(database_url: str) -> str:
+    """
+    Prisma connection strings may carry parameters asyncpg does not understand
+    (schema, connection_limit, ...); strip them.
+    """
+    parts = urlsplit(database_url)
+    prisma_only = {"schema", "connection_limit", "pool_timeout", "pgbouncer", "socket_timeout", "connect_timeout"}
+    query = [(k, v) for k, v in parse_qsl(parts.query) if k not in prisma_only]
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+class PostgresEventBus(EventBus):
+    """
+    Cross-process bus on PostgreSQL LISTEN/NOTIFY. Each worker keeps one listening
+    connection; publishing is a single pg_notify, which PostgreSQL delivers to every
+    listener (including the publishing worker) in commit order.
+
+    Sequence numbers are kept in the database and shared by every worker, so
+    they survive restarts; bump EVENT_BUS_EPOCH if IncidentEventSeq is reset.
+    """
+    backend = "postgres"
+
+    def __init__(self, database_url: Optional[str] = None, channel: str = "factsaura_events"):
+        super().__init__()
+        self.database_url = asyncpg_dsn(database_url or os.environ["DATABASE_URL"])
+        self.channel = channel
+        self._listen_conn = None
+        self._publish_conn = None
+        self._publish_lock = asyncio.Lock()
+        self._assembler = PayloadAssembler()
+        self._stopping = False
+        self._reconnecting = False
+        # The loop only keeps weak references to tasks: hold the reconnect until it is done
+        self._reconnect_tasks: Set[asyncio.Task] = set()
+        self.epoch = os.getenv("EVENT_BUS_EPOCH", "1")
+
+    async def start(self):
+        import asyncpg  # Only needed when the Postgres bus is enabled
+
+        self._stopping = False
+        self._listen_conn = await asyncpg.connect(self.database_url)
+        self._listen_conn.add_termination_listener(self._on_terminated)
+        await self._listen_conn.add_listener(self.channel, self._on_notification)
+        self._publish_conn = await asyncpg.connect(self.database_url)
+
+    async def stop(self):
+        self._stopping = True
+        for task in list(self._reconnect_tasks):
+            task.cancel()
+        await asyncio.gather(*self._reconnect_tasks, return_exceptions=True)
+        await self._close_connections()
+
+    async def _close_connections(self):
+        if self._listen_conn is not None:
+            self._listen_conn.remove_termination_listener(self._on_terminated)
+        for conn in (self._listen_conn, self._publish_conn):
+            if conn is not None and not conn.is_closed():
+                await conn.close()
+        self._listen_conn = None
+        self._publish_conn = None
+
+    def _on_terminated(self, connection):
+        if not self._stopping and not self._reconnecting:
+            print("[EventBus] LISTEN connection lost, reconnecting...")
+            # Set here, not in the task, so a second callback before it starts is a no-op
+            self._reconnecting = True
+            task = asyncio.get_running_loop().create_task(self._reconnect())
+            self._reconnect_tasks.add(task)
+            task.add_done_callback(self._reconnect_tasks.discard)
+
+    async def _reconnect(self):
+        self._reconnecting = True
+        delay = 0.5
+        try:
+            while not self._stopping:
+                try:
+                    await self._close_connections()
+                    await self.start()
+                    return
+                except Exception as e:
+                    print(f"[EventBus] Reconnect failed: {e}")
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, 10)
+        finally:
+            self._reconnecting = False
+
+    def _on_notification(self, connection, pid, channel, payload: str):
+        message = self._assembler.feed(payload)
+        if message is not None:
+            self._deliver(loads(message))
+
+    async def _notify(self, parts: List[str]):
+        for part in parts:
+            await self._publish_conn.execute("SELECT pg_notify($1, $2)", self.channel, part)
+
+    async def publish(self, envelope: Envelope):
+        if self._publish_conn is None:
+            await self.start()
+        parts = split_payload(dumps(envelope))
+        async with self._publish_lock:
+            if len(parts) == 1:
+                await self._notify(parts)
+            else:
+                async with self._publish_conn.transaction():
+                    await self._notify(parts)
+        bus_published.inc(backend=self.backend)
+
+    async def publish_sequenced(self, envelope: Envelope):
+        """
+        The counter row stays locked until the NOTIFY commits, so a concurrent
+        publisher for the same incident waits, and notifications (delivered in
+        commit order) always arrive with increasing numbers.
+        """
+        if self._publish_conn is None:
+            await self.start()
+        async with self._publish_lock:
+            async with self._publish_conn.transaction():
+                seq = await self._publish_conn.fetchval(
+                    """
+                    INSERT INTO "IncidentEventSeq" ("incidentId", "seq") VALUES ($1, 1)
+                    ON CONFLICT ("incidentId") DO UPDATE SET "seq" = "IncidentEventSeq"."seq" + 1
+                    RETURNING "seq"
+                    """,
+                    envelope["incident_id"],
+                )
+                await self._notify(split_payload(dumps(sequenced(envelope, seq, self.epoch))))
+        bus_published.inc(backend=self.backend)
+
+    async def current_seq(self, incident_id: str) -> int:
+        if self._publish_conn is None:
+            await self.start()
+        async with self._publish_lock:
+            seq = await self._publish_conn.fetchval(
+                'SELECT "seq" FROM "IncidentEventSeq" WHERE "incidentId" = $1', incident_id
+            )
+        return seq or 0
+
+def create_event_bus() -> EventBus:
+    """
+    EVENT_BUS=postgres shares events between workers through the database;
+    the default keeps them inside this process.
+    """
+    backend = os.getenv("EVENT_BUS", "memory").lower()
+    if backend == "postgres":
+        return PostgresEventBus()
+    return InProcessEventBus()
@@ -0,0 +1,99 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from services.metrics import registry
+from services.serialization import merge_post_deltas
+
+# Events that carry the full latest state of a post; only the newest one per post matters
+COALESCABLE_TYPES = {"post_voted", "post_updated"}
+
+coalescer_events_in = registry.counter(
+    "factsaura_ws_coalescer_events_total",
+    "Events handed to the coalescing layer.",
+)
+coalescer_frames_out = registry.counter(
+    "factsaura_ws_coalescer_frames_total",
+    "Frames published by the coalescing layer after merging a tick's events.",
+)
+
+class IncidentBuffer:
+    def __init__(self):
+        self.events: List[Dict[str, Any]] = []
+        # Delta form of each event for delta-capable clients, or None to send the full event
+        self.deltas: List[Optional[Dict[str, Any]]] = []
+        # post id -> index in events of its pending state update (of any type:
+        # votes and edits both carry the full post, so the newest one wins)
+        self.latest: Dict[str, int] = {}
+
+    def add(self, message: Dict[str, Any], delta: Optional[Dict[str, Any]] = None):
+        post_id = (message.get("payload") or {}).get("id") if message.get("type") in COALESCABLE_TYPES else None
+        if post_id is None:
+            self.events.append(message)
+            self.deltas.append(delta)
+            return
+        index = self.latest.get(post_id)
+        if index is None:
+            self.latest[post_id] = len(self.events)
+            self.events.append(message)
+            self.deltas.append(delta)
+        else:
+            # Keep the slot of the first update so it stays behind that post's new_post
+            self.events[index] = message
+            self.deltas[index] = self._merge(self.deltas[index], delta)
+
+    def _merge(self, older: Optional[Dict[str, Any]], newer: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        # Only back-to-back versions merge; otherwise another writer's change sits
+        # in between and the client gets the full post instead
+        if older is None or newer is None or older["payload"]["version"] != newer["payload"]["baseVersion"]:
+            return None
+        return merge_post_deltas(older, newer)
+
+class EventCoalescer:
+    """
+    Collects broadcast events per incident for one tick, keeps only the latest
+    state update per post and emits one frame per incident per tick. Events that
+    are not state updates (new_post, new_comment, ...) are kept in arrival order.
+    """
+
+    def __init__(self, tick_seconds: float, flush: Callable[..., Awaitable[None]]):
+        self.tick_seconds = tick_seconds
+        self._flush = flush
+        self._buffers: Dict[str, IncidentBuffer] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def add(self, incident_id: str, message: Dict[str, Any], delta: Optional[Dict[str, Any]] = None):
+        coalescer_events_in.inc()
+        self._buffers.setdefault(incident_id, IncidentBuffer()).add(message, delta)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while self._buffers:
+            await asyncio.sleep(self.tick_seconds)
+            await self.flush()
+
+    async def flush(self):
+        buffers, self._buffers = self._buffers, {}
+        for incident_id, buffer in buffers.items():
+            if len(buffer.events) == 1:
+                message, delta = buffer.events[0], buffer.deltas[0]
+            else:
+                message = {"type": "batch", "payload": {"events": buffer.events}}
+                delta = None
+                if any(d is not None for d in buffer.deltas):
+                    events = [d if d is not None else m for m, d in zip(buffer.events, buffer.deltas)]
+                    delta = {"type": "batch", "payload": {"events": events}}
+            coalescer_frames_out.inc()
+            try:
+                await self._flush(incident_id, message, delta)
+            except Exception as e:
+                print(f"[EventCoalescer] Error flushing events for {incident_id}: {e}")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
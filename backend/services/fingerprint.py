@@ -0,0 +1,22 @@
+import hashlib
+import re
+import string
+
+# ASCII-only on purpose: the backfill migration computes the same hash in SQL
+# with translate() and a bracket regex, neither of which depends on the
+# database's collation or locale, so both sides always agree
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+_WHITESPACE = re.compile(r"[ \t\n\r\f\v]+")
+
+def normalize_content(text: str) -> str:
+    """
+    Lowercases ASCII letters, collapses whitespace runs to one space and trims.
+    """
+    return _WHITESPACE.sub(" ", text.translate(_ASCII_LOWER)).strip(" ")
+
+def content_hash(text: str) -> str:
+    """
+    Hex SHA-256 of the normalized content: equal for posts that differ only in
+    letter case or whitespace.
+    """
+    return hashlib.sha256(normalize_content(text).encode("utf-8")).hexdigest()
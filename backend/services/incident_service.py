@@ -1,18 +1,21 @@
-from prisma import Prisma
+from services.db import get_db, connect_db, disconnect_db
 from typing import List, Optional
 from models.incident import IncidentCreate, IncidentUpdate
+from services.connection_manager import manager
+from services.responses import VersionToken
+from services import read_cache
 
 class IncidentService:
-    def __init__(self):
-        self.db = Prisma()
+    @property
+    def db(self):
+        # Shared, lazily created client (services/db.py)
+        return get_db()
 
     async def connect(self):
-        if not self.db.is_connected():
-            await self.db.connect()
+        await connect_db()
 
     async def disconnect(self):
-        if self.db.is_connected():
-            await self.db.disconnect()
+        await disconnect_db()
 
     async def get_all_incidents(self, severity_filter: Optional[str] = None) -> List[dict]:
         await self.connect()
@@ -42,13 +45,32 @@ class IncidentService:
         
         return sorted_incidents
 
+    async def get_incidents_version(self, severity_filter: Optional[str] = None) -> VersionToken:
+        """
+        Version of the incident list: changes whenever an incident is created or updated.
+        """
+        await self.connect()
+        rows = await self.db.query_raw(
+            """
+            SELECT COUNT(*)::int AS count,
+                   FLOOR(EXTRACT(EPOCH FROM MAX("updatedAt")) * 1000)::float8 AS modified
+            FROM "Incident"
+            WHERE $1::text IS NULL OR "severity"::text = $1::text
+            """,
+            severity_filter,
+        )
+        row = rows[0]
+        return VersionToken("incidents", row["count"], row["modified"], last_modified_ms=row["modified"])
+
     async def get_incident_by_id(self, incident_id: str) -> Optional[dict]:
         await self.connect()
-        return await self.db.incident.find_unique(where={"id": incident_id})
+        return await read_cache.incident_cache.get_or_load(
+            incident_id, lambda: self.db.incident.find_unique(where={"id": incident_id})
+        )
 
     async def create_incident(self, data: IncidentCreate) -> dict:
         await self.connect()
-        return await self.db.incident.create(
+        incident = await self.db.incident.create(
             data={
                 "title": data.title,
                 "severity": data.severity,
@@ -56,6 +78,9 @@ class IncidentService:
                 "status": data.status
             }
         )
+        # Push to firehose subscribers instead of waiting for the feed to poll
+        await manager.broadcast_incident_event("incident_created", incident)
+        return incident
 
     async def update_incident(self, incident_id: str, data: IncidentUpdate) -> Optional[dict]:
         await self.connect()
@@ -63,7 +88,11 @@ class IncidentService:
         if not update_data:
             return await self.get_incident_by_id(incident_id)
             
-        return await self.db.incident.update(
+        incident = await self.db.incident.update(
             where={"id": incident_id},
             data=update_data
         )
+        if incident:
+            await read_cache.invalidate(incidents=[incident_id])
+            await manager.broadcast_incident_event("incident_updated", incident)
+        return incident
@@ -0,0 +1,132 @@
+import os
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+from Levenshtein import ratio
+from services.cache import LRUCache
+from services.metrics import registry
+
+NGRAM_SIZE = 3
+# Only the rarest grams of a query are looked up: a reshare shares them with its
+# source, and their posting lists are short, which bounds the cost per insert
+QUERY_GRAMS = int(os.getenv("PARENT_INFERENCE_QUERY_GRAMS", "48"))
+# Candidates with the most shared grams that get the exact Levenshtein check
+CANDIDATES = int(os.getenv("PARENT_INFERENCE_CANDIDATES", "16"))
+# Catch-up queries re-read this far behind the newest post seen, for rows that
+# commit out of createdAt order
+CATCH_UP_OVERLAP_MS = 5000
+
+parent_inferences = registry.counter(
+    "factsaura_parent_inferences_total",
+    "Parent inference attempts for posts created without a parent, by result (linked or none).",
+    labels=("result",),
+)
+
+def ngrams(text: str, n: int = NGRAM_SIZE) -> Set[str]:
+    normalized = " ".join(text.lower().split())
+    if len(normalized) <= n:
+        return {normalized} if normalized else set()
+    return {normalized[i:i + n] for i in range(len(normalized) - n + 1)}
+
+class IncidentIndex:
+    """
+    Character n-gram inverted index over one incident's posts.
+    """
+
+    def __init__(self):
+        self.postings: Dict[str, List[str]] = defaultdict(list)
+        self.contents: Dict[str, str] = {}
+        self.watermark_ms: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self.contents)
+
+    def add(self, post_id: str, content: str):
+        if post_id in self.contents:
+            return
+        self.contents[post_id] = content
+        for gram in ngrams(content):
+            self.postings[gram].append(post_id)
+
+    def best_match(self, content: str, threshold: float, exclude: Optional[str] = None) -> Optional[Tuple[str, float]]:
+        """
+        The indexed post most similar to `content` (Levenshtein ratio), if any
+        reaches `threshold`, as (post_id, similarity).
+        """
+        grams = [gram for gram in ngrams(content) if gram in self.postings]
+        grams.sort(key=lambda gram: len(self.postings[gram]))
+        shared = Counter()
+        for gram in grams[:QUERY_GRAMS]:
+            shared.update(self.postings[gram])
+        shared.pop(exclude, None)
+
+        best = None
+        for post_id, _ in shared.most_common(CANDIDATES):
+            similarity = ratio(self.contents[post_id], content)
+            if similarity >= threshold and (best is None or similarity > best[1]):
+                best = (post_id, similarity)
+        return best
+
+class ParentInference:
+    """
+    Links posts created without a parent to the most similar earlier post of
+    the same incident. Off unless PARENT_INFERENCE_ENABLED is set.
+
+    Each worker keeps an index per incident, built on first use and caught up
+    before every lookup with the posts created since (by any worker), so one
+    small query per insert keeps it current.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("PARENT_INFERENCE_ENABLED", "").lower() in ("1", "true", "yes")
+        self.threshold = float(os.getenv("PARENT_INFERENCE_THRESHOLD", "0.6"))
+        self.indexes = LRUCache(int(os.getenv("PARENT_INFERENCE_INCIDENTS", "64")))
+
+    async def sync(self, db, incident_id: str) -> IncidentIndex:
+        """
+        The incident's index, caught up with every post created so far.
+        """
+        index = self.indexes.get(incident_id)
+        if index is None:
+            index = IncidentIndex()
+            self.indexes.put(incident_id, index)
+        since = index.watermark_ms - CATCH_UP_OVERLAP_MS if index.watermark_ms is not None else -1
+        # "createdAt" holds UTC in a column without a zone: compare it with a UTC
+        # wall-clock time, not a timestamptz cast through the session time zone
+        rows = await db.query_raw(
+            """
+            SELECT "id", "content", FLOOR(EXTRACT(EPOCH FROM "createdAt") * 1000)::float8 AS created
+            FROM "Post"
+            WHERE "incidentId" = $1 AND "createdAt" > (to_timestamp($2 / 1000.0) AT TIME ZONE 'UTC')
+            ORDER BY "createdAt"
+            """,
+            incident_id,
+            since,
+        )
+        for row in rows:
+            index.add(row["id"], row["content"])
+            if index.watermark_ms is None or row["created"] > index.watermark_ms:
+                index.watermark_ms = row["created"]
+        return index
+
+    def match(self, index: IncidentIndex, content: str, exclude: Optional[str] = None) -> Optional[str]:
+        best = index.best_match(content, self.threshold, exclude)
+        parent_inferences.inc(result="linked" if best else "none")
+        return best[0] if best else None
+
+    async def infer(self, db, incident_id: str, content: str, exclude: Optional[str] = None) -> Optional[str]:
+        """
+        Returns the id of the post to use as the parent of new content, or None.
+        `exclude` is the new post's own id when it has already been inserted.
+        """
+        return self.match(await self.sync(db, incident_id), content, exclude)
+
+    def record(self, incident_id: str, post_id: str, content: str):
+        """
+        Adds a post created by this worker to its incident's index, if loaded.
+        """
+        index = self.indexes.get(incident_id)
+        if index is not None:
+            index.add(post_id, content)
+
+# Global instance
+parent_inference = ParentInference()
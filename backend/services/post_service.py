@@ -1,19 +1,37 @@
-from prisma import Prisma
+import os
+import uuid
+from collections import defaultdict
+from services.db import get_db, connect_db, disconnect_db
 from services.connection_manager import manager
+from services.serialization import post_payload, post_delta, comment_payload
+from services.responses import VersionToken
+from services.diff_engine import diff_texts
+from services import read_cache
+from services.parent_inference import parent_inference
+from services.fingerprint import content_hash
+from services.snapshot import IncidentSnapshot, snapshot_store
 from typing import Dict, Any, List, Optional
 from Levenshtein import ratio
 
+BULK_POST_MAX_ITEMS = int(os.getenv("BULK_POST_MAX_ITEMS", "5000"))
+
+def ancestor_path(parent: Any) -> List[str]:
+    """
+    The ancestorIds of a child of `parent`: the parent's own path plus the parent.
+    """
+    return list(parent.ancestorIds or []) + [parent.id]
+
 class PostService:
-    def __init__(self):
-        self.db = Prisma()
+    @property
+    def db(self):
+        # Shared, lazily created client (services/db.py)
+        return get_db()
 
     async def connect(self):
-        if not self.db.is_connected():
-            await self.db.connect()
+        await connect_db()
 
     async def disconnect(self):
-        if self.db.is_connected():
-            await self.db.disconnect()
+        await disconnect_db()
 
     def calculate_mutation_score(self, parent_content: str, child_content: str) -> float:
         """
@@ -27,83 +45,318 @@ class PostService:
         similarity = ratio(parent_content, child_content)
         return (1.0 - similarity) * 100.0
 
+    def classify_mutation(self, mutation_score: float) -> str:
+        """
+        Simple heuristic for mutation type based on how far a post drifted from its parent.
+        """
+        if mutation_score < 10:
+            return "FACTUAL" # Minor changes
+        elif mutation_score < 40:
+            return "EMOTIONAL" # Moderate changes
+        return "FABRICATION" # Major changes
+
+    def diff_opcodes(self, parent_content: str, child_content: str, granularity: str = "char") -> List[tuple]:
+        """
+        Edit script from parent to child, in character offsets.
+        We return opcodes: tag, i1, i2, j1, j2
+        tag: 'replace', 'delete', 'insert', 'equal'
+        See services/diff_engine.py for the granularities.
+        """
+        return diff_texts(parent_content, child_content, granularity)["opcodes"]
+
     async def create_post(self, data: Dict[str, Any]) -> dict:
         await self.connect()
         
         # Calculate mutation score if parent exists
         mutation_score = 0.0
         mutation_type = None
+        ancestor_ids = []
+        parent_id = data.get("parentId")
+        parent_inferred = False
+
+        if not parent_id and parent_inference.enabled:
+            # Orphan: link it to the closest earlier post of the incident, if any is close enough
+            parent_id = await parent_inference.infer(self.db, data["incidentId"], data["content"])
+            parent_inferred = parent_id is not None
         
-        if data.get("parentId"):
-            parent = await self.db.post.find_unique(where={"id": data["parentId"]})
+        if parent_id:
+            parent = await self.get_post_by_id(parent_id)
             if parent:
                 mutation_score = self.calculate_mutation_score(parent.content, data["content"])
-                # Simple heuristic for mutation type
-                if mutation_score < 10:
-                    mutation_type = "FACTUAL" # Minor changes
-                elif mutation_score < 40:
-                    mutation_type = "EMOTIONAL" # Moderate changes
-                else:
-                    mutation_type = "FABRICATION" # Major changes
+                mutation_type = self.classify_mutation(mutation_score)
+                ancestor_ids = ancestor_path(parent)
         
         # Create post
         post = await self.db.post.create(
             data={
                 "id": data.get("id"), # Optional, let DB generate if None
                 "content": data["content"],
+                "contentHash": content_hash(data["content"]),
                 "author": data["author"],
                 "incidentId": data["incidentId"],
-                "parentId": data.get("parentId"),
+                "parentId": parent_id,
+                "parentInferred": parent_inferred,
                 "timestamp": data.get("timestamp"), # Optional
                 "mutationScore": mutation_score,
-                "mutationType": mutation_type
+                "mutationType": mutation_type,
+                "ancestorIds": ancestor_ids
             }
         )
 
+        await read_cache.invalidate(incident_posts=[post.incidentId])
+        parent_inference.record(post.incidentId, post.id, post.content)
+
         # Broadcast update via WebSocket
         await manager.broadcast(
             {
                 "type": "new_post",
-                "payload": post.dict()
+                "payload": post_payload(post)
             },
             data["incidentId"]
         )
 
         return post
 
+    def plan_bulk_posts(self, items: List[Dict[str, Any]], parents: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Turns bulk items into rows for create_many. Each item names its parent
+        either by `parentId` (an existing post, looked up in `parents`) or by
+        `parentRef`, the index of an earlier item in the same batch. Ids are
+        assigned here so in-batch children can point at their parents before
+        anything is inserted. Raises ValueError on a bad reference.
+        """
+        rows = []
+        for index, item in enumerate(items):
+            parent_ref = item.get("parentRef")
+            parent_id = item.get("parentId")
+            if parent_ref is not None and parent_id is not None:
+                raise ValueError(f"Item {index}: give parentId or parentRef, not both")
+            parent_content = None
+            ancestor_ids = []
+            if parent_ref is not None:
+                if not 0 <= parent_ref < index:
+                    raise ValueError(f"Item {index}: parentRef must be the index of an earlier item")
+                parent_id = rows[parent_ref]["id"]
+                parent_content = rows[parent_ref]["content"]
+                ancestor_ids = rows[parent_ref]["ancestorIds"] + [parent_id]
+            elif parent_id is not None:
+                if parent_id not in parents:
+                    raise ValueError(f"Item {index}: parent post {parent_id} not found")
+                parent_content = parents[parent_id].content
+                ancestor_ids = ancestor_path(parents[parent_id])
+
+            mutation_score = 0.0
+            mutation_type = None
+            if parent_content is not None:
+                mutation_score = self.calculate_mutation_score(parent_content, item["content"])
+                mutation_type = self.classify_mutation(mutation_score)
+
+            row = {
+                "id": item.get("id") or str(uuid.uuid4()),
+                "content": item["content"],
+                "contentHash": content_hash(item["content"]),
+                "author": item["author"],
+                "incidentId": item["incidentId"],
+                "parentId": parent_id,
+                "parentInferred": bool(item.get("parentInferred")),
+                "mutationScore": mutation_score,
+                "mutationType": mutation_type,
+                "ancestorIds": ancestor_ids,
+            }
+            if item.get("timestamp"):
+                row["timestamp"] = item["timestamp"]
+            rows.append(row)
+        return rows
+
+    async def _infer_bulk_parents(self, items: List[Dict[str, Any]]):
+        """
+        Fills in parentId for items that name no parent, matching each against
+        the posts that existed before the batch. Each incident's index is
+        caught up once for the whole batch.
+        """
+        indexes = {}
+        for item in items:
+            if item.get("parentId") or item.get("parentRef") is not None:
+                continue
+            incident_id = item["incidentId"]
+            if incident_id not in indexes:
+                indexes[incident_id] = await parent_inference.sync(self.db, incident_id)
+            parent_id = parent_inference.match(indexes[incident_id], item["content"])
+            if parent_id:
+                item["parentId"] = parent_id
+                item["parentInferred"] = True
+
+    async def create_posts_bulk(self, items: List[Dict[str, Any]]) -> List[Any]:
+        """
+        Creates many posts at once: one query for the existing parents, one
+        insert inside a transaction, and one new_posts broadcast per incident.
+        Returns the posts in request order.
+        """
+        if len(items) > BULK_POST_MAX_ITEMS:
+            raise ValueError(f"At most {BULK_POST_MAX_ITEMS} posts per request")
+        await self.connect()
+
+        if parent_inference.enabled:
+            await self._infer_bulk_parents(items)
+
+        parent_ids = list({item["parentId"] for item in items if item.get("parentId")})
+        parents = {}
+        if parent_ids:
+            parents = {p.id: p for p in await self.db.post.find_many(where={"id": {"in": parent_ids}})}
+        rows = self.plan_bulk_posts(items, parents)
+        if not rows:
+            return []
+
+        ids = [row["id"] for row in rows]
+        # Postgres checks the parent foreign key at the end of the statement,
+        # so rows may reference rows inserted by the same create_many
+        async with self.db.tx() as transaction:
+            await transaction.post.create_many(data=rows)
+            created = await transaction.post.find_many(where={"id": {"in": ids}})
+        by_id = {post.id: post for post in created}
+        posts = [by_id[post_id] for post_id in ids]
+
+        by_incident = defaultdict(list)
+        for post in posts:
+            by_incident[post.incidentId].append(post)
+        await read_cache.invalidate(incident_posts=list(by_incident))
+        for post in posts:
+            parent_inference.record(post.incidentId, post.id, post.content)
+        for incident_id, incident_posts in by_incident.items():
+            await manager.broadcast(
+                {
+                    "type": "new_posts",
+                    "payload": {"posts": [post_payload(post) for post in incident_posts]}
+                },
+                incident_id
+            )
+
+        return posts
+
     async def get_posts_by_incident(self, incident_id: str) -> List[dict]:
         await self.connect()
-        return await self.db.post.find_many(
-            where={"incidentId": incident_id},
-            order={"timestamp": "asc"}
+        return await read_cache.incident_posts_cache.get_or_load(
+            incident_id,
+            lambda: self.db.post.find_many(
+                where={"incidentId": incident_id},
+                order={"timestamp": "asc"}
+            )
         )
 
-    async def get_post_by_id(self, post_id: str) -> Optional[dict]:
+    async def get_posts_version(self, incident_id: str) -> VersionToken:
+        """
+        Version of an incident's post list. Every post write bumps Post.version,
+        so the sum of versions changes even for updates within one millisecond.
+        """
         await self.connect()
-        return await self.db.post.find_unique(where={"id": post_id})
+        rows = await self.db.query_raw(
+            """
+            SELECT COUNT(*)::int AS count,
+                   COALESCE(SUM("version"), 0)::float8 AS versions,
+                   FLOOR(EXTRACT(EPOCH FROM MAX("updatedAt")) * 1000)::float8 AS modified
+            FROM "Post"
+            WHERE "incidentId" = $1
+            """,
+            incident_id,
+        )
+        row = rows[0]
+        return VersionToken("posts", row["count"], row["versions"], row["modified"], last_modified_ms=row["modified"])
+
+    async def get_snapshot(self, incident_id: str, version: VersionToken) -> IncidentSnapshot:
+        """
+        The incident's columnar tree snapshot at `version` (from get_posts_version).
+        """
+        await self.connect()
+        return await snapshot_store.get(self.db, incident_id, version.etag, count=version.parts[0])
+
+    async def get_snapshot_content(self, snapshot: IncidentSnapshot, offset: int, limit: int) -> List[Optional[str]]:
+        """
+        Content of the snapshot's rows offset..offset+limit, in row order.
+        """
+        ids = snapshot.ids[offset:offset + limit]
+        posts = await self.db.post.find_many(where={"id": {"in": ids}}) if ids else []
+        contents = {post.id: post.content for post in posts}
+        return [contents.get(post_id) for post_id in ids]
 
-    async def get_post_diff(self, post_id: str) -> Dict[str, Any]:
+    async def get_post_by_id(self, post_id: str) -> Optional[dict]:
         await self.connect()
-        post = await self.db.post.find_unique(where={"id": post_id})
+        return await read_cache.post_cache.get_or_load(
+            post_id, lambda: self.db.post.find_unique(where={"id": post_id})
+        )
+
+    def build_lineage(self, post: Any, ancestors: List[Any]) -> Dict[str, Any]:
+        """
+        Root-to-post chain for `post`, given its ancestors root first. Each hop
+        carries its own mutation score (against its parent), the running sum of
+        hop scores, and how far it has drifted from the root's content.
+        """
+        chain = []
+        cumulative = 0.0
+        root = ancestors[0] if ancestors else post
+        previous = None
+        for node in ancestors + [post]:
+            hop = 0.0
+            if previous is not None:
+                # Stored at creation; scanner posts only get it once the verifier has run
+                hop = node.mutationScore if node.mutationScore is not None else \
+                    self.calculate_mutation_score(previous.content, node.content)
+            cumulative += hop
+            chain.append({
+                "post": post_payload(node),
+                "hopMutationScore": hop,
+                "cumulativeMutationScore": cumulative,
+                "driftFromRoot": self.calculate_mutation_score(root.content, node.content) if node is not root else 0.0,
+            })
+            previous = node
+        return {"postId": post.id, "depth": len(ancestors), "root": chain[0]["post"], "chain": chain}
+
+    async def get_lineage(self, post_id: str) -> Optional[Dict[str, Any]]:
+        """
+        The ancestor chain of a post, from the stored ancestorIds path: the post
+        itself (usually cached) plus one query for all ancestors, at any depth.
+        """
+        post = await self.get_post_by_id(post_id)
+        if not post:
+            return None
+        ancestor_ids = list(post.ancestorIds or [])
+        ancestors = []
+        if ancestor_ids:
+            found = {p.id: p for p in await self.db.post.find_many(where={"id": {"in": ancestor_ids}})}
+            ancestors = [found[a] for a in ancestor_ids if a in found]
+        return self.build_lineage(post, ancestors)
+
+    async def get_root(self, post_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Patient zero of a post's chain (the post itself when it has no parent).
+        """
+        post = await self.get_post_by_id(post_id)
+        if not post:
+            return None
+        ancestor_ids = post.ancestorIds or []
+        root = await self.get_post_by_id(ancestor_ids[0]) if ancestor_ids else post
+        return {"postId": post.id, "depth": len(ancestor_ids), "root": root or post}
+
+    async def get_post_diff(self, post_id: str, granularity: str = "word") -> Dict[str, Any]:
+        post = await self.get_post_by_id(post_id)
         if not post:
             return None
         
         result = {
             "post": post,
             "parent": None,
-            "diff": []
+            "diff": [],
+            "tokens": None,
+            "granularity": granularity,
         }
 
         if post.parentId:
-            parent = await self.db.post.find_unique(where={"id": post.parentId})
+            parent = await self.get_post_by_id(post.parentId)
             if parent:
                 result["parent"] = parent
-                # Generate diff
-                import difflib
-                matcher = difflib.SequenceMatcher(None, parent.content, post.content)
-                # We return opcodes: tag, i1, i2, j1, j2
-                # tag: 'replace', 'delete', 'insert', 'equal'
-                result["diff"] = matcher.get_opcodes()
+                # Keyed by post id: a parent's tokens are reused across all its children
+                diff = diff_texts(parent.content, post.content, granularity, parent_key=parent.id, child_key=post.id)
+                result["diff"] = diff["opcodes"]
+                result["tokens"] = diff["tokens"]
         
         return result
 
@@ -114,29 +367,28 @@ class PostService:
         """
         await self.connect()
         
-        post = await self.db.post.find_unique(where={"id": post_id})
-        if not post:
-            return None
-        
-        # Update vote counts
-        new_credible_votes = post.credibleVotes + (1 if is_credible else 0)
-        new_total_votes = post.totalVotes + 1
-        
+        # Increment in the database so concurrent votes are not lost;
+        # update() returns None when the post does not exist
         updated_post = await self.db.post.update(
             where={"id": post_id},
             data={
-                "credibleVotes": new_credible_votes,
-                "totalVotes": new_total_votes
+                "credibleVotes": {"increment": 1 if is_credible else 0},
+                "totalVotes": {"increment": 1},
+                "version": {"increment": 1}
             }
         )
+        if not updated_post:
+            return None
+        await read_cache.invalidate(posts=[post_id], incident_posts=[updated_post.incidentId])
         
         # Broadcast update via WebSocket
         await manager.broadcast(
             {
                 "type": "post_voted",
-                "payload": updated_post.dict()
+                "payload": post_payload(updated_post)
             },
-            updated_post.incidentId
+            updated_post.incidentId,
+            delta=post_delta(updated_post, ("credibleVotes", "totalVotes"), "post_voted")
         )
         
         return updated_post
@@ -154,9 +406,27 @@ class PostService:
         
         return comments
 
-    async def create_comment(self, post_id: str, data: Dict[str, Any]) -> dict:
+    async def get_comments_version(self, post_id: str) -> VersionToken:
+        """
+        Version of a post's comments; comments are never edited, so count and newest suffice.
+        """
+        await self.connect()
+        rows = await self.db.query_raw(
+            """
+            SELECT COUNT(*)::int AS count,
+                   FLOOR(EXTRACT(EPOCH FROM MAX("createdAt")) * 1000)::float8 AS modified
+            FROM "Comment"
+            WHERE "postId" = $1
+            """,
+            post_id,
+        )
+        row = rows[0]
+        return VersionToken("comments", row["count"], row["modified"], last_modified_ms=row["modified"])
+
+    async def create_comment(self, post_id: str, data: Dict[str, Any], post: Optional[Any] = None) -> dict:
         """
-        Create a new comment on a post.
+        Create a new comment on a post. Callers that already loaded the post
+        pass it in, so it is not looked up a second time for the broadcast.
         """
         await self.connect()
         
@@ -168,8 +438,10 @@ class PostService:
             }
         )
         
-        # Get the post to find incident ID for broadcasting
-        post = await self.db.post.find_unique(where={"id": post_id})
+        # Get the post to find incident ID for broadcasting. Comments are not
+        # part of any cached read, so there is nothing to invalidate.
+        if post is None:
+            post = await self.get_post_by_id(post_id)
         
         # Broadcast update via WebSocket
         if post:
@@ -177,7 +449,7 @@ class PostService:
                 {
                     "type": "new_comment",
                     "payload": {
-                        "comment": comment.dict(),
+                        "comment": comment_payload(comment),
                         "postId": post_id
                     }
                 },
@@ -0,0 +1,178 @@
+import contextvars
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Optional
+from services.metrics import registry
+
+DB_QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+http_db_queries = registry.histogram(
+    "factsaura_http_db_queries",
+    "Database queries issued per HTTP request (profiling middleware only).",
+    labels=("method", "route"),
+    buckets=DB_QUERY_BUCKETS,
+)
+http_db_time = registry.histogram(
+    "factsaura_http_db_seconds",
+    "Time spent waiting on database queries per HTTP request (profiling middleware only).",
+    labels=("method", "route"),
+)
+http_over_budget = registry.counter(
+    "factsaura_http_over_budget_total",
+    "HTTP requests slower than PROFILING_BUDGET_MS.",
+    labels=("method", "route"),
+)
+
+class RequestProfile:
+    """
+    Timings for one HTTP request. Queries are attributed through the
+    `current_profile` context variable, so tasks the request spawns count too.
+    """
+    __slots__ = ("start", "db_queries", "db_time", "samples")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.samples: Counter = Counter()
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+    def server_timing(self, budget: float) -> str:
+        elapsed = self.elapsed()
+        value = f'app;dur={elapsed * 1000:.1f}, db;dur={self.db_time * 1000:.1f};desc="{self.db_queries} queries"'
+        if elapsed > budget:
+            value += ", over-budget"
+        return value
+
+current_profile: contextvars.ContextVar[Optional[RequestProfile]] = contextvars.ContextVar("current_profile", default=None)
+
+def instrument_client(client_class):
+    """
+    Wraps Prisma's `_execute`, which every query (model actions, raw SQL and
+    queries inside transactions) goes through, to count queries and time them
+    for the current request. Patched on the class so transaction clients,
+    which are fresh copies, are counted as well. Idempotent.
+    """
+    original = client_class._execute
+    if getattr(original, "_profiled", False):
+        return
+
+    async def _execute(self, *args, **kwargs):
+        profile = current_profile.get()
+        if profile is None:
+            return await original(self, *args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return await original(self, *args, **kwargs)
+        finally:
+            profile.db_queries += 1
+            profile.db_time += time.perf_counter() - start
+
+    _execute._profiled = True
+    client_class._execute = _execute
+
+def frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+class RequestProfiler:
+    """
+    Settings and the optional stack sampler behind ProfilingMiddleware.
+
+    When `sample_slow` is on, a background thread samples the event loop
+    thread's stack every PROFILING_SAMPLE_INTERVAL_MS. A sample is credited to
+    a request when the request's middleware frame is on the stack, i.e. when
+    that request's task was the one running. Requests that end up over budget
+    have their samples written to PROFILING_DIR in collapsed-stack format
+    (flamegraph.pl / speedscope).
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("PROFILING_ENABLED", "").lower() in ("1", "true", "yes")
+        self.budget = float(os.getenv("PROFILING_BUDGET_MS", "250")) / 1000
+        self.sample_rate = float(os.getenv("PROFILING_SAMPLE_RATE", "1.0"))
+        self.sample_interval = float(os.getenv("PROFILING_SAMPLE_INTERVAL_MS", "5")) / 1000
+        self.output_dir = os.getenv("PROFILING_DIR", "profiles")
+        self.sample_slow = False
+        self.profiles_written = 0
+        # id(middleware frame) -> (frame, profile) for requests being sampled
+        self._active: Dict[int, Any] = {}
+        self._loop_thread: Optional[int] = None
+        self._sampler: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        if os.getenv("PROFILING_SAMPLE_SLOW", "").lower() in ("1", "true", "yes"):
+            self.set_sampling(True)
+
+    def set_sampling(self, on: bool):
+        self.sample_slow = on
+        if on and self._sampler is None:
+            self._stop.clear()
+            self._sampler = threading.Thread(target=self._run_sampler, name="request-sampler", daemon=True)
+            self._sampler.start()
+        elif not on and self._sampler is not None:
+            self._stop.set()
+            self._sampler.join()
+            self._sampler = None
+            self._active.clear()
+
+    def begin(self, profile: RequestProfile, frame) -> bool:
+        """
+        Registers a request for stack sampling; returns whether it was chosen.
+        Must be called from the event loop thread with the request's own frame.
+        """
+        if not self.sample_slow or random.random() >= self.sample_rate:
+            return False
+        self._loop_thread = threading.get_ident()
+        self._active[id(frame)] = (frame, profile)
+        return True
+
+    def end(self, frame):
+        self._active.pop(id(frame), None)
+
+    def _run_sampler(self):
+        while not self._stop.wait(self.sample_interval):
+            if not self._active or self._loop_thread is None:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            stack = []
+            while frame is not None:
+                entry = self._active.get(id(frame))
+                if entry is not None and entry[0] is frame:
+                    stack.reverse()
+                    entry[1].samples[";".join(stack) or "(middleware)"] += 1
+                    break
+                stack.append(frame_label(frame))
+                frame = frame.f_back
+
+    def write_profile(self, method: str, route: str, profile: RequestProfile, elapsed: float) -> Optional[str]:
+        if not profile.samples:
+            return None
+        os.makedirs(self.output_dir, exist_ok=True)
+        safe_route = re.sub(r"[^A-Za-z0-9_.-]+", "_", route).strip("_") or "root"
+        path = os.path.join(self.output_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{method}-{safe_route}-{int(elapsed * 1000)}ms.folded")
+        with open(path, "w") as f:
+            for stack, count in profile.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        self.profiles_written += 1
+        return path
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "budget_ms": self.budget * 1000,
+            "sample_slow": self.sample_slow,
+            "sample_rate": self.sample_rate,
+            "sample_interval_ms": self.sample_interval * 1000,
+            "output_dir": os.path.abspath(self.output_dir),
+            "profiles_written": self.profiles_written,
+        }
+
+# Global instance
+profiler = RequestProfiler()
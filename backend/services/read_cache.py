@@ -0,0 +1,62 @@
+import os
+import uuid
+from typing import Iterable
+from services.cache import ReadThroughCache
+from services.connection_manager import manager
+from services.metrics import registry
+
+# Shared by every service instance in this process
+CACHE_SIZE = int(os.getenv("READ_CACHE_SIZE", "2048"))
+# Backstop for invalidations lost on the way (e.g. while the bus reconnects)
+CACHE_TTL = float(os.getenv("READ_CACHE_TTL_SECONDS", "60"))
+incident_cache = ReadThroughCache("incident", CACHE_SIZE, CACHE_TTL)
+post_cache = ReadThroughCache("post", CACHE_SIZE, CACHE_TTL)
+# Incident id -> that incident's posts in timestamp order
+incident_posts_cache = ReadThroughCache("incident_posts", int(os.getenv("READ_CACHE_LIST_SIZE", "256")), CACHE_TTL)
+
+CACHES = (incident_cache, post_cache, incident_posts_cache)
+
+registry.gauge(
+    "factsaura_cache_entries",
+    "Entries held by each read-through cache.",
+    labels=("cache",),
+    collect=lambda: [((cache.name,), len(cache.entries)) for cache in CACHES],
+)
+
+# Lets a worker skip its own invalidations when they come back over the bus
+NODE_ID = uuid.uuid4().hex
+
+def _apply(incident_ids: Iterable[str], post_ids: Iterable[str], incident_post_lists: Iterable[str], source: str):
+    for incident_id in incident_ids:
+        incident_cache.invalidate(incident_id, source)
+    for post_id in post_ids:
+        post_cache.invalidate(post_id, source)
+    for incident_id in incident_post_lists:
+        incident_posts_cache.invalidate(incident_id, source)
+
+async def invalidate(incidents: Iterable[str] = (), posts: Iterable[str] = (), incident_posts: Iterable[str] = ()):
+    """
+    Drops cached reads after a write has been committed: incident rows, post rows
+    and per-incident post lists. Applied locally right away and sent to the other
+    workers over the event bus.
+    """
+    incidents, posts, incident_posts = list(incidents), list(posts), list(incident_posts)
+    _apply(incidents, posts, incident_posts, "local")
+    try:
+        await manager.bus.publish({
+            "kind": "invalidate",
+            "origin": NODE_ID,
+            "incidents": incidents,
+            "posts": posts,
+            "incident_posts": incident_posts,
+        })
+    except Exception as e:
+        # Other workers keep the old entries until READ_CACHE_TTL_SECONDS runs out
+        print(f"[ReadCache] Error publishing invalidation: {e}")
+
+def _on_bus_event(envelope: dict):
+    if envelope.get("kind") != "invalidate" or envelope.get("origin") == NODE_ID:
+        return
+    _apply(envelope.get("incidents") or (), envelope.get("posts") or (), envelope.get("incident_posts") or (), "bus")
+
+manager.bus.subscribe(_on_bus_event)
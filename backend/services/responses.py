@@ -0,0 +1,64 @@
+from email.utils import formatdate
+from typing import Any, Dict, Optional
+from fastapi import Request
+from fastapi.responses import Response
+from services.serialization import dumps_bytes
+
+class FastJSONResponse(Response):
+    """
+    JSON response encoded by services.serialization (orjson when installed).
+
+    Handlers that already hold plain dicts from the *_payload helpers return it
+    directly; FastAPI then skips its jsonable_encoder / response_model pass and
+    the content is encoded exactly once.
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps_bytes(content)
+
+class VersionToken:
+    """
+    Cheap stand-in for the state of a collection, computed from an aggregate
+    query instead of the rows themselves. Equal tokens mean equal responses.
+    """
+
+    def __init__(self, kind: str, *parts: Any, last_modified_ms: Optional[float] = None):
+        self.parts = parts
+        self.etag = 'W/"%s-%s"' % (kind, "-".join(str(int(p or 0)) for p in parts))
+        self.last_modified = last_modified_ms / 1000 if last_modified_ms else None
+
+    def headers(self) -> Dict[str, str]:
+        # no-cache: browsers may store the body but must revalidate before each reuse
+        headers = {"ETag": self.etag, "Cache-Control": "no-cache"}
+        if self.last_modified is not None:
+            headers["Last-Modified"] = formatdate(self.last_modified, usegmt=True)
+        return headers
+
+    def matches(self, request: Request) -> bool:
+        """
+        True when the client's cached copy is current, judged by If-None-Match
+        only. If-Modified-Since is ignored: HTTP dates have whole-second
+        resolution, so a write later in the same second as the cached copy
+        would pass for unchanged. Last-Modified is still sent for information.
+        """
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is None:
+            return False
+        candidates = [tag.strip() for tag in if_none_match.split(",")]
+        # Weak comparison: W/"x" and "x" name the same version
+        ours = self.etag[2:]
+        return "*" in candidates or any(tag.removeprefix("W/") == ours for tag in candidates)
+
+def conditional_response(request: Request, token: VersionToken) -> Optional[Response]:
+    """
+    Returns a 304 response if the client already has this version, else None.
+    Call before running the query the response is built from.
+    """
+    if token.matches(request):
+        return Response(status_code=304, headers=token.headers())
+    return None
+
+def with_validators(response: Response, token: VersionToken) -> Response:
+    response.headers.update(token.headers())
+    return response
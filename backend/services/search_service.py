@@ -0,0 +1,271 @@
+"""
+Full-text search over post and comment text.
+
+With the default SEARCH_BACKEND=postgres, queries run against the generated
+"searchVector" tsvector columns and their GIN indexes (migration
+20261019170000_full_text_search), parsed with websearch_to_tsquery and ranked
+with ts_rank. SEARCH_BACKEND=memory uses an in-process inverted index instead,
+for databases without the migration or text search; it matches plain lowercased
+words (no stemming), so its results are close to but not the same as Postgres's.
+
+Results are ordered by rank, then newest first, then id, and paged with an
+opaque cursor holding the last result's (rank, createdAt, id): each page is a
+strict continuation of the previous one however many rows are inserted meanwhile.
+"""
+import base64
+import json
+import math
+import os
+import re
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Set, Tuple
+from services.db import get_db, connect_db
+from services.metrics import registry
+
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "postgres").lower()
+SEARCH_KINDS = ("post", "comment")
+MAX_LIMIT = 100
+# The in-process index re-reads rows this far behind the newest one it has, for
+# rows that commit out of createdAt order
+CATCH_UP_OVERLAP = timedelta(seconds=5)
+
+search_queries = registry.counter(
+    "factsaura_search_queries_total",
+    "Search requests, by backend.",
+    labels=("backend",),
+)
+
+Cursor = Tuple[float, float, str]
+
+def encode_cursor(result: Dict[str, Any]) -> str:
+    position = [result["rank"], result["createdMs"], result["id"]]
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Cursor:
+    """
+    Raises ValueError for anything encode_cursor did not produce.
+    """
+    try:
+        rank, created_ms, result_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return float(rank), float(created_ms), str(result_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def _ms(value: Optional[datetime]) -> Optional[float]:
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        # Timestamps are stored in UTC
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp() * 1000
+
+# "createdAt" holds UTC in columns without a zone, so since/until are turned into
+# UTC wall-clock times rather than timestamptz values (which Postgres would
+# compare through the session time zone)
+SEARCH_QUERY = """
+WITH query AS (SELECT websearch_to_tsquery('english', $1) AS q),
+hits AS (
+    SELECT 'post' AS kind, p."id", p."id" AS "postId", p."incidentId", p."author", p."content",
+           p."createdAt", ts_rank(p."searchVector", query.q) AS rank
+    FROM "Post" p, query
+    WHERE p."searchVector" @@ query.q
+    UNION ALL
+    SELECT 'comment' AS kind, c."id", c."postId", p."incidentId", c."author", c."content",
+           c."createdAt", ts_rank(c."searchVector", query.q) AS rank
+    FROM "Comment" c JOIN "Post" p ON p."id" = c."postId", query
+    WHERE c."searchVector" @@ query.q
+),
+page AS (
+    SELECT h.*, FLOOR(EXTRACT(EPOCH FROM h."createdAt") * 1000)::float8 AS "createdMs"
+    FROM hits h JOIN "Incident" i ON i."id" = h."incidentId"
+    WHERE ($2::text IS NULL OR h.kind = $2)
+      AND ($3::text IS NULL OR h."incidentId" = $3)
+      AND ($4::text IS NULL OR i."severity"::text = $4)
+      AND ($5::float8 IS NULL OR h."createdAt" >= (to_timestamp($5 / 1000.0) AT TIME ZONE 'UTC'))
+      AND ($6::float8 IS NULL OR h."createdAt" < (to_timestamp($6 / 1000.0) AT TIME ZONE 'UTC'))
+      AND ($7::real IS NULL OR (h.rank, FLOOR(EXTRACT(EPOCH FROM h."createdAt") * 1000)::float8, h."id")
+                                < ($7::real, $8::float8, $9::text))
+    ORDER BY h.rank DESC, h."createdAt" DESC, h."id" DESC
+    LIMIT $10
+)
+SELECT page.kind, page."id", page."postId", page."incidentId", page."author", page."createdMs",
+       page.rank::float8 AS rank,
+       ts_headline('english', page."content", query.q, 'MaxFragments=2, MinWords=5, MaxWords=20') AS snippet
+FROM page, query
+ORDER BY page.rank DESC, page."createdMs" DESC, page."id" DESC
+"""
+
+WORD_PATTERN = re.compile(r"\w+")
+# Common English words websearch_to_tsquery would drop as well
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have he her his i in is it its me my no not of on or our "
+    "she so than that the their them there these they this to was we were what when which who will with "
+    "you your".split()
+)
+
+def terms(text: str) -> List[str]:
+    return [word for word in WORD_PATTERN.findall(text.lower()) if word not in STOPWORDS]
+
+class InvertedIndex:
+    """
+    In-process search index: term -> {document id: term count}, plus the
+    fields each document needs for filtering and results. Severity belongs to
+    the incident and can change, so it is looked up in `severities` (incident
+    id -> severity, kept current by the owner) when searching.
+    """
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self.documents: Dict[str, Dict[str, Any]] = {}
+        self.by_incident: Dict[str, Set[str]] = defaultdict(set)
+        self.severities: Dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def add(self, kind: str, doc_id: str, post_id: str, incident_id: str, author: str,
+            content: str, created_at: datetime):
+        key = f"{kind}:{doc_id}"
+        if key in self.documents:
+            return
+        words = terms(content)
+        self.documents[key] = {
+            "kind": kind, "id": doc_id, "postId": post_id, "incidentId": incident_id, "author": author,
+            "content": content, "createdMs": float(math.floor(_ms(created_at))), "length": len(words),
+        }
+        self.by_incident[incident_id].add(key)
+        for term, count in Counter(words).items():
+            self.postings[term][key] = count
+
+    def remove_incident(self, incident_id: str):
+        """
+        Drops every post and comment of an incident (e.g. once it is archived).
+        """
+        for key in self.by_incident.pop(incident_id, ()):
+            doc = self.documents.pop(key)
+            for term in set(terms(doc["content"])):
+                postings = self.postings[term]
+                postings.pop(key, None)
+                if not postings:
+                    del self.postings[term]
+
+    def search(self, q: str, kind: Optional[str] = None, incident_id: Optional[str] = None,
+               severity: Optional[str] = None, since: Optional[datetime] = None, until: Optional[datetime] = None,
+               after: Optional[Cursor] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Documents containing every query term, ranked by how much of the document
+        the terms make up, in the same order and with the same filters and
+        cursor as the Postgres query. The rank depends on the document alone (like
+        ts_rank), so cursors stay valid while documents are added.
+        """
+        query_terms = set(terms(q))
+        if not query_terms or any(term not in self.postings for term in query_terms):
+            return []
+        # Intersect from the rarest term
+        ordered = sorted(query_terms, key=lambda term: len(self.postings[term]))
+        matches = set(self.postings[ordered[0]])
+        for term in ordered[1:]:
+            matches &= self.postings[term].keys()
+
+        since_ms, until_ms = _ms(since), _ms(until)
+        results = []
+        for key in matches:
+            doc = self.documents[key]
+            if ((kind and doc["kind"] != kind) or (incident_id and doc["incidentId"] != incident_id)
+                    or (severity and self.severities.get(doc["incidentId"]) != severity)
+                    or (since_ms is not None and doc["createdMs"] < since_ms)
+                    or (until_ms is not None and doc["createdMs"] >= until_ms)):
+                continue
+            rank = sum(self.postings[term][key] for term in query_terms) / (1 + doc["length"])
+            if after is not None and (rank, doc["createdMs"], doc["id"]) >= after:
+                continue
+            results.append({**{k: doc[k] for k in ("kind", "id", "postId", "incidentId", "author", "createdMs")},
+                            "rank": rank, "snippet": doc["content"]})
+        results.sort(key=lambda r: (r["rank"], r["createdMs"], r["id"]), reverse=True)
+        return results[:limit]
+
+class SearchService:
+    def __init__(self, backend: Optional[str] = None):
+        self.backend = backend or SEARCH_BACKEND
+        self.index = InvertedIndex()
+        self._indexed_until: Optional[datetime] = None
+        self._known_incidents: Optional[Set[str]] = None
+
+    @property
+    def db(self):
+        # Shared, lazily created client (services/db.py)
+        return get_db()
+
+    async def _sync_index(self):
+        """
+        Adds the posts and comments created since the last search to the
+        in-process index (all of them on first use), drops those of incidents
+        that were archived since and re-reads those of incidents that came back.
+        """
+        incidents = {i.id: getattr(i.severity, "value", i.severity) for i in await self.db.incident.find_many()}
+        self.index.severities = incidents
+        for incident_id in [i for i in self.index.by_incident if i not in incidents]:
+            self.index.remove_incident(incident_id)
+        # New incidents, or ones rehydrated from the archive whose rows are older than the watermark
+        returned = [] if self._known_incidents is None else [i for i in incidents if i not in self._known_incidents]
+        self._known_incidents = set(incidents)
+
+        since = {"createdAt": {"gte": self._indexed_until - CATCH_UP_OVERLAP}} if self._indexed_until else {}
+        posts = await self.db.post.find_many(where=since)
+        comments = await self.db.comment.find_many(where=since, include={"post": True})
+        if since and returned:
+            posts += await self.db.post.find_many(where={"incidentId": {"in": returned}})
+            comments += await self.db.comment.find_many(where={"post": {"incidentId": {"in": returned}}},
+                                                        include={"post": True})
+        for post in posts:
+            self.index.add("post", post.id, post.id, post.incidentId, post.author, post.content, post.createdAt)
+        for comment in comments:
+            self.index.add("comment", comment.id, comment.postId, comment.post.incidentId, comment.author,
+                           comment.content, comment.createdAt)
+        newest = [row.createdAt for row in posts + comments]
+        if newest:
+            # add() skips the rows read again
+            self._indexed_until = max(newest + ([self._indexed_until] if self._indexed_until else []))
+
+    async def search(self, q: str, kind: Optional[str] = None, incident_id: Optional[str] = None,
+                     severity: Optional[str] = None, since: Optional[datetime] = None,
+                     until: Optional[datetime] = None, cursor: Optional[str] = None,
+                     limit: int = 20) -> Dict[str, Any]:
+        """
+        Returns {"results", "nextCursor"}; pass nextCursor back for the next page
+        (None on the last one). Raises ValueError for a malformed cursor.
+        """
+        after = decode_cursor(cursor) if cursor else None
+        limit = max(1, min(limit, MAX_LIMIT))
+        await connect_db()
+        search_queries.inc(backend=self.backend)
+
+        if self.backend == "memory":
+            await self._sync_index()
+            results = self.index.search(q, kind, incident_id, severity, since, until, after, limit + 1)
+        else:
+            rank, created_ms, result_id = after if after else (None, None, None)
+            results = await self.db.query_raw(
+                SEARCH_QUERY, q, kind, incident_id, severity, _ms(since), _ms(until),
+                rank, created_ms, result_id, limit + 1,
+            )
+
+        # One extra row tells whether there is another page
+        next_cursor = encode_cursor(results[limit - 1]) if len(results) > limit else None
+        page = []
+        for result in results[:limit]:
+            page.append({
+                "kind": result["kind"],
+                "id": result["id"],
+                "postId": result["postId"],
+                "incidentId": result["incidentId"],
+                "author": result["author"],
+                "createdAt": datetime.fromtimestamp(result["createdMs"] / 1000, timezone.utc),
+                "rank": result["rank"],
+                "snippet": result["snippet"],
+            })
+        return {"results": page, "nextCursor": next_cursor}
+
+# Global instance
+search_service = SearchService()
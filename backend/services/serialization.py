@@ -0,0 +1,103 @@
+import json
+from datetime import date, datetime
+from enum import Enum
+from typing import Any, Dict, Iterable
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is listed in requirements.txt
+    orjson = None
+
+# Scalar Post columns sent to clients. Relations (incident, parent, children,
+# comments) are never loaded on these code paths, so .dict() would only add nulls.
+POST_FIELDS = (
+    "id",
+    "content",
+    "author",
+    "timestamp",
+    "incidentId",
+    "parentId",
+    "parentInferred",
+    "mutationScore",
+    "mutationType",
+    "credibleVotes",
+    "totalVotes",
+    "version",
+    "createdAt",
+    "updatedAt",
+)
+
+COMMENT_FIELDS = ("id", "postId", "author", "content", "createdAt")
+
+INCIDENT_FIELDS = ("id", "title", "severity", "location", "status", "createdAt", "updatedAt")
+
+def _default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    if hasattr(value, "dict"):
+        return value.dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(obj: Any) -> str:
+    """
+    Encodes `obj` as compact JSON text, using orjson when it is installed.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default).decode("utf-8")
+    return json.dumps(obj, default=_default, separators=(",", ":"), ensure_ascii=False)
+
+def dumps_bytes(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default)
+    return dumps(obj).encode("utf-8")
+
+def loads(data: Any) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def _enum_value(value: Any) -> Any:
+    return value.value if isinstance(value, Enum) else value
+
+def post_payload(post: Any) -> Dict[str, Any]:
+    """
+    Builds the client-facing dict for a Post without copying its relations.
+    """
+    return {field: _enum_value(getattr(post, field, None)) for field in POST_FIELDS}
+
+def post_delta(post: Any, fields: Iterable[str], event: str) -> Dict[str, Any]:
+    """
+    Builds a post_delta message carrying only `fields` of an updated post.
+    The changes apply on top of baseVersion and bring the post to version.
+    """
+    changes = {field: _enum_value(getattr(post, field, None)) for field in fields}
+    changes["updatedAt"] = getattr(post, "updatedAt", None)
+    return {
+        "type": "post_delta",
+        "payload": {
+            "id": post.id,
+            "event": event,
+            "baseVersion": post.version - 1,
+            "version": post.version,
+            "changes": changes,
+        },
+    }
+
+def merge_post_deltas(older: Dict[str, Any], newer: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Combines two consecutive deltas of the same post into one.
+    """
+    payload = dict(newer["payload"])
+    payload["baseVersion"] = older["payload"]["baseVersion"]
+    payload["changes"] = {**older["payload"]["changes"], **newer["payload"]["changes"]}
+    return {"type": "post_delta", "payload": payload}
+
+def comment_payload(comment: Any) -> Dict[str, Any]:
+    return {field: getattr(comment, field, None) for field in COMMENT_FIELDS}
+
+def incident_payload(incident: Any) -> Dict[str, Any]:
+    return {field: _enum_value(getattr(incident, field, None)) for field in INCIDENT_FIELDS}
@@ -0,0 +1,159 @@
+import asyncio
+from types import SimpleNamespace
+from services import db
+from services.agent_manager import AgentManager
+from services.agents.scanner_agent import ScannerAgent
+
+class FakeScanner(ScannerAgent):
+    """
+    The real sharding and batching over a fixed feed; ingesting only records the
+    post instead of writing it to the database.
+    """
+
+    def __init__(self, posts, shard_count):
+        super().__init__()
+        self.posts = posts
+        self.partition(shard_count)
+        self.ingested = []
+
+    async def process_post_db(self, post):
+        self.ingested.append(post["id"])
+
+class FakePublisher:
+    def __init__(self):
+        self.published = []
+
+    async def publish(self, result):
+        self.published.append(result["post_id"])
+
+def test_run_loop_processes_one_batch_from_the_scanner():
+    agents = AgentManager()
+    posts = [{"id": f"p{i}", "incident_id": f"inc{i % 3}", "content": f"report {i}", "truth_status": "TRUE"}
+             for i in range(6)]
+    agents.scanner = FakeScanner(posts, agents.coordinator.shard_count)
+    agents.publisher = FakePublisher()
+    agents.batch_size = 4
+    agents.coordinator.owned = {shard: 0 for shard, shard_posts in agents.scanner.shards.items() if shard_posts}
+    advanced = {}
+
+    async def advance(shard, cursor):
+        advanced[shard] = cursor
+        agents.coordinator.owned[shard] = cursor
+        return True
+
+    agents.coordinator.advance = advance
+    expected = agents.scanner.get_next_batch_for_shards(dict(agents.coordinator.owned), agents.batch_size)
+    agents.scanner._last_shard = -1
+
+    async def scenario():
+        agents.is_running = True
+        task = asyncio.create_task(agents._run_loop())
+        for _ in range(300):
+            if advanced or any(log["action"] == "Error" for log in agents.logs):
+                break
+            await asyncio.sleep(0.01)
+        agents.is_running = False
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(scenario())
+    assert not [log for log in agents.logs if log["action"] == "Error"]
+    batch_ids = [post["id"] for _, _, post in expected]
+    assert len(batch_ids) == 4
+    assert agents.scanner.ingested == agents.publisher.published == batch_ids
+    # Each shard's cursor moves past the last post it had in the batch
+    cursors = {}
+    for shard, position, _ in expected:
+        cursors[shard] = position + 1
+    assert advanced == cursors
+
+class FakeTable:
+    def __init__(self):
+        self.rows = {}
+
+    async def find_unique(self, where):
+        return self.rows.get(where["id"])
+
+    async def find_many(self, where):
+        return [self.rows[i] for i in where["id"]["in"] if i in self.rows]
+
+    async def create(self, data):
+        defaults = {"parentId": None, "parentInferred": False, "mutationScore": None, "mutationType": None,
+                    "credibleVotes": 0, "totalVotes": 0, "version": 1, "ancestorIds": [],
+                    "createdAt": None, "updatedAt": None}
+        self.rows[data["id"]] = SimpleNamespace(**{**defaults, **data})
+        return self.rows[data["id"]]
+
+    async def update(self, where, data):
+        row = self.rows[where["id"]]
+        row.mutationScore, row.mutationType = data["mutationScore"], data["mutationType"]
+        row.version += 1
+        return row
+
+class FakePrisma:
+    def __init__(self):
+        self.incident, self.post = FakeTable(), FakeTable()
+        self.advanced = []
+
+    def is_connected(self):
+        return True
+
+    async def execute_raw(self, sql, shard, owner, cursor):
+        # Only the fenced cursor update reaches the database in this test
+        self.advanced.append((shard, cursor))
+        return 1
+
+def test_run_loop_processes_a_batch_and_advances_cursors(monkeypatch):
+    client = FakePrisma()
+    monkeypatch.setattr(db, "_client", client)
+    agents = AgentManager()
+    agents.batch_size = 5
+    agents.coordinator.owned = {shard: 0 for shard, posts in agents.scanner.shards.items() if posts}
+    expected = agents.scanner.get_next_batch_for_shards(dict(agents.coordinator.owned), agents.batch_size)
+    agents.scanner._last_shard = -1
+
+    async def scenario():
+        agents.is_running = True
+        task = asyncio.create_task(agents._run_loop())
+        for _ in range(300):
+            if client.advanced or any(log["action"] == "Error" for log in agents.logs):
+                break
+            await asyncio.sleep(0.01)
+        agents.is_running = False
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(scenario())
+    assert not [log for log in agents.logs if log["action"] == "Error"]
+    # Every post of the batch was ingested and scored
+    for _, _, post in expected:
+        assert client.post.rows[post["id"]].mutationScore is not None
+    # Each shard's cursor moves past the last post it had in the batch
+    cursors = {}
+    for shard, position, _ in expected:
+        cursors[shard] = position + 1
+    assert dict(client.advanced) == cursors
+    assert agents.coordinator.owned == {**{s: 0 for s in agents.coordinator.owned}, **cursors}
+
+def test_batches_rotate_shards_with_consecutive_positions():
+    agents = AgentManager()
+    scanner = agents.scanner
+    owned = {shard: 0 for shard, posts in scanner.shards.items() if posts}
+    seen = []
+    while True:
+        batch = scanner.get_next_batch_for_shards(owned, 4)
+        if not batch:
+            break
+        assert len(batch) <= 4
+        for shard, position, post in batch:
+            assert position == owned[shard]  # no gaps, so advancing the cursor is safe
+            owned[shard] = position + 1
+            seen.append(post["id"])
+    assert len(seen) == len(set(seen)) == sum(len(p) for p in scanner.shards.values())
+    assert scanner.get_next_batch_for_shards({}, 4) == []
@@ -0,0 +1,40 @@
+import asyncio
+from types import SimpleNamespace
+from hypothesis import given, strategies as st
+from services.analysis_service import AnalysisService, rank_similar_posts
+from services.fingerprint import content_hash
+
+@given(st.text(max_size=40), st.lists(st.text(max_size=40), max_size=20), st.floats(min_value=0, max_value=1))
+def test_ranked_matches_clear_threshold_and_are_sorted(content, corpus, threshold):
+    posts = [SimpleNamespace(id=str(i), content=text) for i, text in enumerate(corpus)]
+    matches = rank_similar_posts(content, posts, threshold)
+    scores = [m["similarity"] for m in matches]
+    assert all(score >= threshold for score in scores)
+    assert scores == sorted(scores, reverse=True)
+
+def test_exact_copy_ranks_first():
+    posts = [SimpleNamespace(id="a", content="bridge closed near river"), SimpleNamespace(id="b", content="dam cracked downtown")]
+    matches = rank_similar_posts("dam cracked downtown", posts, threshold=0.5)
+    assert matches[0]["post"].id == "b" and matches[0]["similarity"] == 1.0
+
+class FakePostTable:
+    def __init__(self, posts):
+        self.posts = posts
+        self.calls = []
+
+    async def find_many(self, where=None, **kwargs):
+        self.calls.append(where)
+        if where and "contentHash" in where:
+            return [p for p in self.posts if p.contentHash == where["contentHash"]]
+        return list(self.posts)
+
+def test_exact_duplicates_skip_the_fuzzy_scan():
+    text = "Army deployed, dam cracked downtown"
+    table = FakePostTable([SimpleNamespace(id="known-post", content=text, contentHash=content_hash(text))])
+    service = AnalysisService(SimpleNamespace(post=table))
+
+    result = asyncio.run(service.generate_truth_scorecard("army deployed,  DAM cracked downtown\n"))
+    assert result["match_percentage"] == 100 and result["risk_level"] == "HIGH"
+    assert result["related_posts"][0]["id"] == "known-post"
+    # One hash lookup, no full-table fetch for the Levenshtein scan
+    assert table.calls == [{"contentHash": content_hash(text)}]
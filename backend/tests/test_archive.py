@@ -0,0 +1,196 @@
+import asyncio
+import gzip
+import pytest
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from services import archive_service as archive_module
+from services.archive_service import ArchiveService
+from services.fingerprint import content_hash
+
+NOW = datetime(2026, 10, 1, 12, 0, tzinfo=timezone.utc)
+
+def incident(**extra):
+    return SimpleNamespace(**{"id": "inc-1", "title": "Dam breach", "severity": SimpleNamespace(value="CRITICAL"),
+                              "location": "Pune", "status": "RESOLVED", "createdAt": NOW, "updatedAt": NOW, **extra})
+
+def post(post_id, content, ancestors=(), incident_id="inc-1"):
+    ancestors = list(ancestors)
+    return SimpleNamespace(id=post_id, content=content, author="a", timestamp=NOW, incidentId=incident_id,
+                           parentId=ancestors[-1] if ancestors else None, parentInferred=False,
+                           mutationScore=0.0, mutationType=None, credibleVotes=0, totalVotes=0, version=1,
+                           createdAt=NOW, updatedAt=NOW, ancestorIds=ancestors, contentHash=content_hash(content))
+
+class FakeTable:
+    def __init__(self, rows=None):
+        self.rows = list(rows or [])
+
+    def _matches(self, row, where):
+        for key, condition in where.items():
+            if key == "NOT":
+                if self._matches(row, condition):
+                    return False
+            elif isinstance(condition, dict):
+                if getattr(row, key) not in condition["in"]:
+                    return False
+            elif getattr(row, key) != condition:
+                return False
+        return True
+
+    async def find_unique(self, where):
+        return next((row for row in self.rows if self._matches(row, where)), None)
+
+    async def find_many(self, where=None):
+        return [row for row in self.rows if self._matches(row, where or {})]
+
+    async def count(self, where):
+        return len(await self.find_many(where))
+
+    async def delete_many(self, where):
+        kept = [row for row in self.rows if not self._matches(row, where)]
+        deleted, self.rows = len(self.rows) - len(kept), kept
+        return deleted
+
+    async def delete(self, where):
+        await self.delete_many(where)
+
+    async def create(self, data):
+        self.rows.append(SimpleNamespace(**data))
+        return self.rows[-1]
+
+    async def create_many(self, data):
+        for row in data:
+            await self.create(row)
+
+class FakeDB:
+    def __init__(self, incidents, posts, comments):
+        self.incident, self.post, self.comment = FakeTable(incidents), FakeTable(posts), FakeTable(comments)
+
+    def tx(self, timeout=None):
+        db = self
+        tables = (self.incident, self.post, self.comment)
+
+        class Transaction:
+            async def __aenter__(self):
+                self.saved = [list(table.rows) for table in tables]
+                return db
+
+            async def __aexit__(self, exc_type, *exc):
+                if exc_type is not None:
+                    for table, rows in zip(tables, self.saved):
+                        table.rows = rows
+                return False
+        return Transaction()
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    # Children listed before their parents, as find_many may return them
+    db = FakeDB(
+        [incident()],
+        [post("p3", "dam broke, whole city under water", ["p1", "p2"]),
+         post("p1", "dam cracked near the city"),
+         post("p2", "dam broke near the city", ["p1"]),
+         post("other", "unrelated", incident_id="inc-2")],
+        [SimpleNamespace(id="c1", postId="p2", author="b", content="source?", createdAt=NOW)],
+    )
+
+    async def connect_db():
+        return db
+
+    async def invalidate(**kwargs):
+        pass
+
+    async def broadcast_incident_event(event_type, record):
+        pass
+
+    monkeypatch.setattr(archive_module, "get_db", lambda: db)
+    monkeypatch.setattr(archive_module, "connect_db", connect_db)
+    monkeypatch.setattr(archive_module.read_cache, "invalidate", invalidate)
+    monkeypatch.setattr(archive_module.manager, "broadcast_incident_event", broadcast_incident_event)
+    return db
+
+def test_archive_writes_parents_first_and_clears_hot_tables(fake_db, tmp_path):
+    service = ArchiveService(str(tmp_path))
+    result = asyncio.run(service.archive_incident("inc-1"))
+
+    assert (result["posts"], result["comments"]) == (3, 1)
+    lines = list(archive_module._iter_lines(service.path_for("inc-1")))
+    assert [line["kind"] for line in lines] == ["incident", "post", "post", "post", "comment"]
+    assert [line["row"]["id"] for line in lines[1:4]] == ["p1", "p2", "p3"]
+    assert lines[0]["row"]["severity"] == "CRITICAL"
+    assert lines[3]["row"]["ancestorIds"] == ["p1", "p2"]
+    assert fake_db.incident.rows == [] and fake_db.comment.rows == []
+    assert [p.id for p in fake_db.post.rows] == ["other"]
+    assert not list(tmp_path.glob("*.tmp"))
+
+def test_rehydrate_restores_rows_and_removes_the_file(fake_db, tmp_path):
+    service = ArchiveService(str(tmp_path))
+    asyncio.run(service.archive_incident("inc-1"))
+    result = asyncio.run(service.rehydrate("inc-1"))
+
+    assert (result["posts"], result["comments"]) == (3, 1)
+    assert not (tmp_path / "inc-1.ndjson.gz").exists()
+    restored = {p.id: p for p in fake_db.post.rows}
+    assert restored["p3"].timestamp == NOW and restored["p3"].ancestorIds == ["p1", "p2"]
+    assert fake_db.incident.rows[0].createdAt == NOW
+    assert fake_db.incident.rows[0].updatedAt > NOW  # not picked up again by the next run
+    assert fake_db.comment.rows[0].postId == "p2"
+
+def test_archive_refuses_trees_shared_with_other_incidents(fake_db, tmp_path):
+    fake_db.post.rows.append(post("cross", "reply", ["p1"], incident_id="inc-2"))
+    service = ArchiveService(str(tmp_path))
+    with pytest.raises(ValueError):
+        asyncio.run(service.archive_incident("inc-1"))
+    assert not list(tmp_path.iterdir())
+    assert len(fake_db.post.rows) == 5
+
+def test_archive_refuses_incidents_that_are_still_open(fake_db, tmp_path):
+    fake_db.incident.rows[0].status = SimpleNamespace(value="ACTIVE")
+    service = ArchiveService(str(tmp_path))
+    with pytest.raises(ValueError):
+        asyncio.run(service.archive_incident("inc-1"))
+    assert not list(tmp_path.iterdir())
+    assert len(fake_db.post.rows) == 4
+    with pytest.raises(LookupError):
+        asyncio.run(service.archive_incident("missing"))
+
+@pytest.mark.parametrize("late_row", ["post", "comment"])
+def test_rows_written_during_archival_roll_the_delete_back(fake_db, tmp_path, late_row):
+    service = ArchiveService(str(tmp_path))
+    write = service._write
+
+    def write_then_receive(*args):
+        # Arrives after the rows were read, so it is not in the file
+        write(*args)
+        if late_row == "post":
+            fake_db.post.rows.append(post("late", "dam still holding?"))
+        else:
+            fake_db.comment.rows.append(SimpleNamespace(id="c2", postId="p1", author="c", content="any update?",
+                                                        createdAt=NOW))
+
+    service._write = write_then_receive
+    with pytest.raises(ValueError):
+        asyncio.run(service.archive_incident("inc-1"))
+    assert not list(tmp_path.iterdir())
+    assert len(fake_db.incident.rows) == 1
+    assert len(fake_db.post.rows) == (5 if late_row == "post" else 4)
+    assert len(fake_db.comment.rows) == (1 if late_row == "post" else 2)
+
+def test_stream_and_search_read_the_archive(fake_db, tmp_path):
+    service = ArchiveService(str(tmp_path))
+    asyncio.run(service.archive_incident("inc-1"))
+
+    async def read():
+        return b"".join([chunk async for chunk in service.stream("inc-1")])
+
+    with gzip.open(service.path_for("inc-1"), "rb") as f:
+        assert asyncio.run(read()) == f.read()
+
+    matches = asyncio.run(service.find_similar("DAM cracked  near the city"))
+    assert matches[0]["post"].id == "p1" and matches[0]["similarity"] == 1.0
+    assert asyncio.run(service.find_similar("completely different text")) == []
+    assert [a["incidentId"] for a in service.list_archived()] == ["inc-1"]
+
+@pytest.mark.parametrize("incident_id", ["", "../etc", "a/b", ".hidden"])
+def test_archive_paths_stay_in_the_archive_dir(incident_id):
+    with pytest.raises(ValueError):
+        ArchiveService("archive").path_for(incident_id)
@@ -0,0 +1,41 @@
+import pytest
+from types import SimpleNamespace
+from services.post_service import PostService
+
+service = PostService()
+
+def item(content, **extra):
+    return {"content": content, "author": "importer", "incidentId": "i1", **extra}
+
+def test_parent_refs_resolve_within_the_batch():
+    existing = {"root": SimpleNamespace(id="root", content="dam cracked near the city", ancestorIds=[])}
+    rows = service.plan_bulk_posts([
+        item("dam cracked near the city!", parentId="root"),
+        item("dam cracked, city flooding", parentRef=0),
+        item("unrelated rumor"),
+    ], existing)
+
+    assert rows[0]["parentId"] == "root"
+    assert rows[1]["parentId"] == rows[0]["id"]
+    assert rows[2]["parentId"] is None and rows[2]["mutationScore"] == 0.0
+    # Scored against the in-batch parent's content
+    expected = service.calculate_mutation_score(rows[0]["content"], rows[1]["content"])
+    assert rows[1]["mutationScore"] == expected
+    assert rows[1]["mutationType"] == service.classify_mutation(expected)
+    assert len({row["id"] for row in rows}) == 3
+
+@pytest.mark.parametrize("items", [
+    [item("a", parentRef=0)],                       # itself
+    [item("a"), item("b", parentRef=2)],            # a later item
+    [item("a", parentId="missing")],                # unknown post
+    [item("a"), item("b", parentRef=0, parentId="x")],
+])
+def test_bad_references_are_rejected(items):
+    with pytest.raises(ValueError):
+        service.plan_bulk_posts(items, {})
+
+def test_bulk_rows_carry_ancestor_paths():
+    existing = {"root": SimpleNamespace(id="root", content="x", ancestorIds=["origin"])}
+    rows = service.plan_bulk_posts([item("a", parentId="root"), item("b", parentRef=0)], existing)
+    assert rows[0]["ancestorIds"] == ["origin", "root"]
+    assert rows[1]["ancestorIds"] == ["origin", "root", rows[0]["id"]]
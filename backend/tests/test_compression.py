@@ -0,0 +1,55 @@
+from datetime import datetime
+from fastapi import FastAPI, Response
+from fastapi.testclient import TestClient
+from middleware.compression import CompressionMiddleware, choose_encoding
+from services.responses import FastJSONResponse
+
+app = FastAPI(default_response_class=FastJSONResponse)
+app.add_middleware(CompressionMiddleware, minimum_size=500)
+
+@app.get("/big")
+async def big():
+    return FastJSONResponse([{"id": i, "content": "flood water rising near the bridge", "at": datetime(2026, 1, 1)} for i in range(100)])
+
+@app.get("/small")
+async def small():
+    return {"ok": True}
+
+@app.get("/varied")
+async def varied():
+    return FastJSONResponse({"ok": True}, headers={"Vary": "Origin"})
+
+@app.get("/image")
+async def image():
+    return Response(b"\x89PNG", media_type="image/png")
+
+client = TestClient(app)
+
+def test_choose_encoding():
+    assert choose_encoding("gzip, deflate, br") == "br"
+    assert choose_encoding("gzip;q=1.0, br;q=0") == "gzip"
+    assert choose_encoding("identity") == ""
+
+def test_large_responses_are_compressed_and_small_ones_are_not():
+    for encoding in ("gzip", "br"):
+        response = client.get("/big", headers={"Accept-Encoding": encoding})
+        assert response.headers["content-encoding"] == encoding
+        assert "Accept-Encoding" in response.headers["vary"]
+        body = response.json()
+        assert len(body) == 100 and body[0]["at"] == "2026-01-01T00:00:00"
+
+    small = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
+    assert small.json() == {"ok": True}
+
+    plain = client.get("/big", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert len(plain.content) == int(plain.headers["content-length"])
+
+    # Uncompressed copies vary by Accept-Encoding too, or a shared cache could serve them for gzip requests
+    assert small.headers["vary"] == plain.headers["vary"] == "Accept-Encoding"
+
+def test_vary_is_merged_with_the_response_own():
+    response = client.get("/varied", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["vary"] == "Origin, Accept-Encoding"
+    assert client.get("/image").headers.get("vary") is None
@@ -0,0 +1,37 @@
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from services.responses import FastJSONResponse, VersionToken, conditional_response, with_validators
+
+app = FastAPI()
+state = {"count": 2, "modified": 1760000000000.0, "queries": 0}
+
+@app.get("/items")
+async def items(request: Request):
+    version = VersionToken("items", state["count"], state["modified"], last_modified_ms=state["modified"])
+    not_modified = conditional_response(request, version)
+    if not_modified:
+        return not_modified
+    state["queries"] += 1
+    return with_validators(FastJSONResponse(list(range(state["count"]))), version)
+
+client = TestClient(app)
+
+def test_revalidation_returns_304_until_the_version_changes():
+    first = client.get("/items")
+    etag = first.headers["etag"]
+    assert first.status_code == 200 and first.headers["cache-control"] == "no-cache"
+
+    again = client.get("/items", headers={"If-None-Match": etag})
+    assert again.status_code == 304 and again.content == b""
+    assert state["queries"] == 1
+
+    # A write in the same second keeps Last-Modified: the date alone cannot tell
+    state["count"] += 1
+    state["modified"] += 300
+    same_second = client.get("/items", headers={"If-Modified-Since": first.headers["last-modified"]})
+    assert same_second.status_code == 200 and same_second.headers["last-modified"] == first.headers["last-modified"]
+
+    state["count"] += 1
+    changed = client.get("/items", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.json() == [0, 1, 2, 3]
+    assert changed.headers["etag"] != etag
@@ -0,0 +1,206 @@
+import asyncio
+import json
+from services.connection_manager import ConnectionManager
+
+class RecordingWebSocket:
+    def __init__(self, stalled=False, broken=False):
+        self.stalled = stalled
+        self.broken = broken
+        self.sent = []
+        self.closed_with = None
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, data):
+        if self.broken:
+            raise RuntimeError("connection reset")
+        if self.stalled:
+            await asyncio.Event().wait()
+        self.sent.append(json.loads(data))
+
+    async def close(self, code=1000):
+        self.closed_with = code
+
+def test_stalled_client_does_not_block_others_and_is_evicted():
+    async def scenario():
+        manager = ConnectionManager(max_queue=2)
+        healthy, stalled = RecordingWebSocket(), RecordingWebSocket(stalled=True)
+        await manager.connect(healthy, "inc")
+        await manager.connect(stalled, "inc")
+
+        for i in range(5):
+            await manager.broadcast({"n": i}, "inc")
+            await asyncio.sleep(0)
+        await asyncio.sleep(0.01)
+
+        assert [m["n"] for m in healthy.sent] == list(range(5))
+        assert stalled not in manager.active_connections["inc"]
+        # The close task was held only until it finished
+        assert stalled.closed_with == 1013 and not manager._closing
+        manager.disconnect(healthy, "inc")
+
+    asyncio.run(scenario())
+
+def test_resync_policy_replaces_backlog():
+    async def scenario():
+        manager = ConnectionManager(max_queue=2, slow_consumer_policy="resync")
+        stalled = RecordingWebSocket(stalled=True)
+        await manager.connect(stalled, "inc")
+        for i in range(5):
+            await manager.broadcast({"n": i}, "inc")
+
+        # Still subscribed, but the backlog was swapped for a resync notice
+        connection = manager.active_connections["inc"][stalled]
+        queued = [connection.queue.get_nowait() for _ in range(connection.queue.qsize())]
+        assert json.loads(queued[0])["type"] == "resync_required"
+        assert len(queued) <= 2
+        manager.disconnect(stalled, "inc")
+
+    asyncio.run(scenario())
+
+def test_message_is_encoded_once_for_all_subscribers():
+    async def scenario():
+        manager = ConnectionManager()
+        sockets = [RecordingWebSocket() for _ in range(3)]
+        for ws in sockets:
+            await manager.connect(ws, "inc")
+        await manager.broadcast({"type": "new_post", "payload": {"id": "p1"}}, "inc")
+
+        frames = [conn.queue.get_nowait() for conn in manager.active_connections["inc"].values()]
+        assert all(frame is frames[0] for frame in frames)
+        for ws in sockets:
+            manager.disconnect(ws, "inc")
+
+    asyncio.run(scenario())
+
+def test_dead_connections_are_removed():
+    async def scenario():
+        manager = ConnectionManager()
+        broken = RecordingWebSocket(broken=True)
+        await manager.connect(broken, "inc")
+        await manager.broadcast({"n": 1}, "inc")
+        await asyncio.sleep(0.01)
+        assert "inc" not in manager.active_connections
+
+    asyncio.run(scenario())
+
+class FakeIncident:
+    def __init__(self, id, severity, location, status="ACTIVE"):
+        self.id = id
+        self.title = "Flood"
+        self.severity = severity
+        self.location = location
+        self.status = status
+        self.createdAt = self.updatedAt = None
+
+def test_firehose_filters_and_multiplexing():
+    async def scenario():
+        manager = ConnectionManager()
+        critical, mumbai = RecordingWebSocket(), RecordingWebSocket()
+        (await manager.connect_firehose(critical)).subscription.subscribe(filters=[{"severity": "CRITICAL"}])
+        (await manager.connect_firehose(mumbai)).subscription.subscribe(incident_ids=["inc_1"], filters=[{"location": "mumbai"}])
+
+        await manager.broadcast_incident_event("incident_created", FakeIncident("inc_1", "WARNING", "Mumbai, Maharashtra"))
+        await manager.broadcast_incident_event("incident_updated", FakeIncident("inc_2", "CRITICAL", "New Delhi"))
+        await manager.broadcast({"type": "new_post", "payload": {"id": "p1"}}, "inc_1")
+        await asyncio.sleep(0.01)
+
+        assert [(m["type"], m["payload"]["id"]) for m in critical.sent] == [("incident_updated", "inc_2")]
+        assert mumbai.sent[0]["type"] == "incident_created"
+        assert mumbai.sent[1] == {"type": "incident_event", "incidentId": "inc_1", "event": {"seq": 1, "epoch": manager.bus.epoch, "type": "new_post", "payload": {"id": "p1"}}}
+        assert len(mumbai.sent) == 2
+        manager.disconnect_firehose(critical)
+        manager.disconnect_firehose(mumbai)
+
+    asyncio.run(scenario())
+
+def test_frames_carry_per_incident_sequence_numbers():
+    async def scenario():
+        manager = ConnectionManager()
+        a, b = RecordingWebSocket(), RecordingWebSocket()
+        await manager.connect(a, "inc_a")
+        await manager.connect(b, "inc_b")
+        for n in range(3):
+            await manager.broadcast({"n": n}, "inc_a")
+        await manager.broadcast({"n": 0}, "inc_b")
+        await asyncio.sleep(0.01)
+
+        assert [m["seq"] for m in a.sent] == [1, 2, 3]
+        assert b.sent == [{"seq": 1, "epoch": manager.bus.epoch, "n": 0}]
+        manager.disconnect(a, "inc_a")
+        manager.disconnect(b, "inc_b")
+
+    asyncio.run(scenario())
+
+def test_reconnect_with_last_seq_replays_missed_frames():
+    async def scenario():
+        manager = ConnectionManager(replay_size=4)
+        for n in range(6):
+            await manager.broadcast({"n": n}, "inc")
+
+        replayed, current, too_old = RecordingWebSocket(), RecordingWebSocket(), RecordingWebSocket()
+        await manager.connect(replayed, "inc", last_seq=4)
+        await manager.connect(current, "inc", last_seq=6)
+        # Seqs 1-2 already fell out of the four-frame buffer
+        await manager.connect(too_old, "inc", last_seq=1)
+        await manager.broadcast({"n": 6}, "inc")
+        await asyncio.sleep(0.01)
+
+        assert [m["seq"] for m in replayed.sent] == [5, 6, 7]
+        assert [m["seq"] for m in current.sent] == [7]
+        assert too_old.sent[0] == {"type": "resync_required", "payload": {"reason": "replay_gap"}}
+        assert too_old.sent[1]["seq"] == 7
+        for ws in (replayed, current, too_old):
+            manager.disconnect(ws, "inc")
+
+    asyncio.run(scenario())
+
+def test_reconnect_after_the_numbering_restarted_forces_a_resync():
+    async def scenario():
+        # A fresh process: its bus numbers from 1 again under a new epoch
+        manager = ConnectionManager()
+        for n in range(3):
+            await manager.broadcast({"n": n}, "inc")
+
+        stale_epoch, ahead, current = RecordingWebSocket(), RecordingWebSocket(), RecordingWebSocket()
+        # Seq 2 of the old process is not seq 2 of this one
+        await manager.connect(stale_epoch, "inc", last_seq=2, epoch="old")
+        # Older clients send no epoch, but a seq past the stream's end gives it away
+        await manager.connect(ahead, "inc", last_seq=40)
+        await manager.connect(current, "inc", last_seq=3, epoch=manager.bus.epoch)
+        await manager.broadcast({"n": 3}, "inc")
+        await asyncio.sleep(0.01)
+
+        gap = {"type": "resync_required", "payload": {"reason": "replay_gap"}}
+        assert stale_epoch.sent[0] == gap and stale_epoch.sent[1]["seq"] == 4
+        assert ahead.sent[0] == gap and ahead.sent[1]["seq"] == 4
+        assert [m["seq"] for m in current.sent] == [4]
+        assert current.sent[0]["epoch"] == manager.bus.epoch
+        for ws in (stale_epoch, ahead, current):
+            manager.disconnect(ws, "inc")
+
+    asyncio.run(scenario())
+
+def test_delta_clients_get_delta_frames_with_the_same_seq():
+    async def scenario():
+        manager = ConnectionManager()
+        full, delta = RecordingWebSocket(), RecordingWebSocket()
+        await manager.connect(full, "inc")
+        await manager.connect(delta, "inc", delta=True)
+
+        post = {"id": "p1", "content": "x" * 1000, "totalVotes": 3, "version": 4}
+        change = {"type": "post_delta", "payload": {"id": "p1", "baseVersion": 3, "version": 4, "changes": {"totalVotes": 3}}}
+        await manager.broadcast({"type": "new_post", "payload": {"id": "p2"}}, "inc")
+        await manager.broadcast({"type": "post_voted", "payload": post}, "inc", delta=change)
+        await asyncio.sleep(0.01)
+
+        stamp = {"seq": 2, "epoch": manager.bus.epoch}
+        assert full.sent[1] == {**stamp, "type": "post_voted", "payload": post}
+        assert delta.sent[1] == {**stamp, **change}
+        # Events without a delta form reach delta clients unchanged
+        assert delta.sent[0] == full.sent[0]
+        manager.disconnect(full, "inc")
+        manager.disconnect(delta, "inc")
+
+    asyncio.run(scenario())
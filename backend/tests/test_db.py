@@ -0,0 +1,33 @@
+import asyncio
+from services import db
+
+class FakePrisma:
+    def __init__(self):
+        self.connected = False
+        self.connects = 0
+
+    def is_connected(self):
+        return self.connected
+
+    async def connect(self):
+        self.connects += 1
+        await asyncio.sleep(0)
+        self.connected = True
+
+    async def disconnect(self):
+        self.connected = False
+
+def test_concurrent_callers_share_one_connect(monkeypatch):
+    client = FakePrisma()
+    monkeypatch.setattr(db, "_client", client)
+    monkeypatch.setattr(db, "_connect_lock", None)
+
+    async def scenario():
+        results = await asyncio.gather(*(db.connect_db() for _ in range(10)))
+        assert all(result is client for result in results)
+        assert client.connects == 1
+        await db.disconnect_db()
+        assert not client.is_connected()
+
+    asyncio.run(scenario())
+    assert db.get_db() is client
@@ -0,0 +1,39 @@
+from hypothesis import given, strategies as st
+from services.diff_engine import diff_texts, token_cache, tokenize
+
+def apply(parent: str, child: str, opcodes) -> str:
+    out = []
+    for tag, i1, i2, j1, j2 in opcodes:
+        out.append(parent[i1:i2] if tag == "equal" else child[j1:j2])
+    return "".join(out)
+
+def test_word_diff_merges_changes_across_short_equal_runs():
+    parent = "The old bridge near the dam is closed."
+    child = "The new road near the dam is closed!"
+    diff = diff_texts(parent, child)
+    changes = [op for op in diff["opcodes"] if op[0] != "equal"]
+    assert changes[0] == ("replace", 4, 15, 4, 13)  # "old bridge " -> "new road ", one opcode
+    assert parent[changes[1][1]:changes[1][2]] == "." and child[changes[1][3]:changes[1][4]] == "!"
+    # Token coordinates describe the same edits
+    assert [op[0] for op in diff["tokens"]] == [op[0] for op in diff["opcodes"]]
+    assert diff_texts(parent, child, "char")["tokens"] is None
+
+    merged = diff_texts("flood at the dam", "fire at a dam")
+    assert merged["opcodes"] == [("replace", 0, 13, 0, 10), ("equal", 13, 16, 10, 13)]
+    assert merged["tokens"] == [("replace", 0, 3, 0, 3), ("equal", 3, 4, 3, 4)]
+
+def test_tokens_are_cached_per_post():
+    token_cache.clear()
+    first = tokenize("flood water rising", key="p1")
+    assert tokenize("flood water rising", key="p1") is first
+    # A different text under the same key is tokenized afresh
+    assert tokenize("flood water falling", key="p1").tokens[-1] == "falling"
+
+@given(st.text(alphabet="ab ,.", max_size=40), st.text(alphabet="ab ,.", max_size=40), st.sampled_from(["word", "char"]))
+def test_opcodes_rebuild_the_child(parent, child, granularity):
+    opcodes = diff_texts(parent, child, granularity)["opcodes"]
+    assert apply(parent, child, opcodes) == child
+    # Contiguous in both texts
+    assert opcodes == [] or (opcodes[0][1] == 0 and opcodes[-1][2] == len(parent) and opcodes[-1][4] == len(child))
+    for previous, current in zip(opcodes, opcodes[1:]):
+        assert previous[2] == current[1] and previous[4] == current[3]
@@ -0,0 +1,120 @@
+import asyncio
+import os
+import pytest
+import uuid
+from hypothesis import given, strategies as st
+from services.event_bus import InProcessEventBus, PostgresEventBus, PayloadAssembler, split_payload
+
+# Property: any payload survives splitting into NOTIFY-sized parts
+@given(st.text(max_size=20000))
+def test_split_payload_roundtrip(payload):
+    parts = split_payload(payload, limit=1000)
+    assert all(len(part.encode("utf-8")) <= 1000 for part in parts)
+
+    assembler = PayloadAssembler()
+    results = [assembler.feed(part) for part in parts]
+    assert results[-1] == payload
+    assert all(result is None for result in results[:-1])
+
+def test_in_process_bus_delivers_to_subscribers():
+    bus = InProcessEventBus()
+    received = []
+    bus.subscribe(received.append)
+    asyncio.run(bus.publish({"incident_id": "inc", "frame": "{}"}))
+    assert received == [{"incident_id": "inc", "frame": "{}"}]
+
+@pytest.mark.skipif(not os.getenv("TEST_DATABASE_URL"), reason="TEST_DATABASE_URL not set")
+def test_postgres_bus_reaches_every_worker():
+    async def scenario():
+        url = os.environ["TEST_DATABASE_URL"]
+        workers = [PostgresEventBus(url, channel="factsaura_test"), PostgresEventBus(url, channel="factsaura_test")]
+        inboxes = [[], []]
+        for bus, inbox in zip(workers, inboxes):
+            bus.subscribe(inbox.append)
+            await bus.start()
+
+        small = {"incident_id": "inc", "frame": '{"type":"new_post"}'}
+        large = {"incident_id": "inc", "frame": "x" * 50000}
+        await workers[0].publish(small)
+        await workers[0].publish(large)
+
+        for _ in range(50):
+            if all(len(inbox) == 2 for inbox in inboxes):
+                break
+            await asyncio.sleep(0.05)
+        for bus in workers:
+            await bus.stop()
+
+        # One publish, delivered once to each worker (the publisher included), in order
+        assert inboxes[0] == inboxes[1] == [small, large]
+
+    asyncio.run(scenario())
+
+def test_in_process_bus_numbers_events_per_incident():
+    bus = InProcessEventBus()
+    received = []
+    bus.subscribe(received.append)
+
+    async def scenario():
+        await bus.publish_sequenced({"incident_id": "a", "frame": '{"type":"new_post"}'})
+        await bus.publish_sequenced({"incident_id": "a", "frame": '{"type":"new_post"}'})
+        await bus.publish_sequenced({"incident_id": "b", "frame": '{"type":"new_post"}'})
+        return await bus.current_seq("a")
+
+    assert asyncio.run(scenario()) == 2
+    assert [(e["incident_id"], e["seq"]) for e in received] == [("a", 1), ("a", 2), ("b", 1)]
+    assert received[1]["frame"] == '{"seq":2,"epoch":"%s","type":"new_post"}' % bus.epoch
+    # Another process numbers from 1 again, under a different epoch
+    assert InProcessEventBus().epoch != bus.epoch
+
+def test_lost_listen_connection_keeps_its_reconnect_task():
+    bus = PostgresEventBus("postgresql://localhost/unused")
+    reconnected = asyncio.Event()
+    calls = []
+
+    async def reconnect():
+        calls.append(1)
+        await reconnected.wait()
+        bus._reconnecting = False
+
+    bus._reconnect = reconnect
+
+    async def scenario():
+        bus._on_terminated(None)
+        bus._on_terminated(None)  # a second callback while reconnecting starts nothing
+        (task,) = bus._reconnect_tasks
+        await asyncio.sleep(0)
+        reconnected.set()
+        await task
+        assert calls == [1] and not bus._reconnect_tasks
+
+    asyncio.run(scenario())
+
+@pytest.mark.skipif(not os.getenv("TEST_DATABASE_URL"), reason="TEST_DATABASE_URL not set")
+def test_postgres_bus_sequence_is_ordered_across_workers():
+    # Needs the prisma migrations applied to TEST_DATABASE_URL
+    async def scenario():
+        url = os.environ["TEST_DATABASE_URL"]
+        incident_id = f"inc_{uuid.uuid4().hex}"
+        workers = [PostgresEventBus(url, channel="factsaura_seq_test"), PostgresEventBus(url, channel="factsaura_seq_test")]
+        inboxes = [[], []]
+        for bus, inbox in zip(workers, inboxes):
+            bus.subscribe(inbox.append)
+            await bus.start()
+
+        envelope = {"incident_id": incident_id, "frame": '{"type":"post_voted"}'}
+        await asyncio.gather(*(bus.publish_sequenced(envelope) for bus in workers for _ in range(10)))
+
+        for _ in range(50):
+            if all(len(inbox) == 20 for inbox in inboxes):
+                break
+            await asyncio.sleep(0.05)
+        latest = await workers[0].current_seq(incident_id)
+        for bus in workers:
+            await bus.stop()
+
+        assert latest == 20
+        for inbox in inboxes:
+            assert [e["seq"] for e in inbox] == list(range(1, 21))
+
+    asyncio.run(scenario())
@@ -0,0 +1,110 @@
+import asyncio
+from services.event_coalescer import EventCoalescer
+from services.serialization import post_delta
+
+def vote(post_id, total):
+    return {"type": "post_voted", "payload": {"id": post_id, "totalVotes": total}}
+
+def new_post(post_id):
+    return {"type": "new_post", "payload": {"id": post_id}}
+
+def test_vote_storm_collapses_to_latest_state_per_post():
+    async def scenario():
+        frames = []
+
+        async def flush(incident_id, message, delta=None):
+            frames.append((incident_id, message))
+
+        coalescer = EventCoalescer(0.01, flush)
+        coalescer.add("inc", new_post("a"))
+        for total in range(1, 1001):
+            coalescer.add("inc", vote("a", total))
+        coalescer.add("inc", new_post("b"))
+        coalescer.add("inc", vote("b", 1))
+        coalescer.add("other", vote("c", 7))
+        await asyncio.sleep(0.05)
+
+        by_incident = dict(frames)
+        assert len(frames) == 2
+        assert by_incident["inc"]["type"] == "batch"
+        assert by_incident["inc"]["payload"]["events"] == [new_post("a"), vote("a", 1000), new_post("b"), vote("b", 1)]
+        # A single event is sent as-is, not wrapped in a batch
+        assert by_incident["other"] == vote("c", 7)
+
+    asyncio.run(scenario())
+
+def test_new_posts_keep_their_order_across_ticks():
+    async def scenario():
+        frames = []
+
+        async def flush(incident_id, message, delta=None):
+            frames.append(message)
+
+        coalescer = EventCoalescer(0.01, flush)
+        coalescer.add("inc", new_post("a"))
+        coalescer.add("inc", new_post("b"))
+        await asyncio.sleep(0.03)
+        coalescer.add("inc", new_post("c"))
+        await coalescer.stop()
+
+        events = []
+        for frame in frames:
+            events.extend(frame["payload"]["events"] if frame["type"] == "batch" else [frame])
+        assert [e["payload"]["id"] for e in events] == ["a", "b", "c"]
+
+    asyncio.run(scenario())
+
+class FakePost:
+    def __init__(self, version, **fields):
+        self.id = "a"
+        self.incidentId = "inc"
+        self.version = version
+        self.updatedAt = None
+        self.__dict__.update(fields)
+
+def test_consecutive_deltas_merge_and_gaps_fall_back_to_full_frames():
+    async def scenario():
+        frames = []
+
+        async def flush(incident_id, message, delta=None):
+            frames.append((message, delta))
+
+        coalescer = EventCoalescer(0.01, flush)
+        for version, total in ((2, 1), (3, 2)):
+            post = FakePost(version, totalVotes=total, credibleVotes=1)
+            coalescer.add("inc", vote("a", total), post_delta(post, ("credibleVotes", "totalVotes"), "post_voted"))
+        await coalescer.stop()
+        message, delta = frames.pop()
+        assert message == vote("a", 2)
+        assert delta["payload"]["baseVersion"] == 1 and delta["payload"]["version"] == 3
+        assert delta["payload"]["changes"]["totalVotes"] == 2
+
+        # Version 4 was written by another worker: the merged delta would miss it
+        for version, total in ((3, 2), (5, 4)):
+            post = FakePost(version, totalVotes=total, credibleVotes=1)
+            coalescer.add("inc", vote("a", total), post_delta(post, ("credibleVotes", "totalVotes"), "post_voted"))
+        await coalescer.stop()
+        assert frames.pop() == (vote("a", 4), None)
+
+    asyncio.run(scenario())
+
+def test_votes_and_edits_of_a_post_share_one_slot():
+    async def scenario():
+        frames = []
+
+        async def flush(incident_id, message, delta=None):
+            frames.append(message)
+
+        def state(kind, version):
+            return {"type": kind, "payload": {"id": "a", "version": version}}
+
+        coalescer = EventCoalescer(0.01, flush)
+        coalescer.add("inc", state("post_voted", 2))
+        coalescer.add("inc", state("post_updated", 3))
+        coalescer.add("inc", state("post_voted", 4))
+        await coalescer.stop()
+
+        # One frame with the newest state, not the vote slot followed by an older edit
+        assert frames == [state("post_voted", 4)]
+
+    asyncio.run(scenario())
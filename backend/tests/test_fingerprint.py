@@ -0,0 +1,30 @@
+import asyncio
+import os
+import pytest
+from services.fingerprint import content_hash, normalize_content
+
+SAMPLES = ["Dam  CRACKED\n\tnear the City ", "  ÉCHO Ünïcode ß ", "non\xa0breaking", "x\r\ny\fz\vw", "", "   "]
+
+def test_case_and_whitespace_do_not_change_the_hash():
+    assert normalize_content("  Dam  CRACKED\n near\tthe city ") == "dam cracked near the city"
+    assert content_hash("Dam cracked near the city") == content_hash("dam  cracked\nnear the CITY ")
+    assert content_hash("Dam cracked near the city") != content_hash("Dam cracked near the city!")
+
+@pytest.mark.skipif(not os.getenv("TEST_DATABASE_URL"), reason="TEST_DATABASE_URL not set")
+def test_backfill_sql_matches_python():
+    path = os.path.join(os.path.dirname(__file__), "..", "prisma", "migrations", "20261019160000_post_content_hash", "migration.sql")
+    with open(path) as f:
+        sql = f.read()
+    expression = sql[sql.index("encode("):sql.index("'hex')") + len("'hex')")].replace('"content"', "$1::text")
+
+    async def scenario():
+        import asyncpg
+
+        connection = await asyncpg.connect(os.environ["TEST_DATABASE_URL"])
+        try:
+            for sample in SAMPLES:
+                assert await connection.fetchval(f"SELECT {expression}", sample) == content_hash(sample), repr(sample)
+        finally:
+            await connection.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,35 @@
+from datetime import datetime
+from types import SimpleNamespace
+from services.post_service import PostService, ancestor_path
+
+service = PostService()
+
+def make_post(post_id, content, parent=None, mutation_score=None):
+    return SimpleNamespace(
+        id=post_id, content=content, author="a", timestamp=datetime(2026, 1, 1),
+        incidentId="i1", parentId=parent.id if parent else None,
+        mutationScore=mutation_score, mutationType=None, credibleVotes=0, totalVotes=0, version=1,
+        ancestorIds=ancestor_path(parent) if parent else [],
+    )
+
+def test_lineage_scores_each_hop_and_the_drift_from_root():
+    root = make_post("r", "dam cracked near the city")
+    child = make_post("c", "dam cracked near the city, evacuate", root, mutation_score=20.0)
+    grandchild = make_post("g", "army says dam cracked, evacuate now", child)  # not yet scored
+    assert grandchild.ancestorIds == ["r", "c"]
+
+    lineage = service.build_lineage(grandchild, [root, child])
+    assert lineage["depth"] == 2 and lineage["root"]["id"] == "r"
+    hops = lineage["chain"]
+    assert [hop["post"]["id"] for hop in hops] == ["r", "c", "g"]
+    assert hops[0]["hopMutationScore"] == 0.0 and hops[1]["hopMutationScore"] == 20.0
+    expected_hop = service.calculate_mutation_score(child.content, grandchild.content)
+    assert hops[2]["hopMutationScore"] == expected_hop
+    assert hops[2]["cumulativeMutationScore"] == 20.0 + expected_hop
+    assert hops[2]["driftFromRoot"] == service.calculate_mutation_score(root.content, grandchild.content)
+
+def test_root_post_is_its_own_lineage():
+    root = make_post("r", "dam cracked")
+    lineage = service.build_lineage(root, [])
+    assert lineage["depth"] == 0 and len(lineage["chain"]) == 1
+    assert lineage["chain"][0]["driftFromRoot"] == 0.0
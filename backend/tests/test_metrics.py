@@ -0,0 +1,45 @@
+import pytest
+from services.metrics import MetricsRegistry
+
+def test_counter_and_gauge_exposition():
+    registry = MetricsRegistry()
+    requests = registry.counter("app_requests_total", "Requests.", labels=("route",))
+    requests.inc(route="/api/posts")
+    requests.inc(2, route="/api/posts")
+    registry.gauge("app_queue_depth", "Queue depth.", labels=("shard",), collect=lambda: [(("0",), 3)])
+
+    text = registry.render()
+    assert "# TYPE app_requests_total counter" in text
+    assert 'app_requests_total{route="/api/posts"} 3' in text
+    assert 'app_queue_depth{shard="0"} 3' in text
+    assert text.endswith("\n")
+
+def test_registering_a_gauge_again_replaces_its_collector():
+    registry = MetricsRegistry()
+    first = registry.gauge("app_running", "Running.", collect=lambda: [((), 1)])
+    second = registry.gauge("app_running", "Running.", collect=lambda: [((), 0)])
+    assert second is first
+    assert "app_running 0" in registry.render()
+    with pytest.raises(ValueError):
+        registry.gauge("app_running", "Running.", labels=("worker",))
+    with pytest.raises(ValueError):
+        registry.counter("app_running", "Running.")
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    latency = registry.histogram("app_latency_seconds", "Latency.", labels=("stage",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        latency.observe(value, stage="verify")
+
+    text = registry.render()
+    assert 'app_latency_seconds_bucket{stage="verify",le="0.1"} 1' in text
+    assert 'app_latency_seconds_bucket{stage="verify",le="1"} 2' in text
+    assert 'app_latency_seconds_bucket{stage="verify",le="+Inf"} 3' in text
+    assert 'app_latency_seconds_count{stage="verify"} 3' in text
+    assert 'app_latency_seconds_sum{stage="verify"} 5.55' in text
+
+def test_label_values_are_escaped():
+    registry = MetricsRegistry()
+    errors = registry.counter("app_errors_total", "Errors.", labels=("detail",))
+    errors.inc(detail='bad "quote"\n')
+    assert 'detail="bad \\"quote\\"\\n"' in registry.render()
@@ -0,0 +1,92 @@
+import asyncio
+import os
+import pytest
+from services.parent_inference import IncidentIndex, ParentInference
+
+SOURCE = "Dam near the city has cracked, officials ask residents to move to higher ground"
+RESHARE = "BREAKING: dam near the city has cracked!! officials ask residents to move to higher ground"
+
+def build_index():
+    index = IncidentIndex()
+    index.add("source", SOURCE)
+    index.add("other", "Relief camp opened at the central school, helpline numbers shared")
+    index.add("noise", "Power outage reported in the northern district since morning")
+    return index
+
+def test_orphan_matches_its_closest_predecessor():
+    index = build_index()
+    post_id, similarity = index.best_match(RESHARE, threshold=0.6)
+    assert post_id == "source" and similarity > 0.8
+    assert index.best_match("Completely unrelated words about football scores", threshold=0.6) is None
+    # A post already in the index is never its own parent
+    index.add("reshare", RESHARE)
+    assert index.best_match(RESHARE, threshold=0.6, exclude="reshare")[0] == "source"
+
+class Rollback(Exception):
+    pass
+
+class FakeDB:
+    """query_raw over asyncpg, or over a list of rows when there is no database."""
+
+    def __init__(self, rows=None, connection=None):
+        self.rows = rows or []
+        self.connection = connection
+        self.queries = 0
+
+    async def query_raw(self, sql, *args):
+        self.queries += 1
+        if self.connection:
+            return [dict(row) for row in await self.connection.fetch(sql, *args)]
+        since = args[1]
+        return [row for row in self.rows if row["created"] > since]
+
+def test_index_catches_up_with_new_posts():
+    async def scenario():
+        inference = ParentInference()
+        db = FakeDB([{"id": "source", "content": SOURCE, "created": 1000.0}])
+        assert await inference.infer(db, "i1", RESHARE) == "source"
+        # Written by another worker after the index was built
+        newer = RESHARE + " now"
+        db.rows.append({"id": "reshare", "content": RESHARE, "created": 9000.0})
+        assert await inference.infer(db, "i1", newer) == "reshare"
+        assert len(inference.indexes.get("i1")) == 2
+
+    asyncio.run(scenario())
+
+@pytest.mark.skipif(not os.getenv("TEST_DATABASE_URL"), reason="TEST_DATABASE_URL not set")
+def test_catch_up_query_runs_against_postgres():
+    # Needs the prisma migrations applied to TEST_DATABASE_URL
+    async def scenario():
+        import asyncpg
+
+        connection = await asyncpg.connect(os.environ["TEST_DATABASE_URL"])
+        try:
+            async with connection.transaction():
+                await connection.execute(
+                    """INSERT INTO "Incident" (id, title, severity, location, status, "updatedAt")
+                       VALUES ('inference-test', 't', 'CRITICAL', 'x', 'ACTIVE', now())"""
+                )
+                await connection.execute(
+                    """INSERT INTO "Post" (id, content, author, "incidentId", "updatedAt")
+                       VALUES ('inference-source', $1, 'a', 'inference-test', now())""",
+                    SOURCE,
+                )
+                inference = ParentInference()
+                assert await inference.infer(FakeDB(connection=connection), "inference-test", RESHARE) == "inference-source"
+
+                # Timestamps are stored in UTC; catching up must not depend on the session time zone
+                await connection.execute("SET LOCAL TIME ZONE 'Asia/Kolkata'")
+                await connection.execute(
+                    """INSERT INTO "Post" (id, content, author, "incidentId", "createdAt", "updatedAt")
+                       VALUES ('inference-later', 'Later post', 'a', 'inference-test',
+                               (now() AT TIME ZONE 'UTC') + interval '1 hour', now())"""
+                )
+                index = await inference.sync(FakeDB(connection=connection), "inference-test")
+                assert "inference-later" in index.contents
+                raise Rollback()  # leave no test rows behind
+        except Rollback:
+            pass
+        finally:
+            await connection.close()
+
+    asyncio.run(scenario())
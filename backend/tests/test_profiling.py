@@ -0,0 +1,65 @@
+import asyncio
+import os
+import time
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from middleware.profiling import ProfilingMiddleware
+from services.profiling import instrument_client, profiler
+
+class FakeClient:
+    async def _execute(self, *, method, arguments):
+        await asyncio.sleep(0.001)
+        return {"method": method}
+
+instrument_client(FakeClient)
+instrument_client(FakeClient)  # second call must not wrap twice
+db = FakeClient()
+
+app = FastAPI()
+app.add_middleware(ProfilingMiddleware)
+
+@app.get("/posts/{post_id}/comments")
+async def comments(post_id: str):
+    # The post lookup and the comment query, once from a spawned task
+    await db._execute(method="find_unique", arguments={})
+    await asyncio.create_task(db._execute(method="find_many", arguments={}))
+    return {"ok": True}
+
+def busy_handler_for_profile():
+    deadline = time.perf_counter() + 0.1
+    while time.perf_counter() < deadline:
+        pass
+
+@app.get("/slow")
+async def slow():
+    busy_handler_for_profile()
+    return {"ok": True}
+
+client = TestClient(app)
+
+def test_server_timing_counts_queries(monkeypatch):
+    monkeypatch.setattr(profiler, "enabled", True)
+    monkeypatch.setattr(profiler, "budget", 10.0)
+    response = client.get("/posts/p1/comments")
+    timing = response.headers["server-timing"]
+    assert 'desc="2 queries"' in timing and "over-budget" not in timing
+
+    monkeypatch.setattr(profiler, "enabled", False)
+    assert "server-timing" not in client.get("/posts/p1/comments").headers
+
+def test_slow_requests_are_flagged_and_sampled(monkeypatch, tmp_path):
+    monkeypatch.setattr(profiler, "enabled", True)
+    monkeypatch.setattr(profiler, "budget", 0.05)
+    monkeypatch.setattr(profiler, "sample_interval", 0.002)
+    monkeypatch.setattr(profiler, "output_dir", str(tmp_path))
+    profiler.set_sampling(True)
+    try:
+        response = client.get("/slow")
+    finally:
+        profiler.set_sampling(False)
+    assert "over-budget" in response.headers["server-timing"]
+    files = os.listdir(tmp_path)
+    assert len(files) == 1 and "GET-slow" in files[0]
+    with open(tmp_path / files[0]) as f:
+        stacks = f.read()
+    assert "busy_handler_for_profile" in stacks
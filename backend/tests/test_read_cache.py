@@ -0,0 +1,73 @@
+import asyncio
+from services.cache import ReadThroughCache
+from services import read_cache
+
+def test_hits_misses_and_invalidation():
+    async def scenario():
+        cache = ReadThroughCache("test", max_size=2)
+        loads = []
+
+        async def load():
+            loads.append(1)
+            return {"id": "p1", "totalVotes": len(loads)}
+
+        assert (await cache.get_or_load("p1", load))["totalVotes"] == 1
+        assert (await cache.get_or_load("p1", load))["totalVotes"] == 1
+        cache.invalidate("p1")
+        assert (await cache.get_or_load("p1", load))["totalVotes"] == 2
+        assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+        assert cache.stats()["invalidations"] == 1
+
+    asyncio.run(scenario())
+
+def test_load_racing_an_invalidation_is_not_stored():
+    async def scenario():
+        cache = ReadThroughCache("test", max_size=8)
+        release = asyncio.Event()
+
+        async def slow_load():
+            # Reads the row, then a writer commits and invalidates before we return
+            await release.wait()
+            return "old"
+
+        reader = asyncio.create_task(cache.get_or_load("k", slow_load))
+        await asyncio.sleep(0)
+        cache.invalidate("k")
+        release.set()
+        assert await reader == "old"
+
+        async def fresh_load():
+            return "new"
+
+        assert await cache.get_or_load("k", fresh_load) == "new"
+
+    asyncio.run(scenario())
+
+def test_missing_rows_and_expired_entries_are_reloaded():
+    async def scenario():
+        cache = ReadThroughCache("test", max_size=8, ttl=0.01)
+        results = iter([None, "created", "changed"])
+
+        async def load():
+            return next(results)
+
+        assert await cache.get_or_load("k", load) is None
+        assert await cache.get_or_load("k", load) == "created"
+        await asyncio.sleep(0.02)
+        assert await cache.get_or_load("k", load) == "changed"
+
+    asyncio.run(scenario())
+
+def test_invalidations_from_other_workers_arrive_over_the_bus():
+    async def scenario():
+        async def load():
+            return "cached"
+
+        await read_cache.post_cache.get_or_load("p9", load)
+        await read_cache.incident_posts_cache.get_or_load("inc9", load)
+        # What a PostgresEventBus would deliver from another worker
+        read_cache.manager.bus._deliver({"kind": "invalidate", "origin": "other", "posts": ["p9"], "incident_posts": ["inc9"]})
+        assert "p9" not in read_cache.post_cache.entries
+        assert "inc9" not in read_cache.incident_posts_cache.entries
+
+    asyncio.run(scenario())
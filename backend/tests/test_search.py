@@ -0,0 +1,194 @@
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+import pytest
+from services import search_service as search_module
+from services.search_service import InvertedIndex, SearchService, decode_cursor
+
+T0 = datetime(2026, 10, 1, tzinfo=timezone.utc)
+
+def build_index():
+    index = InvertedIndex()
+    index.add("post", "p1", "p1", "dam", "a", "Dam cracked near the city, move to higher ground", T0)
+    index.add("post", "p2", "p2", "dam", "b", "The dam cracked!! dam dam", T0 + timedelta(minutes=1))
+    index.add("comment", "c1", "p1", "dam", "c", "Is the dam really cracked?", T0 + timedelta(minutes=2))
+    index.add("post", "p3", "p3", "power", "a", "Power cut in the north, dam unaffected", T0)
+    index.severities = {"dam": "CRITICAL", "power": "WARNING"}
+    return index
+
+def ids(results):
+    return [r["id"] for r in results]
+
+def test_index_requires_every_term_and_ranks_denser_matches_first():
+    index = build_index()
+    assert ids(index.search("dam cracked")) == ["p2", "c1", "p1"]
+    assert ids(index.search("the DAM")) == ["p2", "c1", "p3", "p1"]  # stopwords ignored
+    assert index.search("dam flood") == [] and index.search("the") == []
+
+def test_index_filters():
+    index = build_index()
+    assert ids(index.search("dam", kind="comment")) == ["c1"]
+    assert ids(index.search("dam", incident_id="power")) == ["p3"]
+    assert ids(index.search("dam", severity="WARNING")) == ["p3"]
+    assert ids(index.search("dam", since=T0 + timedelta(minutes=1), until=T0 + timedelta(minutes=2))) == ["p2"]
+
+def test_removing_an_incident_drops_its_documents():
+    index = build_index()
+    index.remove_incident("dam")
+    assert ids(index.search("dam")) == ["p3"] and len(index) == 1
+    assert "cracked" not in index.postings
+
+class FakeDB:
+    def __init__(self, posts, comments, incidents=None):
+        self.severities = incidents or {"dam": "CRITICAL"}
+        self.incident = SimpleNamespace(find_many=self.incidents)
+        self.post = SimpleNamespace(find_many=lambda where: self.rows(posts, where, lambda row: row.incidentId))
+        self.comment = SimpleNamespace(find_many=lambda where, include: self.rows(
+            comments, where.get("post", where), lambda row: row.post.incidentId))
+
+    async def incidents(self):
+        return [SimpleNamespace(id=i, severity=SimpleNamespace(value=s)) for i, s in self.severities.items()]
+
+    async def rows(self, rows, where, incident_of):
+        since = where.get("createdAt", {}).get("gte")
+        incident_ids = where.get("incidentId", {}).get("in")
+        return [row for row in rows if (since is None or row.createdAt >= since)
+                and (incident_ids is None or incident_of(row) in incident_ids)]
+
+def use_db(monkeypatch, db):
+    async def connect_db():
+        return db
+
+    monkeypatch.setattr(search_module, "get_db", lambda: db)
+    monkeypatch.setattr(search_module, "connect_db", connect_db)
+
+def test_memory_backend_pages_with_a_cursor(monkeypatch):
+    posts = [SimpleNamespace(id=f"p{i}", incidentId="dam", author="a", content=f"dam report {i}",
+                             createdAt=T0 + timedelta(seconds=i)) for i in range(5)]
+    comments = [SimpleNamespace(id="c1", postId="p0", post=posts[0], author="b", content="which dam?",
+                                createdAt=T0 + timedelta(seconds=9))]
+    use_db(monkeypatch, FakeDB(posts, comments))
+
+    async def scenario():
+        service = SearchService(backend="memory")
+        first = await service.search("dam", limit=3)
+        assert ids(first["results"]) == ["c1", "p4", "p3"]
+        assert first["results"][0]["postId"] == "p0"
+        # A post that sorts before the cursor, inserted between pages, does not shift the next one
+        posts.append(SimpleNamespace(id="p9", incidentId="dam", author="a", content="dam report 9",
+                                     createdAt=T0 + timedelta(seconds=5)))
+        second = await service.search("dam", limit=3, cursor=first["nextCursor"])
+        assert ids(second["results"]) == ["p2", "p1", "p0"] and second["nextCursor"] is None
+        assert ids((await service.search("dam", limit=3))["results"]) == ["c1", "p9", "p4"]
+
+    asyncio.run(scenario())
+
+def test_memory_backend_follows_archives_and_severity_changes(monkeypatch):
+    def post(post_id, incident_id, seconds):
+        return SimpleNamespace(id=post_id, incidentId=incident_id, author="a", content=f"flood report {post_id}",
+                               createdAt=T0 + timedelta(seconds=seconds))
+
+    posts = [post("d1", "dam", 0), post("w1", "power", 1)]
+    comments = [SimpleNamespace(id="wc", postId="w1", post=posts[1], author="b", content="flood here too",
+                                createdAt=T0 + timedelta(seconds=2))]
+    db = FakeDB(posts, comments, {"dam": "CRITICAL", "power": "WARNING"})
+    use_db(monkeypatch, db)
+
+    async def found(**filters):
+        return set(ids((await service.search("flood", **filters))["results"]))
+
+    service = SearchService(backend="memory")
+
+    async def scenario():
+        assert await found(severity="WARNING") == {"w1", "wc"}
+        # Severity is read when searching, not when the document was indexed
+        db.severities["dam"] = "WARNING"
+        assert await found(severity="WARNING") == {"d1", "w1", "wc"}
+
+        # Archiving deletes the incident with its posts and comments
+        archived = (db.severities.pop("power"), list(posts[1:]), list(comments))
+        del posts[1:], comments[:]
+        posts.append(post("d2", "dam", 60))
+        assert await found() == {"d1", "d2"} and len(service.index) == 2
+
+        # Rehydrated rows keep their old createdAt, behind the index's watermark
+        db.severities["power"] = archived[0]
+        posts.extend(archived[1])
+        comments.extend(archived[2])
+        assert await found() == {"d1", "d2", "w1", "wc"}
+
+    asyncio.run(scenario())
+
+def test_malformed_cursors_are_rejected():
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+class Rollback(Exception):
+    pass
+
+@pytest.mark.skipif(not os.getenv("TEST_DATABASE_URL"), reason="TEST_DATABASE_URL not set")
+def test_search_query_runs_against_postgres(monkeypatch):
+    # Needs the prisma migrations applied to TEST_DATABASE_URL
+    async def scenario():
+        import asyncpg
+
+        connection = await asyncpg.connect(os.environ["TEST_DATABASE_URL"])
+
+        class PostgresDB:
+            async def query_raw(self, sql, *args):
+                return [dict(row) for row in await connection.fetch(sql, *args)]
+
+        async def connect_db():
+            return None
+
+        monkeypatch.setattr(search_module, "get_db", PostgresDB)
+        monkeypatch.setattr(search_module, "connect_db", connect_db)
+        try:
+            async with connection.transaction():
+                await connection.execute(
+                    """INSERT INTO "Incident" (id, title, severity, location, status, "updatedAt")
+                       VALUES ('search-dam', 't', 'CRITICAL', 'x', 'ACTIVE', now()),
+                              ('search-power', 't', 'WARNING', 'x', 'ACTIVE', now())"""
+                )
+                await connection.execute(
+                    """INSERT INTO "Post" (id, content, author, "incidentId", "createdAt", "updatedAt") VALUES
+                       ('s1', 'Dam cracked near the city', 'a', 'search-dam', '2026-10-01 00:00:00', now()),
+                       ('s2', 'The dams are cracking, cracks everywhere at the dam', 'b', 'search-dam', '2026-10-01 00:01:00', now()),
+                       ('s3', 'Power cut; the dam is fine', 'a', 'search-power', '2026-10-01 00:02:00', now())"""
+                )
+                await connection.execute(
+                    """INSERT INTO "Comment" (id, "postId", author, content, "createdAt")
+                       VALUES ('sc1', 's1', 'c', 'Which dam cracked?', '2026-10-01 00:03:00')"""
+                )
+                service = SearchService(backend="postgres")
+                # Stemmed: "cracking" and "dams" match "cracked dam"
+                everything = await service.search("cracked dam", limit=10)
+                assert ids(everything["results"])[0] == "s2"
+                assert set(ids(everything["results"])) == {"s1", "s2", "sc1"}
+                assert "<b>" in everything["results"][0]["snippet"]
+                assert ids((await service.search("dam", severity="WARNING"))["results"]) == ["s3"]
+                assert ids((await service.search("dam", kind="comment"))["results"]) == ["sc1"]
+                assert ids((await service.search("dam -power", incident_id="search-power"))["results"]) == []
+                since = datetime(2026, 10, 1, 0, 1)
+                assert set(ids((await service.search("dam", since=since))["results"])) == {"s2", "s3", "sc1"}
+                # Timestamps are stored in UTC; the filters must not depend on the session time zone
+                await connection.execute("SET LOCAL TIME ZONE 'Asia/Kolkata'")
+                assert set(ids((await service.search("dam", since=since))["results"])) == {"s2", "s3", "sc1"}
+                assert set(ids((await service.search("dam", until=since))["results"])) == {"s1"}
+
+                paged, cursor = [], None
+                while True:
+                    page = await service.search("dam", limit=1, cursor=cursor)
+                    paged += ids(page["results"])
+                    cursor = page["nextCursor"]
+                    if not cursor:
+                        break
+                assert paged == ids((await service.search("dam", limit=10))["results"]) and len(paged) == 4
+                raise Rollback()  # leave no test rows behind
+        except Rollback:
+            pass
+        finally:
+            await connection.close()
+
+    asyncio.run(scenario())
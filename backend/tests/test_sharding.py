@@ -0,0 +1,39 @@
+from hypothesis import given, strategies as st
+from services.agents.shard_coordinator import shard_for
+from services.agents.scanner_agent import ScannerAgent
+
+scanner = ScannerAgent()
+
+# Property: every incident maps to exactly one shard, and always the same one
+@given(st.text(min_size=1), st.integers(min_value=1, max_value=64))
+def test_shard_for_is_stable(incident_id, shard_count):
+    shard = shard_for(incident_id, shard_count)
+    assert 0 <= shard < shard_count
+    assert shard == shard_for(incident_id, shard_count)
+
+def test_partition_covers_every_post_once():
+    scanner.partition(4)
+    partitioned = [post["id"] for posts in scanner.shards.values() for post in posts]
+    expected = [post["id"] for post in scanner.posts[:scanner.MAX_POSTS_LIMIT]]
+    assert sorted(partitioned) == sorted(expected)
+
+    # Feed order (parents before reshares) is kept inside each shard
+    for posts in scanner.shards.values():
+        positions = [expected.index(post["id"]) for post in posts]
+        assert positions == sorted(positions)
+
+def test_next_post_only_from_owned_shards():
+    scanner.partition(4)
+    owned = {shard: 0 for shard, posts in scanner.shards.items() if posts}
+    seen = []
+    while True:
+        item = scanner.get_next_post_for_shards(owned)
+        if not item:
+            break
+        shard, position, post = item
+        assert shard in owned and position == owned[shard]
+        owned[shard] = position + 1
+        seen.append(post["id"])
+
+    assert len(seen) == len(set(seen)) == sum(len(p) for p in scanner.shards.values())
+    assert scanner.get_next_post_for_shards({}) is None
@@ -0,0 +1,133 @@
+import asyncio
+import json
+import math
+import os
+import struct
+from array import array
+import pytest
+from services.snapshot import IncidentSnapshot, SnapshotStore
+
+def row(post_id, parent=None, updated=1000.0, **extra):
+    return {"id": post_id, "parentId": parent, "author": extra.pop("author", "a"), "mutationScore": None,
+            "mutationType": None, "parentInferred": False, "credibleVotes": 0, "totalVotes": 0,
+            "version": 1, "timestamp": updated, "updated": updated, **extra}
+
+def decode(data):
+    """What the frontend does: header JSON, then one typed array per column."""
+    assert data[:4] == b"FZS1"
+    (length,) = struct.unpack("<I", data[4:8])
+    header = json.loads(data[8:8 + length])
+    body = data[8 + length:]
+    typecodes = {"i1": "b", "u1": "B", "i4": "i", "f4": "f", "f8": "d"}
+    columns = {}
+    for name, kind, offset in header["columns"]:
+        assert (8 + length + offset) % 8 == 0
+        column = array(typecodes[kind])
+        column.frombytes(body[offset:offset + header["count"] * column.itemsize])
+        columns[name] = list(column)
+    return header, columns
+
+def test_binary_snapshot_round_trip():
+    snapshot = IncidentSnapshot("i1")
+    # The child arrives before its parent
+    snapshot.upsert(row("child", parent="root", mutationScore=42.5, mutationType="FABRICATION", author="b"))
+    snapshot.upsert(row("root", credibleVotes=3, totalVotes=4))
+    snapshot.upsert(row("orphan", parent="archived-elsewhere", author="b"))
+
+    header, columns = decode(snapshot.encode())
+    assert header["ids"] == ["child", "root", "orphan"]
+    assert header["authors"] == ["b", "a"]
+    assert columns["parent"] == [1, -1, -1]
+    assert columns["mutationScore"][0] == 42.5 and math.isnan(columns["mutationScore"][1])
+    assert [header["mutationTypes"][t] if t >= 0 else None for t in columns["mutationType"]] == ["FABRICATION", None, None]
+    assert columns["author"] == [0, 1, 0]
+    assert columns["credibleVotes"] == [0, 3, 0] and columns["totalVotes"] == [0, 4, 0]
+    assert snapshot.to_dict()["columns"]["mutationScore"] == [42.5, None, None]
+
+def test_updates_change_rows_in_place():
+    snapshot = IncidentSnapshot("i1")
+    snapshot.upsert(row("p1"))
+    first = snapshot.encode()
+    assert snapshot.encode() is first  # cached until the next change
+    snapshot.upsert(row("p1", credibleVotes=1, totalVotes=1, version=2, updated=2000.0))
+    _, columns = decode(snapshot.encode())
+    assert len(snapshot) == 1 and columns["version"] == [2] and columns["credibleVotes"] == [1]
+    assert snapshot.watermark_ms == 2000.0
+
+class FakeDB:
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+
+    async def query_raw(self, sql, incident_id, since):
+        self.queries.append(since)
+        return [r for r in self.rows if r["updated"] > since]
+
+def test_store_catches_up_and_rebuilds_after_removals():
+    async def scenario():
+        store = SnapshotStore()
+        db = FakeDB([row("p1"), row("p2", parent="p1")])
+        snapshot = await store.get(db, "i1", "v1", count=2)
+        assert snapshot.ids == ["p1", "p2"] and db.queries == [-1]
+        # Same version: served without a query
+        assert await store.get(db, "i1", "v1", count=2) is snapshot and len(db.queries) == 1
+
+        db.rows.append(row("p3", parent="p2", updated=9000.0))
+        snapshot = await store.get(db, "i1", "v2", count=3)
+        assert snapshot.ids == ["p1", "p2", "p3"] and db.queries[-1] == 1000.0 - 5000
+
+        db.rows = db.rows[:1]
+        snapshot = await store.get(db, "i1", "v3", count=1)
+        assert snapshot.ids == ["p1"] and db.queries[-1] == -1
+
+    asyncio.run(scenario())
+
+class Rollback(Exception):
+    pass
+
+@pytest.mark.skipif(not os.getenv("TEST_DATABASE_URL"), reason="TEST_DATABASE_URL not set")
+def test_snapshot_query_runs_against_postgres():
+    # Needs the prisma migrations applied to TEST_DATABASE_URL
+    async def scenario():
+        import asyncpg
+
+        class PostgresDB:
+            async def query_raw(self, sql, *args):
+                return [dict(r) for r in await connection.fetch(sql, *args)]
+
+        connection = await asyncpg.connect(os.environ["TEST_DATABASE_URL"])
+        try:
+            async with connection.transaction():
+                await connection.execute(
+                    """INSERT INTO "Incident" (id, title, severity, location, status, "updatedAt")
+                       VALUES ('snapshot-test', 't', 'CRITICAL', 'x', 'ACTIVE', now())"""
+                )
+                await connection.execute(
+                    """INSERT INTO "Post" (id, content, author, "incidentId", "updatedAt", "mutationType", "mutationScore")
+                       VALUES ('snap-root', 'c', 'a', 'snapshot-test', now(), NULL, NULL),
+                              ('snap-child', 'c!', 'b', 'snapshot-test', now(), 'EMOTIONAL', 12.5)"""
+                )
+                await connection.execute("""UPDATE "Post" SET "parentId" = 'snap-root' WHERE id = 'snap-child'""")
+                store = SnapshotStore()
+                snapshot = await store.get(PostgresDB(), "snapshot-test", "v1", count=2)
+                _, columns = decode(snapshot.encode())
+                assert sorted(snapshot.ids) == ["snap-child", "snap-root"]
+                child = snapshot.rows["snap-child"]
+                assert columns["parent"][child] == snapshot.rows["snap-root"]
+                assert columns["mutationType"][child] == 0 and columns["mutationScore"][child] == 12.5
+
+                # Timestamps are stored in UTC; catching up must not depend on the session time zone
+                await connection.execute("SET LOCAL TIME ZONE 'Asia/Kolkata'")
+                await connection.execute(
+                    """UPDATE "Post" SET "totalVotes" = 7, "updatedAt" = (now() AT TIME ZONE 'UTC') + interval '1 hour'
+                       WHERE id = 'snap-child'"""
+                )
+                snapshot = await store.get(PostgresDB(), "snapshot-test", "v2", count=2)
+                assert decode(snapshot.encode())[1]["totalVotes"][child] == 7
+                raise Rollback()  # leave no test rows behind
+        except Rollback:
+            pass
+        finally:
+            await connection.close()
+
+    asyncio.run(scenario())
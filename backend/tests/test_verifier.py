@@ -0,0 +1,31 @@
+import asyncio
+from services.agents.verifier_agent import VerifierAgent
+from services.post_service import PostService
+
+def test_batch_scores_reshare_chain_against_parents():
+    verifier = VerifierAgent(cache_size=8)
+    posts = [
+        {"id": "a", "content": "Water level rising near the bridge.", "truth_status": "TRUE"},
+        {"id": "b", "parent_id": "a", "content": "Water level rising near the bridge!!", "truth_status": "TRUE"},
+        {"id": "c", "parent_id": "b", "content": "The bridge has collapsed, everyone evacuate now", "truth_status": "FALSE"},
+    ]
+
+    # Every parent is part of the batch, so no database round trip is needed
+    results = asyncio.run(verifier.verify_batch(posts))
+    service = PostService()
+
+    assert results[0]["mutation_score"] == 0.0 and results[0]["mutation_type"] is None
+    for result, post, parent in zip(results[1:], posts[1:], posts):
+        expected = service.calculate_mutation_score(parent["content"], post["content"])
+        assert result["mutation_score"] == expected
+        assert result["mutation_type"] == service.classify_mutation(expected)
+
+    # Parents stay cached for later batches
+    assert verifier.parent_cache.get("c") == posts[2]["content"]
+
+def test_parent_cache_is_bounded():
+    verifier = VerifierAgent(cache_size=2)
+    posts = [{"id": str(i), "content": f"post {i}"} for i in range(5)]
+    asyncio.run(verifier.verify_batch(posts))
+    assert len(verifier.parent_cache) == 2
+    assert "0" not in verifier.parent_cache and "4" in verifier.parent_cache
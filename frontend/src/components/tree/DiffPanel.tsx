@@ -13,7 +13,9 @@ interface DiffPanelProps {
 interface DiffData {
     post: Post;
     parent: Post | null;
-    diff: [string, number, number, number, number][]; // opcodes
+    diff: [string, number, number, number, number][]; // opcodes, character offsets
+    tokens: [string, number, number, number, number][] | null; // same opcodes, token indices (word granularity)
+    granularity: 'word' | 'char';
 }
 
 export function DiffPanel({ selectedPostId, onClose }: DiffPanelProps) {
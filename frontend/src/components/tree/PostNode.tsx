@@ -1,5 +1,7 @@
 import { memo } from 'react';
 import { Handle, Position } from 'reactflow';
+import { useQuery } from '@tanstack/react-query';
+import { fetchSnapshotContent } from '../../lib/api';
 import type { Post } from '../../types';
 import { AlertTriangle, CheckCircle, Info, Flag } from 'lucide-react';
 
@@ -13,6 +15,15 @@ interface PostNodeProps {
 export const PostNode = memo(({ data }: PostNodeProps) => {
     const { post, borderColor } = data;
 
+    // Snapshot posts arrive without content; every node shares this one query
+    const { data: contents } = useQuery({
+        queryKey: ['postContent', post.incidentId],
+        queryFn: () => fetchSnapshotContent(post.incidentId),
+        enabled: !post.content,
+        staleTime: Infinity,
+    });
+    const content = post.content || contents?.[post.id];
+
     const getIcon = () => {
         if (post.mutationScore && post.mutationScore >= 40) return <AlertTriangle className="w-4 h-4 text-red-400" />;
         if (post.mutationScore && post.mutationScore >= 10) return <Info className="w-4 h-4 text-yellow-400" />;
@@ -51,7 +62,7 @@ export const PostNode = memo(({ data }: PostNodeProps) => {
             </div>
 
             <p className="text-sm text-slate-200 line-clamp-3 mb-2">
-                {post.content}
+                {content ?? <span className="text-slate-500 animate-pulse">Loading…</span>}
             </p>
 
             <div className="flex items-center justify-between text-[10px] text-slate-500">
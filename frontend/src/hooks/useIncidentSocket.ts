@@ -1,48 +1,120 @@
 import { useEffect, useState } from 'react';
 import { useQuery, useQueryClient } from '@tanstack/react-query';
-import { fetchPostsByIncident } from '../lib/api';
+import { fetchIncidentSnapshot } from '../lib/api';
 import type { Post } from '../types';
 
 export function useIncidentSocket(incidentId: string | null) {
     const queryClient = useQueryClient();
     const [socket, setSocket] = useState<WebSocket | null>(null);
 
-    // Initial fetch
+    // Initial fetch: the columnar snapshot, with content loaded lazily by PostNode
     const { data: posts = [], isLoading } = useQuery({
         queryKey: ['posts', incidentId],
-        queryFn: () => incidentId ? fetchPostsByIncident(incidentId) : Promise.resolve([]),
+        queryFn: () => incidentId ? fetchIncidentSnapshot(incidentId) : Promise.resolve([]),
         enabled: !!incidentId,
     });
 
     useEffect(() => {
         if (!incidentId) return;
 
-        const ws = new WebSocket(`ws://localhost:8000/api/ws/incidents/${incidentId}`);
+        let ws: WebSocket | null = null;
+        let retryTimer: ReturnType<typeof setTimeout> | undefined;
+        let closed = false;
+        // Highest sequence number applied; sent on reconnect so the server replays only what was missed
+        let lastSeq: number | null = null;
+        // Numbering the seqs belong to; it changes when the server's stream starts over
+        let epoch: string | null = null;
 
-        ws.onopen = () => {
-            console.log('Connected to incident socket');
-        };
-
-        ws.onmessage = (event) => {
-            const message = JSON.parse(event.data);
-            if (message.type === 'new_post') {
+        const applyMessage = (message: any) => {
+            if (message.type === 'batch') {
+                // Coalesced frame: several events from one server tick, in order
+                message.payload.events.forEach(applyMessage);
+            } else if (message.type === 'resync_required') {
+                // Missed events are no longer available for replay: refetch the snapshot
+                queryClient.invalidateQueries({ queryKey: ['posts', incidentId] });
+                queryClient.invalidateQueries({ queryKey: ['postContent', incidentId] });
+            } else if (message.type === 'new_post') {
                 const newPost = message.payload;
                 queryClient.setQueryData(['posts', incidentId], (oldPosts: Post[] = []) => {
                     // Avoid duplicates
                     if (oldPosts.find(p => p.id === newPost.id)) return oldPosts;
                     return [...oldPosts, newPost];
                 });
+            } else if (message.type === 'new_posts') {
+                // Bulk import: every post created by one request, in a single frame
+                const newPosts: Post[] = message.payload.posts;
+                queryClient.setQueryData(['posts', incidentId], (oldPosts: Post[] = []) => {
+                    const known = new Set(oldPosts.map(p => p.id));
+                    const added = newPosts.filter(p => !known.has(p.id));
+                    return added.length ? [...oldPosts, ...added] : oldPosts;
+                });
+            } else if (message.type === 'post_voted' || message.type === 'post_updated') {
+                const updatedPost = message.payload;
+                queryClient.setQueryData(['posts', incidentId], (oldPosts: Post[] = []) =>
+                    // A full frame older than what we hold would roll the post back
+                    oldPosts.map(p => p.id === updatedPost.id && !(p.version > updatedPost.version) ? { ...p, ...updatedPost } : p)
+                );
+            } else if (message.type === 'post_delta') {
+                const { id, baseVersion, version, changes } = message.payload;
+                let missedUpdate = false;
+                queryClient.setQueryData(['posts', incidentId], (oldPosts: Post[] = []) =>
+                    oldPosts.map(p => {
+                        if (p.id !== id || p.version >= version) return p;
+                        // Changes only apply on top of baseVersion or newer
+                        if (p.version < baseVersion) {
+                            missedUpdate = true;
+                            return p;
+                        }
+                        return { ...p, ...changes, version };
+                    })
+                );
+                if (missedUpdate) {
+                    queryClient.invalidateQueries({ queryKey: ['posts', incidentId] });
+                }
             }
         };
 
-        ws.onclose = () => {
-            console.log('Disconnected from incident socket');
+        const connect = () => {
+            // delta=1: post updates arrive as post_delta frames with only the changed fields
+            const query = lastSeq !== null
+                ? `?delta=1&last_seq=${lastSeq}&epoch=${encodeURIComponent(epoch ?? '')}`
+                : '?delta=1';
+            ws = new WebSocket(`ws://localhost:8000/api/ws/incidents/${incidentId}${query}`);
+
+            ws.onopen = () => {
+                console.log('Connected to incident socket');
+            };
+
+            ws.onmessage = (event) => {
+                const message = JSON.parse(event.data);
+                if (typeof message.seq === 'number') {
+                    if (message.epoch !== epoch) {
+                        // New numbering: our lastSeq says nothing about these frames
+                        epoch = message.epoch;
+                        lastSeq = null;
+                    }
+                    // Already applied (e.g. replayed twice around a reconnect)
+                    if (lastSeq !== null && message.seq <= lastSeq) return;
+                    lastSeq = message.seq;
+                }
+                applyMessage(message);
+            };
+
+            ws.onclose = () => {
+                console.log('Disconnected from incident socket');
+                if (closed) return;
+                retryTimer = setTimeout(connect, 3000);
+            };
+
+            setSocket(ws);
         };
 
-        setSocket(ws);
+        connect();
 
         return () => {
-            ws.close();
+            closed = true;
+            clearTimeout(retryTimer);
+            ws?.close();
         };
     }, [incidentId, queryClient]);
 
@@ -1,11 +1,58 @@
-import { useQuery } from "@tanstack/react-query";
+import { useEffect } from "react";
+import { useQuery, useQueryClient } from "@tanstack/react-query";
 import { fetchIncidents } from "../lib/api";
 import type { Incident } from "../types";
 
+const FIREHOSE_URL = "ws://localhost:8000/api/ws/incidents";
+
 export function useIncidents() {
+    const queryClient = useQueryClient();
+
+    useEffect(() => {
+        let ws: WebSocket | null = null;
+        let retryTimer: ReturnType<typeof setTimeout> | undefined;
+        let closed = false;
+
+        const connect = () => {
+            ws = new WebSocket(FIREHOSE_URL);
+
+            ws.onopen = () => {
+                // An empty filter matches every incident
+                ws?.send(JSON.stringify({ action: "subscribe", filters: [{}] }));
+            };
+
+            ws.onmessage = (event) => {
+                const message = JSON.parse(event.data);
+                if (message.type === "incident_created" || message.type === "incident_updated") {
+                    const incident: Incident = message.payload;
+                    queryClient.setQueryData<Incident[]>(["incidents"], (old = []) => {
+                        const exists = old.some(i => i.id === incident.id);
+                        return exists
+                            ? old.map(i => (i.id === incident.id ? { ...i, ...incident } : i))
+                            : [incident, ...old];
+                    });
+                }
+            };
+
+            ws.onclose = () => {
+                if (closed) return;
+                // Events may have been missed while disconnected: refetch once, then resubscribe
+                queryClient.invalidateQueries({ queryKey: ["incidents"] });
+                retryTimer = setTimeout(connect, 3000);
+            };
+        };
+
+        connect();
+
+        return () => {
+            closed = true;
+            clearTimeout(retryTimer);
+            ws?.close();
+        };
+    }, [queryClient]);
+
     return useQuery<Incident[]>({
         queryKey: ["incidents"],
         queryFn: fetchIncidents,
-        refetchInterval: 3000, // Poll every 3 seconds
     });
 }
@@ -1,4 +1,5 @@
-import type { Incident } from "../types";
+import type { Incident, Post } from "../types";
+import { decodeSnapshot } from "./snapshot";
 
 const API_BASE_URL = "http://localhost:8000/api";
 
@@ -26,6 +27,32 @@ export async function fetchPostsByIncident(incidentId: string): Promise<any[]> {
     return response.json();
 }
 
+// Tree structure without content: a fraction of the size of the full post list
+export async function fetchIncidentSnapshot(incidentId: string): Promise<Post[]> {
+    const response = await fetch(`${API_BASE_URL}/incidents/${incidentId}/snapshot`);
+    if (!response.ok) {
+        throw new Error("Failed to fetch incident snapshot");
+    }
+    return decodeSnapshot(await response.arrayBuffer());
+}
+
+// Content of every post in the snapshot, by post id, fetched page by page
+export async function fetchSnapshotContent(incidentId: string): Promise<Record<string, string>> {
+    const contents: Record<string, string> = {};
+    for (let offset = 0; ; ) {
+        const response = await fetch(`${API_BASE_URL}/incidents/${incidentId}/snapshot/content?offset=${offset}&limit=1000`);
+        if (!response.ok) {
+            throw new Error("Failed to fetch post content");
+        }
+        const page: { ids: string[]; content: (string | null)[]; count: number } = await response.json();
+        page.ids.forEach((id, i) => {
+            if (page.content[i] !== null) contents[id] = page.content[i] as string;
+        });
+        offset += page.ids.length;
+        if (page.ids.length === 0 || offset >= page.count) return contents;
+    }
+}
+
 export async function fetchPostDiff(postId: string): Promise<any> {
     const response = await fetch(`${API_BASE_URL}/posts/${postId}/diff`);
     if (!response.ok) {
@@ -0,0 +1,63 @@
+import type { Post } from '../types';
+
+// Binary incident snapshot (backend/services/snapshot.py): "FZS1", a uint32
+// header length, the header JSON, then one little-endian column per field.
+interface SnapshotHeader {
+    incidentId: string;
+    count: number;
+    ids: string[];
+    authors: string[];
+    mutationTypes: NonNullable<Post['mutationType']>[];
+    columns: [string, 'i1' | 'u1' | 'i4' | 'f4' | 'f8', number][];
+}
+
+const ARRAY_TYPES = {
+    i1: Int8Array,
+    u1: Uint8Array,
+    i4: Int32Array,
+    f4: Float32Array,
+    f8: Float64Array,
+};
+
+/**
+ * Turns a snapshot into Post objects for the tree. Content is left empty: it is
+ * loaded separately (see fetchSnapshotContent) and filled in by PostNode.
+ */
+export function decodeSnapshot(buffer: ArrayBuffer): Post[] {
+    const view = new DataView(buffer);
+    const magic = new TextDecoder().decode(new Uint8Array(buffer, 0, 4));
+    if (magic !== 'FZS1') {
+        throw new Error('Not an incident snapshot');
+    }
+    const headerLength = view.getUint32(4, true);
+    const header: SnapshotHeader = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 8, headerLength)));
+    const bodyStart = 8 + headerLength;
+
+    // Columns are 8-byte aligned, so each one is a view, not a copy
+    const columns: Record<string, ArrayLike<number>> = {};
+    for (const [name, kind, offset] of header.columns) {
+        columns[name] = new ARRAY_TYPES[kind](buffer, bodyStart + offset, header.count);
+    }
+
+    const posts: Post[] = new Array(header.count);
+    for (let i = 0; i < header.count; i++) {
+        const parent = columns.parent[i];
+        const score = columns.mutationScore[i];
+        const type = columns.mutationType[i];
+        posts[i] = {
+            id: header.ids[i],
+            content: '',
+            author: header.authors[columns.author[i]],
+            timestamp: new Date(columns.timestamp[i]).toISOString(),
+            incidentId: header.incidentId,
+            parentId: parent >= 0 ? header.ids[parent] : undefined,
+            parentInferred: columns.parentInferred[i] === 1,
+            mutationScore: Number.isNaN(score) ? undefined : score,
+            mutationType: type >= 0 ? header.mutationTypes[type] : undefined,
+            credibleVotes: columns.credibleVotes[i],
+            totalVotes: columns.totalVotes[i],
+            version: columns.version[i],
+        };
+    }
+    return posts;
+}
@@ -15,10 +15,12 @@ export interface Post {
     timestamp: string;
     incidentId: string;
     parentId?: string;
+    parentInferred?: boolean; // parent linked by similarity, not given
     mutationScore?: number;
     mutationType?: 'EMOTIONAL' | 'FACTUAL' | 'FABRICATION';
     credibleVotes: number;
     totalVotes: number;
+    version: number;
 }
 
 export interface Comment {